@@ -0,0 +1,98 @@
+# Análisis de un árbol de fuentes desde la línea de comandos, sin pasar por el servidor HTTP.
+# Reparte los archivos entre procesos y escribe un resultado JSON por línea y archivo.
+#
+#   python -m analizadorcorpus DIRECTORIO [-o resultados.jsonl] [-j PROCESOS] [-e .c -e .h] [--tokens]
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from analizadorlotes import iniciar_trabajador
+from analizadorsintactico import analizarsintactico
+
+
+def leer_fuente(ruta):
+    # El archivo se mapea en memoria y se decodifica directamente desde el mapa, sin leerlo antes a
+    # un objeto bytes. El analizador trabaja sobre str, así que la decodificación sí es una copia.
+    with open(ruta, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: return '', 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            return str(memoryview(mapa), 'utf-8', 'replace'), len(mapa)
+
+
+def analizar_archivo(ruta, incluir_tokens=False):
+    inicio = time.perf_counter()
+    try:
+        texto, tamano = leer_fuente(ruta)
+        resultado = analizarsintactico(texto)
+    except Exception as e:
+        return {'archivo': ruta, 'error': f'{type(e).__name__}: {str(e)}', 'tokens': 0}
+    linea = {
+        'archivo': ruta,
+        'bytes': tamano,
+        'tokens': len(resultado['tokens_lexicos']),
+        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+        'success': resultado['success'],
+        'mensaje': resultado['mensaje'],
+        'total_estructuras': resultado['total_estructuras'],
+        'total_errores': resultado['total_errores'],
+        'errores': resultado['errores'],
+        'resultados_sintacticos': resultado['resultados_sintacticos']
+    }
+    if incluir_tokens: linea['tokens_lexicos'] = resultado['tokens_lexicos']
+    return linea
+
+
+def buscar_fuentes(raiz, extensiones):
+    # Orden estable para que dos ejecuciones sobre el mismo árbol den el mismo JSONL
+    for directorio, subdirectorios, archivos in os.walk(raiz):
+        subdirectorios.sort()
+        for nombre in sorted(archivos):
+            if nombre.endswith(extensiones): yield os.path.join(directorio, nombre)
+
+
+def _analizar_con_tokens(ruta):
+    return analizar_archivo(ruta, incluir_tokens=True)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Analiza todas las fuentes de un directorio en paralelo')
+    parser.add_argument('directorio')
+    parser.add_argument('-o', '--salida', help='archivo JSONL de resultados (por defecto, salida estándar)')
+    parser.add_argument('-j', '--procesos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-e', '--extension', action='append', help='extensiones a analizar (por defecto .c)')
+    parser.add_argument('--tokens', action='store_true', help='incluir los tokens de cada archivo')
+    parser.add_argument('--lote', type=int, default=16, help='archivos por envío a cada proceso')
+    args = parser.parse_args(argumentos)
+
+    rutas = list(buscar_fuentes(args.directorio, tuple(args.extension or ['.c'])))
+    funcion = _analizar_con_tokens if args.tokens else analizar_archivo
+    salida = open(args.salida, 'w', encoding='utf-8') if args.salida else sys.stdout
+    archivos = tokens = total_bytes = con_errores = fallidos = 0
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max(1, args.procesos), initializer=iniciar_trabajador) as pool:
+            for linea in pool.map(funcion, rutas, chunksize=max(1, args.lote)):
+                # default=list: los tokens llegan como ValoresTokens y se recortan del texto aquí
+                salida.write(json.dumps(linea, ensure_ascii=False, default=list) + '\n')
+                archivos += 1
+                tokens += linea['tokens']
+                total_bytes += linea.get('bytes', 0)
+                if 'error' in linea: fallidos += 1
+                elif not linea['success']: con_errores += 1
+    finally:
+        if salida is not sys.stdout: salida.close()
+
+    segundos = time.perf_counter() - inicio
+    print(f'📁 {archivos} archivo(s), {total_bytes / 1e6:.2f} MB, {tokens} tokens en {segundos:.2f} s', file=sys.stderr)
+    print(f'⚡ {archivos / segundos:.1f} archivos/s, {tokens / segundos:.0f} tokens/s con {args.procesos} proceso(s)'
+          if segundos > 0 else '⚡ sin archivos', file=sys.stderr)
+    print(f'❌ {con_errores} con errores sintácticos, {fallidos} no se pudieron analizar', file=sys.stderr)
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
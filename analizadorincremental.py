@@ -0,0 +1,378 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate, repeat
+from operator import add, sub
+
+from analizadorsintactico import (TRAMO_TOKENIZACION, PresupuestoExcedido, construir_resultado, motor_sintactico,
+                                  resultado_presupuesto_excedido, resultado_vacio, resumen_resultado)
+from diagnosticos import redactar
+from motorlexico import BufferTokens, motor_lexico
+
+# Lo que devuelve CanalDocumento.siguiente a una suscripción reemplazada por otra
+CERRADO = object()
+
+
+def combinar_cambios(cambio, inicio, fin, cantidad):
+    # Une dos reemplazos sucesivos en una secuencia (un texto, una lista de fragmentos). cambio es el
+    # primero como (inicio, fin en la secuencia original, fin en la actual), o None; el segundo cambia
+    # [inicio, fin) de la actual por `cantidad` elementos. Devuelve el reemplazo equivalente a ambos.
+    if cambio is None: return inicio, fin, inicio + cantidad
+    desde, fin_original, fin_actual = cambio
+    hasta = max(fin_actual, fin)
+    return min(desde, inicio), hasta - (fin_actual - fin_original), hasta + cantidad - (fin - inicio)
+
+
+class Fragmento:
+    # Una construcción de nivel superior ya analizada. Los tokens guardan posiciones relativas al
+    # inicio del fragmento, así que una edición anterior no obliga a tocarlos.
+    # abiertas: posiciones relativas de aperturas sin cerrar ('"', '/*') cuyo escaneo depende del resto.
+    __slots__ = ('longitud', 'tipos', 'inicios', 'fines', 'valores', 'exito', 'mensaje', 'abiertas')
+
+
+class DocumentoIncremental:
+    """Documento del editor con sus tokens y construcciones de nivel superior.
+
+    Cada edición vuelve a tokenizar y analizar sólo desde la construcción
+    anterior a la editada hasta el primer límite de construcción en el que el
+    resultado vuelve a coincidir con el que ya se tenía; el resto se reutiliza.
+    Con un presupuesto, una operación que lo supera se aborta con
+    PresupuestoExcedido, como el análisis completo, y el documento queda como
+    estaba.
+    """
+
+    def __init__(self, texto='', presupuesto=None):
+        self.version = 0
+        self.lock = threading.Lock()
+        self.fragmentos, self.tokens, self._cambio = [], 0, None
+        self.reemplazar(texto, presupuesto)
+
+    def reemplazar(self, texto, presupuesto=None):
+        ctx = motor_sintactico.contexto(presupuesto)
+        buffer, desconocidos = BufferTokens(texto), []
+        # Por tramos, como MotorSintactico.tokenizar, para abortar sin tokenizar entero un texto enorme
+        pos, n = 0, len(texto)
+        while pos < n:
+            pos = motor_lexico.escanear(texto, pos, min(pos + TRAMO_TOKENIZACION, n), buffer, desconocidos)
+            ctx.comprobar_tokens(buffer)
+            ctx.comprobar_presupuesto(len(buffer))
+        abiertas = motor_lexico.aperturas_sin_cerrar(buffer, 0, len(buffer), desconocidos)
+        pasos, _ = self._analizar(ctx, buffer, 0, len(buffer))
+        fragmentos = self._fragmentar(buffer, pasos, len(texto), abiertas)
+
+        self._cambio = combinar_cambios(self._cambio, 0, len(self.fragmentos), len(fragmentos))
+        self.texto, self.fragmentos, self.tokens = texto, fragmentos, len(buffer)
+        self.prefijo = buffer.inicios[0] if buffer else len(texto)
+        self.abierto_prefijo = bool(abiertas) and abiertas[0] < self.prefijo
+        self.estructuras = sum(fragmento.exito for fragmento in fragmentos)
+        self.version += 1
+
+    def editar(self, inicio, fin, reemplazo, presupuesto=None):
+        anterior, fragmentos = self.texto, self.fragmentos
+        if not 0 <= inicio <= fin <= len(anterior):
+            raise ValueError(f"Rango de edición fuera del documento: [{inicio}, {fin})")
+        delta = len(reemplazo) - (fin - inicio)
+        texto = anterior[:inicio] + reemplazo + anterior[fin:]
+        total = len(fragmentos)
+        bases = list(accumulate((f.longitud for f in fragmentos), initial=self.prefijo))
+
+        # Se empieza en la construcción anterior a la editada: su último token puede unirse con el
+        # texto insertado y su análisis mira el primer token de la siguiente ('else', ...)
+        k = max(bisect_right(bases, inicio, 0, total) - 2, 0)
+        # Una apertura sin cerrar anterior puede quedar cerrada por la edición: su fragmento cambia
+        # desde el primer token, así que también se empieza en el anterior
+        if self.abierto_prefijo: k = 0
+        for f in range(min(k + 1, total)):
+            if fragmentos[f].abiertas:
+                k = max(f - 1, 0)
+                break
+        region = bases[k] if k else 0
+
+        # Re-tokenizar hasta el primer fragmento posterior a la edición en el que el escaneo cae justo
+        # en su primer token: de ahí en adelante los tokens son los mismos, sólo desplazados
+        buffer, desconocidos = BufferTokens(texto), []
+        j = bisect_left(bases, fin, 0, total)
+        pos = region
+        while True:
+            limite = bases[j] + delta if j < total else len(texto)
+            pos = motor_lexico.escanear(texto, pos, limite, buffer, desconocidos)
+            if j == total or pos == limite: break
+            j += 1
+        nuevos = len(buffer)
+        ctx = motor_sintactico.contexto(presupuesto)
+        tokens = self.tokens + nuevos - sum(len(fragmentos[f].tipos) for f in range(k, j))
+        if ctx.maximo_tokens is not None and tokens > ctx.maximo_tokens:
+            raise PresupuestoExcedido('tokens', ctx.maximo_tokens, tokens)
+
+        # Re-analizar hasta que una construcción empiece en el límite de un fragmento reutilizable. Se
+        # añaden fragmentos siguientes (en tandas crecientes) para que el análisis vea lo que sigue.
+        tanda = 1
+        while True:
+            combinado = BufferTokens(texto, buffer.tipos[:], buffer.inicios[:], buffer.fines[:])
+            limites = {nuevos: j}
+            for f in range(j, min(j + tanda, total)):
+                fragmento, base = fragmentos[f], bases[f] + delta
+                combinado.tipos.extend(fragmento.tipos)
+                combinado.inicios.extend(map(add, fragmento.inicios, repeat(base)))
+                combinado.fines.extend(map(add, fragmento.fines, repeat(base)))
+                limites[len(combinado)] = f + 1
+            pasos, reanudar = self._analizar(ctx, combinado, 0, len(combinado), limites, nuevos)
+            if reanudar is not None or j + tanda >= total: break
+            tanda *= 2
+        if reanudar is None: reanudar = total
+
+        abiertas = motor_lexico.aperturas_sin_cerrar(buffer, 0, nuevos, desconocidos)
+        for f in range(j, reanudar):
+            abiertas.extend(p + bases[f] + delta for p in fragmentos[f].abiertas)
+        fin_region = bases[reanudar] + delta if reanudar < total else len(texto)
+        nuevos_fragmentos = self._fragmentar(combinado, pasos, fin_region, abiertas)
+        self.estructuras += (sum(fragmento.exito for fragmento in nuevos_fragmentos)
+                             - sum(fragmento.exito for fragmento in fragmentos[k:reanudar]))
+        self.fragmentos[k:reanudar] = nuevos_fragmentos
+        self.tokens = tokens
+        self._cambio = combinar_cambios(self._cambio, k, reanudar, len(nuevos_fragmentos))
+        if k == 0:
+            self.prefijo = combinado.inicios[pasos[0][0]] if pasos else fin_region
+            self.abierto_prefijo = bool(abiertas) and abiertas[0] < self.prefijo
+        self.texto = texto
+        self.version += 1
+
+    def tomar_cambio(self):
+        # Fragmentos cambiados desde la llamada anterior, como (primero, fin en la lista de entonces, fin
+        # en la actual), o None si no cambió ninguno
+        cambio, self._cambio = self._cambio, None
+        return cambio
+
+    def cambios(self, completo=False):
+        # Fragmentos cambiados desde la llamada anterior, para un cliente que guarda la lista: desde y
+        # quitados son los de la lista anterior que se reemplazan por los del mensaje (quitados None:
+        # todos). prefijo y las longitudes ubican cada fragmento en el texto.
+        cambio, fragmentos = self.tomar_cambio(), self.fragmentos
+        if completo:
+            desde, quitados, nuevos = 0, None, fragmentos
+        elif cambio is None:
+            desde, quitados, nuevos = 0, 0, []
+        else:
+            desde, fin, hasta = cambio
+            quitados, nuevos = fin - desde, fragmentos[desde:hasta]
+        mensaje = {
+            'desde': desde,
+            'quitados': quitados,
+            'prefijo': self.prefijo,
+            'fragmentos': [{'longitud': fragmento.longitud, 'exito': fragmento.exito, 'mensaje': fragmento.mensaje,
+                            'tokens': fragmento.valores} for fragmento in nuevos]
+        }
+        if fragmentos:
+            total_errores = len(fragmentos) - self.estructuras
+            success, resumen = resumen_resultado(total_errores, self.estructuras)
+            mensaje.update(success=success, mensaje=resumen, total_estructuras=self.estructuras,
+                           total_errores=total_errores)
+        else:
+            # Sin construcciones el resultado es el aviso de texto vacío o sin tokens, con su error
+            resultado = self.resultado()
+            for clave in ('success', 'mensaje', 'errores', 'total_estructuras', 'total_errores'):
+                mensaje[clave] = resultado[clave]
+        return mensaje
+
+    @staticmethod
+    def _analizar(ctx, buffer, pos, n, limites=None, minimo=0):
+        # Construcciones de nivel superior como (inicio, fin, exito, diagnostico). Con límites, se detiene
+        # al llegar (desde minimo en adelante) al inicio de un fragmento que se puede reutilizar.
+        pasos = []
+        while pos < n:
+            if limites is not None and pos >= minimo and pos in limites:
+                return pasos, limites[pos]
+            if pos > ctx.proximo_control: ctx.comprobar_presupuesto(pos)
+            exito, siguiente, diagnostico = motor_sintactico.analizar_construccion(ctx, buffer, pos)
+            pasos.append((pos, siguiente, exito, diagnostico))
+            pos = siguiente
+        return pasos, None
+
+    @staticmethod
+    def _fragmentar(buffer, pasos, fin_texto, abiertas):
+        texto, fragmentos = buffer.texto, []
+        for indice, (inicio, fin, exito, diagnostico) in enumerate(pasos):
+            base = buffer.inicios[inicio]
+            siguiente = buffer.inicios[pasos[indice + 1][0]] if indice + 1 < len(pasos) else fin_texto
+            fragmento = Fragmento()
+            fragmento.longitud = siguiente - base
+            fragmento.tipos = buffer.tipos[inicio:fin]
+            inicios, fines = buffer.inicios[inicio:fin], buffer.fines[inicio:fin]
+            fragmento.valores = [texto[a:b] for a, b in zip(inicios, fines)]
+            fragmento.inicios = array(inicios.typecode, map(sub, inicios, repeat(base)))
+            fragmento.fines = array(fines.typecode, map(sub, fines, repeat(base)))
+            fragmento.exito = exito
+            # Se redacta mientras el buffer existe; el fragmento sólo guarda sus propios tokens
+            fragmento.mensaje = ('✅ ' if exito else '❌ ') + redactar(diagnostico, buffer, prefijo=False)
+            fragmento.abiertas = tuple(p - base for p in abiertas[bisect_left(abiertas, base):
+                                                                  bisect_left(abiertas, siguiente)])
+            fragmentos.append(fragmento)
+        return fragmentos
+
+    def resultado(self):
+        if not self.fragmentos:
+            if not self.texto or self.texto.isspace():
+                return resultado_vacio('No se proporcionó código para analizar', 'Texto vacío o solo espacios')
+            return resultado_vacio('No se encontraron tokens válidos en el código', 'No se encontraron tokens válidos')
+        errores, estructuras, tokens = [], [], []
+        for fragmento in self.fragmentos:
+            (estructuras if fragmento.exito else errores).append(fragmento.mensaje)
+            tokens.extend(fragmento.valores)
+        return construir_resultado(errores, estructuras, tokens)
+
+
+class CanalDocumento:
+    """Documento en vivo: acepta ediciones sin esperar al análisis y publica sólo lo que cambió.
+
+    Las ediciones se aplican al texto y se acumulan en una sola edición combinada
+    que analiza el suscriptor cuando le toca. Si mientras analiza llegan otras, ese
+    resultado ya es viejo y no se publica: se sigue con las nuevas y sólo se envía
+    la última versión, con todos los fragmentos cambiados desde el mensaje anterior.
+    Cada análisis tiene el presupuesto de la última petición; si lo supera, o si
+    la edición no se puede aplicar, se publica el aviso en lugar de los fragmentos
+    y el documento queda vacío hasta la edición siguiente.
+    """
+
+    def __init__(self, texto='', presupuesto=None):
+        self.documento = DocumentoIncremental(texto, presupuesto)
+        self.texto = texto
+        self.presupuesto = presupuesto
+        self.version = 1
+        # Edición combinada sin analizar, sobre documento.texto (ver combinar_cambios), o el texto entero
+        self._pendiente, self._reemplazo = None, False
+        # Versión del último mensaje de la suscripción actual (None: el siguiente lleva el documento entero)
+        self._suscripcion, self._publicada = 0, None
+        self._condicion = threading.Condition()
+
+    def reemplazar(self, texto, presupuesto=None):
+        with self._condicion:
+            self.texto, self._pendiente, self._reemplazo = texto, None, True
+            self.presupuesto = presupuesto
+            self.version += 1
+            self._condicion.notify_all()
+            return self.version
+
+    def editar(self, version, ediciones, presupuesto=None):
+        # Ediciones (inicio, fin, texto) sobre `version`, en caracteres y en orden. Devuelve la versión
+        # nueva, o None si el canal ya no está en esa versión (el cliente debe reenviar el texto).
+        with self._condicion:
+            if version != self.version: return None
+            texto, pendiente = self.texto, self._pendiente
+            for inicio, fin, reemplazo in ediciones:
+                if not 0 <= inicio <= fin <= len(texto):
+                    raise ValueError(f"Rango de edición fuera del documento: [{inicio}, {fin})")
+                texto = texto[:inicio] + reemplazo + texto[fin:]
+                pendiente = combinar_cambios(pendiente, inicio, fin, len(reemplazo))
+            self.texto, self._pendiente, self.presupuesto = texto, pendiente, presupuesto
+            self.version += 1
+            self._condicion.notify_all()
+            return self.version
+
+    def suscribir(self):
+        # Una suscripción por canal: la nueva cierra la anterior y empieza por el documento entero
+        with self._condicion:
+            self._suscripcion += 1
+            self._publicada = None
+            self._condicion.notify_all()
+            return self._suscripcion
+
+    def siguiente(self, suscripcion, espera):
+        # Próximo mensaje de la suscripción: los cambios desde el anterior; None si en `espera`
+        # segundos no hubo ediciones, o CERRADO si otra suscripción la reemplazó
+        while True:
+            with self._condicion:
+                if suscripcion == self._suscripcion and self._publicada == self.version:
+                    self._condicion.wait(espera)
+                if suscripcion != self._suscripcion: return CERRADO
+                if self._publicada == self.version: return None
+            # Las ediciones siguen entrando mientras se analiza; el documento sólo lo toca un suscriptor a la vez
+            with self.documento.lock:
+                with self._condicion:
+                    if suscripcion != self._suscripcion: return CERRADO
+                    texto, version, pendiente, reemplazo = self.texto, self.version, self._pendiente, self._reemplazo
+                    self._pendiente, self._reemplazo = None, False
+                    presupuesto = self.presupuesto and self.presupuesto.iniciar()
+                fallo = self._aplicar(texto, pendiente, reemplazo, presupuesto)
+                with self._condicion:
+                    if suscripcion != self._suscripcion: return CERRADO
+                    # Llegaron ediciones durante el análisis: se descarta el resultado y se analizan
+                    if self.version != version: continue
+                    completo = self._publicada is None
+                    self._publicada = version
+                if fallo is not None: return self._abortado(version, fallo)
+                return {'version': version, **self.documento.cambios(completo)}
+
+    def _aplicar(self, texto, pendiente, reemplazo, presupuesto):
+        # Devuelve el PresupuestoExcedido si el análisis se abortó, la excepción si falló, o None
+        documento = self.documento
+        try:
+            try:
+                if reemplazo:
+                    documento.reemplazar(texto, presupuesto)
+                elif pendiente is not None:
+                    inicio, fin, fin_nuevo = pendiente
+                    documento.editar(inicio, fin, texto[inicio:fin_nuevo], presupuesto)
+            except PresupuestoExcedido:
+                raise
+            except Exception:
+                # Un fallo a mitad de una edición puede dejar el documento incoherente: se rehace desde el texto
+                documento.reemplazar(texto, presupuesto)
+        except Exception as fallo:
+            # Como el análisis completo, no se guarda nada de lo analizado: el documento se vacía y la
+            # siguiente edición lo vuelve a analizar entero desde el texto
+            documento.reemplazar('')
+            with self._condicion:
+                self._reemplazo = True
+            return fallo
+        return None
+
+    def _abortado(self, version, fallo):
+        # Mensaje con el aviso del análisis abortado o fallido: el cliente se queda sin fragmentos
+        self.documento.tomar_cambio()
+        if isinstance(fallo, PresupuestoExcedido):
+            resultado = resultado_presupuesto_excedido(fallo)
+        else:
+            resultado = resultado_vacio(f'Error en el análisis incremental: {fallo}', f'Error interno: {fallo}')
+        mensaje = {'version': version, 'desde': 0, 'quitados': None, 'prefijo': 0, 'fragmentos': []}
+        for clave in ('success', 'mensaje', 'errores', 'total_estructuras', 'total_errores', 'presupuesto_excedido'):
+            if clave in resultado: mensaje[clave] = resultado[clave]
+        return mensaje
+
+
+class RegistroDocumentos:
+    # Documentos abiertos por los editores, expulsando el usado hace más tiempo. fabrica crea cada
+    # documento a partir de su texto (DocumentoIncremental, o CanalDocumento para los canales en vivo).
+    def __init__(self, maximo=256, fabrica=DocumentoIncremental):
+        self.maximo = maximo
+        self.fabrica = fabrica
+        self._documentos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def abrir(self, id_documento, texto, presupuesto=None):
+        # Si el texto supera el presupuesto, PresupuestoExcedido y el documento no se guarda
+        documento = self.fabrica(texto, presupuesto)
+        with self._lock:
+            self._guardar(id_documento, documento)
+        return documento
+
+    def obtener_o_abrir(self, id_documento):
+        # El documento, o uno vacío nuevo si no existe (creado bajo el lock: dos peticiones a la vez
+        # reciben el mismo)
+        with self._lock:
+            documento = self._documentos.get(id_documento)
+            if documento is None: documento = self.fabrica('')
+            self._guardar(id_documento, documento)
+            return documento
+
+    def _guardar(self, id_documento, documento):
+        self._documentos[id_documento] = documento
+        self._documentos.move_to_end(id_documento)
+        while len(self._documentos) > self.maximo:
+            self._documentos.popitem(last=False)
+
+    def obtener(self, id_documento):
+        with self._lock:
+            documento = self._documentos.get(id_documento)
+            if documento is not None: self._documentos.move_to_end(id_documento)
+            return documento
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from analizadorsintactico import analizarsintactico
+
+# Veces que se reenvía una fuente cuyo trabajador se perdió (pool reiniciado o proceso caído)
+MAXIMO_REINTENTOS = 2
+
+
+def iniciar_trabajador():
+    # Deja el proceso caliente: módulos importados y tablas de despacho del motor léxico construidas
+    analizarsintactico('int x = 0;\nif (x > 0) { x = x - 1; } else { x = x + 1; }')
+
+
+def _analizar_fuente(texto, presupuesto=None):
+    inicio = time.perf_counter()
+    resultado = analizarsintactico(texto, presupuesto=presupuesto)
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+class AnalizadorLotes:
+    """Analiza muchas fuentes en paralelo en un pool de procesos que se reutiliza entre lotes.
+
+    Cada lote tiene como mucho `concurrencia` fuentes en curso y cada fuente un
+    tiempo límite. Un trabajador que se pasa del límite no se puede interrumpir,
+    así que se reemplaza el pool y se reenvían las fuentes que estaban en curso.
+    """
+
+    def __init__(self, trabajadores=None, tiempo_limite=10.0):
+        self.trabajadores = trabajadores or os.cpu_count() or 1
+        self.tiempo_limite = tiempo_limite
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _obtener_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.trabajadores, initializer=iniciar_trabajador)
+            return self._pool
+
+    def ejecutor(self):
+        # El pool, para repartir otros trabajos (p. ej. los tramos de analizar_programa_paralelo)
+        return self._obtener_pool()
+
+    def _reiniciar_pool(self, pool):
+        with self._lock:
+            if self._pool is not pool: return
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        terminar = getattr(pool, 'terminate_workers', None)
+        if terminar is not None:
+            terminar()
+        else:
+            # Antes de Python 3.14 no hay forma pública de matar a los trabajadores ocupados
+            for proceso in list((getattr(pool, '_processes', None) or {}).values()):
+                proceso.terminate()
+
+    def analizar(self, fuentes, concurrencia=None, tiempo_limite=None, presupuesto=None):
+        # fuentes: lista de (nombre, texto). Devuelve un resultado por fuente, en el mismo orden. Con un
+        # presupuesto cuyo plazo sea menor que el tiempo límite, las fuentes lentas terminan con un
+        # resultado parcial en el trabajador en lugar de obligar a reemplazar el pool.
+        concurrencia = max(1, min(concurrencia or self.trabajadores, self.trabajadores))
+        tiempo_limite = tiempo_limite or self.tiempo_limite
+        resultados = [None] * len(fuentes)
+        intentos = [0] * len(fuentes)
+        pendientes = deque(range(len(fuentes)))
+        en_curso = {}
+
+        while pendientes or en_curso:
+            pool = self._obtener_pool()
+            try:
+                while pendientes and len(en_curso) < concurrencia:
+                    i = pendientes.popleft()
+                    en_curso[pool.submit(_analizar_fuente, fuentes[i][1], presupuesto)] = (i, time.monotonic() + tiempo_limite)
+            except (BrokenProcessPool, RuntimeError):
+                # El pool se rompió o lo reinició otro lote mientras se enviaba: se reenvía al siguiente
+                pendientes.appendleft(i)
+                self._reiniciar_pool(pool)
+                continue
+
+            espera = max(0.0, min(limite for _, limite in en_curso.values()) - time.monotonic())
+            hechos, _ = wait(en_curso, timeout=espera, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                i, _ = en_curso.pop(futuro)
+                nombre = fuentes[i][0]
+                try:
+                    resultado, tiempo_ms = futuro.result()
+                    resultados[i] = {'nombre': nombre, 'resultado': resultado, 'tiempo_ms': round(tiempo_ms, 3)}
+                except (BrokenProcessPool, CancelledError):
+                    intentos[i] += 1
+                    if intentos[i] > MAXIMO_REINTENTOS:
+                        resultados[i] = {'nombre': nombre, 'error': 'El proceso de análisis terminó inesperadamente'}
+                    else:
+                        pendientes.append(i)
+                except Exception as e:
+                    resultados[i] = {'nombre': nombre, 'error': f'Error interno: {str(e)}'}
+
+            ahora = time.monotonic()
+            vencidos = [futuro for futuro, (_, limite) in en_curso.items() if limite <= ahora]
+            if vencidos:
+                for futuro in vencidos:
+                    i, _ = en_curso.pop(futuro)
+                    resultados[i] = {'nombre': fuentes[i][0], 'error': 'Tiempo límite excedido',
+                                     'tiempo_ms': round(tiempo_limite * 1000, 3)}
+                # Los trabajadores vencidos siguen ocupados: pool nuevo y se reenvía lo que estaba en curso
+                pendientes.extendleft(i for i, _ in en_curso.values())
+                en_curso.clear()
+                self._reiniciar_pool(pool)
+        return resultados
+
+    def cerrar(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None: pool.shutdown(wait=True, cancel_futures=True)
@@ -1,473 +1,1041 @@
-import re
-
-class GramaticaCompleta:
-    def __init__(self):
-        # Tokens regex optimizados
-        self.tokens_regex = {
-            'COMMENT_MULTI': r'/\*.*?\*/', 'COMMENT_SINGLE': r'//.*', 'STRING': r'"([^"\\]|\\.)*"',
-            'CHAR': r"'([^'\\]|\\.)'", 'LEFT_SHIFT_ASSIGN': r'<<=', 'RIGHT_SHIFT_ASSIGN': r'>>=',
-            'LEFT_SHIFT': r'<<', 'RIGHT_SHIFT': r'>>', 'INCREMENT': r'\+\+', 'DECREMENT': r'--',
-            'ARROW': r'->', 'LESSTHANOREQUAL': r'<=', 'GREATERTHANOREQUAL': r'>=', 'EQUALITY': r'==',
-            'NOTEQUAL': r'!=', 'LOGICALAND': r'&&', 'LOGICALOR': r'\|\|', 'PLUS_ASSIGN': r'\+=',
-            'MINUS_ASSIGN': r'-=', 'MULTIPLY_ASSIGN': r'\*=', 'DIVIDE_ASSIGN': r'/=', 'MODULO_ASSIGN': r'%=',
-            'BITWISE_AND_ASSIGN': r'&=', 'BITWISE_OR_ASSIGN': r'\|=', 'BITWISE_XOR_ASSIGN': r'\^=',
-            'ASSIGN': r'=', 'PLUS': r'\+', 'MINUS': r'-', 'MULTIPLY': r'\*', 'DIVIDE': r'/',
-            'MODULO': r'%', 'LESSTHAN': r'<', 'GREATERTHAN': r'>', 'NOT': r'!', 'BITWISE_AND': r'&',
-            'BITWISE_OR': r'\|', 'BITWISE_XOR': r'\^', 'BITWISE_NOT': r'~', 'LPAREN': r'\(',
-            'RPAREN': r'\)', 'LBRACE': r'\{', 'RBRACE': r'\}', 'LBRACKET': r'\[', 'RBRACKET': r'\]',
-            'SEMICOLON': r';', 'COMMA': r',', 'DOT': r'\.', 'QUESTION': r'\?', 'COLON': r':',
-            'FLOAT': r'\d+\.\d*([eE][+-]?\d+)?[fF]?|\d+[eE][+-]?\d+[fF]?|\d+[fF]', 'NUMBER': r'\d+',
-            'IDENTIFIER': r'[a-zA-Z_][a-zA-Z0-9_]*', 'WHITESPACE': r'\s+',
-        }
-        
-        self.palabras_reservadas = {'if','else','switch','case','default','while','for','do','break',
-            'continue','return','int','float','double','char','bool','void','true','false'}
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from operator import itemgetter
+
+from arbolsintactico import CAMPOS_NODO, A, ArbolSintactico, nuevo_registro, serializar
+from diagnosticos import D, describir, desplazar, redactar
+from generadorll1 import (COMPLETAR, EXTERNO, FIN, NO_TERMINAL, TERMINAL, ERROR, Alternativa, Error, Externo, NoTerminal, Regla,
+                          Terminal, generar)
+from motorlexico import BufferTokens, T, TipoToken, ValoresTokens, motor_lexico
+
+# Conjuntos de tipos de token (códigos enteros) usados por la gramática
+TIPOS_DATO = frozenset({T.INT, T.FLOAT, T.DOUBLE, T.CHAR, T.BOOL, T.VOID})
+OPERADORES_ASIGNACION = frozenset({T.ASSIGN, T.PLUS_ASSIGN, T.MINUS_ASSIGN, T.MULTIPLY_ASSIGN, T.DIVIDE_ASSIGN,
+    T.MODULO_ASSIGN, T.BITWISE_AND_ASSIGN, T.BITWISE_OR_ASSIGN, T.BITWISE_XOR_ASSIGN,
+    T.LEFT_SHIFT_ASSIGN, T.RIGHT_SHIFT_ASSIGN})
+OPERADORES_UNARIOS = frozenset({T.INCREMENT, T.DECREMENT, T.PLUS, T.MINUS, T.NOT, T.BITWISE_NOT})
+CONSTANTES_CASE = frozenset({T.NUMBER, T.FLOAT, T.CHAR, T.TRUE, T.FALSE})
+LITERALES = CONSTANTES_CASE | {T.STRING}
+ACCESO_MIEMBRO = frozenset({T.DOT, T.ARROW})
+SUFIJOS = frozenset({T.INCREMENT, T.DECREMENT})
+
+# Operadores binarios por nivel de precedencia, de menor a mayor. Para soportar un operador
+# nuevo basta con añadir su tipo de token al nivel que le corresponde (o un nivel nuevo).
+NIVELES_BINARIOS = [
+    ('lógica OR', (T.LOGICALOR,)),
+    ('lógica AND', (T.LOGICALAND,)),
+    ('OR a nivel de bits', (T.BITWISE_OR,)),
+    ('XOR a nivel de bits', (T.BITWISE_XOR,)),
+    ('AND a nivel de bits', (T.BITWISE_AND,)),
+    ('de igualdad', (T.EQUALITY, T.NOTEQUAL)),
+    ('relacional', (T.LESSTHAN, T.GREATERTHAN, T.LESSTHANOREQUAL, T.GREATERTHANOREQUAL)),
+    ('de desplazamiento', (T.LEFT_SHIFT, T.RIGHT_SHIFT)),
+    ('aditiva', (T.PLUS, T.MINUS)),
+    ('multiplicativa', (T.MULTIPLY, T.DIVIDE, T.MODULO)),
+]
+POTENCIA_ASIGNACION, POTENCIA_TERNARIO = 1, 2
+OPERADORES_BINARIOS = {tipo: (potencia, nombre)
+                       for potencia, (nombre, tipos) in enumerate(NIVELES_BINARIOS, start=POTENCIA_TERNARIO + 1)
+                       for tipo in tipos}
+
+POTENCIAS_BINARIAS = {tipo: potencia for tipo, (potencia, _) in OPERADORES_BINARIOS.items()}
+# Por encima de todos los binarios: sólo un operando, con sus prefijos y sufijos
+POTENCIA_UNARIA = POTENCIA_TERNARIO + 1 + len(NIVELES_BINARIOS)
+
+PRIMERO_EXPRESION = OPERADORES_UNARIOS | LITERALES | {T.IDENTIFIER, T.LPAREN}
+
+# Fases de analizar_expresion, y puntos en los que retoma una expresión al completarse la
+# subexpresión que apiló, con los contextos que envuelven el diagnóstico si ésta falla (de dentro afuera)
+FASE_OPERANDO, FASE_SUFIJOS, FASE_OPERADORES = range(3)
+# Potencia mínima hasta la que cada token prolonga el operando que lo precede (-1: ninguna, como FIN).
+# Una hoja seguida de un token cuya potencia no llega a la mínima es la expresión entera: el camino
+# común, que se resuelve sin apilar nada.
+POTENCIAS_CONTINUACION = [POTENCIAS_BINARIAS.get(tipo, -1) for tipo in range(FIN + 1)]
+for tipo in OPERADORES_ASIGNACION: POTENCIAS_CONTINUACION[tipo] = POTENCIA_ASIGNACION
+POTENCIAS_CONTINUACION[T.QUESTION] = POTENCIA_TERNARIO
+for tipo in SUFIJOS | ACCESO_MIEMBRO | {T.LBRACKET, T.LPAREN}: POTENCIAS_CONTINUACION[tipo] = sys.maxsize
+(TRAS_BINARIO, TRAS_PARENTESIS, TRAS_INDICE, TRAS_PRIMER_ARGUMENTO, TRAS_ARGUMENTO, TRAS_TERNARIO_VERDADERO,
+ TRAS_TERNARIO_FALSO, TRAS_ASIGNACION) = range(8)
+CONTEXTOS_RETORNO = (
+    (),  # TRAS_BINARIO: 'Error después del operador {nombre del nivel}', con el nivel del operador
+    (D.EN_PARENTESIS,),
+    (D.EN_INDICE,),
+    (D.EN_ARGUMENTO, D.EN_ARGUMENTOS),
+    (D.EN_ARGUMENTO_SIGUIENTE, D.EN_ARGUMENTOS),
+    (D.EN_TERNARIO_VERDADERO,),
+    (D.EN_TERNARIO_FALSO,),
+    (D.DESPUES_ASIGNACION,),
+)
+
+# Gramática de las declaraciones y sentencias, de la que generadorll1 saca las tablas que ejecuta el
+# motor. Cada token esperado lleva el diagnóstico si falta, cada regla anidada el contexto que
+# envuelve su error, y cada alternativa el nodo del árbol y el código de éxito. Las expresiones
+# son un símbolo externo: las analiza analizar_expresion, por precedencia.
+PUNTO_Y_COMA = Terminal(T.SEMICOLON, D.ESPERABA_PUNTO_Y_COMA)
+VACIO = Alternativa(nodo=(A.VACIO, None))  # Parte omitida de un for: los hijos del for son siempre cuatro
+
+
+def _expresion(contexto):
+    return Externo('expresion', PRIMERO_EXPRESION, contexto)
+
+
+def _cabecera(palabra, tipo, en_condicion):
+    # palabra ( expresión ) de if, while y switch
+    return [Terminal(tipo, D.ESPERABA_PALABRA, palabra), Terminal(T.LPAREN, D.ESPERABA_PARENTESIS_TRAS, palabra),
+            _expresion(en_condicion)]
+
+
+def _salto(tipo, palabra):
+    retorno = [NoTerminal('retorno')] if tipo == T.RETURN else []
+    return Alternativa([Terminal(tipo, D.ESPERABA_SALTO), *retorno,
+                        Terminal(T.SEMICOLON, D.ESPERABA_PUNTO_Y_COMA_SALTO, palabra)],
+                       nodo=(A.SALTO, 0), exito=D.SENTENCIA_SALTO)
+
+
+def _rama(tipo, palabra, clase, exito, sentencias):
+    # case constante: sentencias... o default: sentencias...
+    constante = [Terminal(CONSTANTES_CASE, D.ESPERABA_CONSTANTE_CASE, hoja=A.LITERAL)] if tipo == T.CASE else []
+    return Regla([Alternativa([Terminal(tipo), *constante, Terminal(T.COLON, D.ESPERABA_DOS_PUNTOS, palabra),
+                               NoTerminal(sentencias)], nodo=(clase, 0), exito=exito)])
+
+
+def _sentencias_rama(contexto):
+    return Regla([Alternativa([NoTerminal('sentencia', contexto), NoTerminal(_sentencias_rama.nombres[contexto])]),
+                  Alternativa()], defecto=0)
+
+
+_sentencias_rama.nombres = {D.EN_SENTENCIA_CASE: 'sentencias_case', D.EN_SENTENCIA_DEFAULT: 'sentencias_default'}
+
+GRAMATICA = {
+    'declaracion': Regla([
+        Alternativa([Terminal(TIPOS_DATO, D.ESPERABA_TIPO), Terminal(T.IDENTIFIER, D.ESPERABA_IDENTIFICADOR),
+                     NoTerminal('resto_declaracion', en_linea=True)]),
+    ]),
+    # Lo que sigue al nombre decide la clase del nodo de la declaración (token: el identificador) y
+    # completa la declaración
+    'resto_declaracion': Regla([
+        Alternativa([Terminal(T.LBRACKET), Terminal(T.NUMBER, D.ESPERABA_TAMANO_ARRAY, hoja=A.LITERAL),
+                     Terminal(T.RBRACKET, D.ESPERABA_CORCHETE_CIERRE), NoTerminal('inicializacion_arreglo'),
+                     PUNTO_Y_COMA], nodo=(A.DECLARACION_ARREGLO, 1), exito=D.DECLARACION),
+        Alternativa([Terminal(T.ASSIGN), _expresion(D.EN_INICIALIZACION), PUNTO_Y_COMA], nodo=(A.DECLARACION, 1),
+                    exito=D.DECLARACION),
+        Alternativa([PUNTO_Y_COMA], nodo=(A.DECLARACION, 1), exito=D.DECLARACION),
+    ], defecto=2),
+    'inicializacion_arreglo': Regla([
+        Alternativa([Terminal(T.ASSIGN), NoTerminal('lista_inicializacion')]),
+        Alternativa(),
+    ]),
+    'lista_inicializacion': Regla([
+        Alternativa([Terminal(T.LBRACE, D.ESPERABA_LLAVE_INICIALIZACION), NoTerminal('valores'),
+                     Terminal(T.RBRACE, D.ESPERABA_LLAVE_CIERRE)], nodo=(A.LISTA_VALORES, 0)),
+    ]),
+    'valores': Regla([
+        Alternativa([Externo('lista_valores', PRIMERO_EXPRESION, D.EN_LISTA_VALORES)]),
+        Alternativa(),
+    ], defecto=0),
+
+    # Una sentencia que no empieza por palabra clave ni llave es una sentencia de expresión
+    'sentencia': Regla([
+        Alternativa([Terminal(T.LBRACE, D.ESPERABA_LLAVE_APERTURA), NoTerminal('elementos'),
+                     Terminal(T.RBRACE, D.ESPERABA_LLAVE_CIERRE)], nodo=(A.BLOQUE, 0), exito=D.BLOQUE),
+        Alternativa([*_cabecera('if', T.IF, D.EN_CONDICION_IF),
+                     Terminal(T.RPAREN, D.ESPERABA_PARENTESIS_CONDICION), NoTerminal('sentencia', D.EN_CUERPO_IF),
+                     NoTerminal('sino')], nodo=(A.IF, 0), exito=D.SENTENCIA_IF),
+        Alternativa([*_cabecera('switch', T.SWITCH, D.EN_EXPRESION_SWITCH),
+                     Terminal(T.RPAREN, D.ESPERABA_PARENTESIS_SWITCH), Terminal(T.LBRACE, D.ESPERABA_LLAVE_SWITCH),
+                     NoTerminal('ramas'), Terminal(T.RBRACE, D.ESPERABA_LLAVE_CIERRE_SWITCH)],
+                    nodo=(A.SWITCH, 0), exito=D.SENTENCIA_SWITCH),
+        Alternativa([*_cabecera('while', T.WHILE, D.EN_CONDICION_WHILE),
+                     Terminal(T.RPAREN, D.ESPERABA_PARENTESIS_CONDICION), NoTerminal('sentencia', D.EN_CUERPO_WHILE)],
+                    nodo=(A.WHILE, 0), exito=D.SENTENCIA_WHILE),
+        Alternativa([Terminal(T.FOR, D.ESPERABA_PALABRA, 'for'), Terminal(T.LPAREN, D.ESPERABA_PARENTESIS_TRAS, 'for'),
+                     NoTerminal('inicializacion_for'),
+                     Terminal(T.SEMICOLON, D.ESPERABA_PUNTO_Y_COMA_INICIALIZACION_FOR), NoTerminal('condicion_for'),
+                     Terminal(T.SEMICOLON, D.ESPERABA_PUNTO_Y_COMA_CONDICION_FOR), NoTerminal('actualizacion_for'),
+                     Terminal(T.RPAREN, D.ESPERABA_PARENTESIS_ACTUALIZACION), NoTerminal('sentencia', D.EN_CUERPO_FOR)],
+                    nodo=(A.FOR, 0), exito=D.SENTENCIA_FOR),
+        Alternativa([Terminal(T.DO, D.ESPERABA_PALABRA, 'do'), NoTerminal('sentencia', D.EN_CUERPO_DO),
+                     Terminal(T.WHILE, D.ESPERABA_WHILE_DO, 'while'),
+                     Terminal(T.LPAREN, D.ESPERABA_PARENTESIS_TRAS, 'while'), _expresion(D.EN_CONDICION_WHILE),
+                     Terminal(T.RPAREN, D.ESPERABA_PARENTESIS_CONDICION),
+                     Terminal(T.SEMICOLON, D.ESPERABA_PUNTO_Y_COMA_DO_WHILE)],
+                    nodo=(A.DO_WHILE, 0), exito=D.SENTENCIA_DO_WHILE),
+        _salto(T.BREAK, 'break'),
+        _salto(T.CONTINUE, 'continue'),
+        _salto(T.RETURN, 'return'),
+        Alternativa([NoTerminal('expresion_opcional'), PUNTO_Y_COMA],
+                    nodo=(A.SENTENCIA_EXPRESION, None), exito=D.SENTENCIA_EXPRESION),
+    ], defecto=9, al_final=Error(D.SIN_TOKENS), profundidad=True),
+    'elementos': Regla([
+        Alternativa([NoTerminal('declaracion', D.EN_DECLARACION_BLOQUE), NoTerminal('elementos')]),
+        Alternativa([NoTerminal('sentencia', D.EN_SENTENCIA_BLOQUE), NoTerminal('elementos')]),
+        Alternativa(),
+    ], defecto=1, preferida=0),  # char y float son tipos y también literales
+    'expresion_opcional': Regla([Alternativa([_expresion(D.EN_EXPRESION)]), Alternativa()], defecto=0),
+    'sino': Regla([Alternativa([Terminal(T.ELSE), NoTerminal('sentencia', D.EN_CUERPO_ELSE)]), Alternativa()]),
+    'inicializacion_for': Regla([Alternativa([_expresion(D.EN_INICIALIZACION_FOR)]), VACIO], defecto=0),
+    'condicion_for': Regla([Alternativa([_expresion(D.EN_CONDICION_FOR)]), VACIO], defecto=0),
+    'actualizacion_for': Regla([Alternativa([_expresion(D.EN_ACTUALIZACION_FOR)]),
+                                Alternativa(nodo=(A.VACIO, None), tambien={T.SEMICOLON})], defecto=0),
+    'retorno': Regla([Alternativa([_expresion(D.EN_EXPRESION_RETURN)]), Alternativa()], defecto=0),
+    'ramas': Regla([
+        Alternativa([NoTerminal('case'), NoTerminal('ramas')]),
+        Alternativa([NoTerminal('default'), NoTerminal('ramas')]),
+        Alternativa(),
+    ], defecto=Error(D.ESPERABA_CASE)),
+    'case': _rama(T.CASE, 'case', A.CASE, D.CASE, 'sentencias_case'),
+    'default': _rama(T.DEFAULT, 'default', A.DEFAULT, D.DEFAULT, 'sentencias_default'),
+    'sentencias_case': _sentencias_rama(D.EN_SENTENCIA_CASE),
+    'sentencias_default': _sentencias_rama(D.EN_SENTENCIA_DEFAULT),
+}
+gramatica_ll1 = generar(GRAMATICA)
+RAIZ_DECLARACION = gramatica_ll1.raiz('declaracion')
+RAIZ_SENTENCIA = gramatica_ll1.raiz('sentencia')
+
+# Conjuntos PRIMERO y SIGUIENTE de sentencia para la recuperación de errores
+PRIMERO_SENTENCIA = frozenset(gramatica_ll1.primeros['declaracion'] | gramatica_ll1.primeros['sentencia'])
+SIGUIENTE_SENTENCIA = frozenset(gramatica_ll1.siguientes['sentencia'])
+# Sincronización: tokens de SIGUIENTE(sentencia) que sólo pueden empezar una sentencia nueva
+# (las llaves y el ';' se tratan aparte, llevando la cuenta de la profundidad)
+SINCRONIZACION = (SIGUIENTE_SENTENCIA & PRIMERO_SENTENCIA) - PRIMERO_EXPRESION - {T.LBRACE, T.SEMICOLON}
+
+# Clase de nodo de las hojas de las expresiones según su tipo de token
+CLASES_HOJA = {tipo: A.IDENTIFICADOR if tipo == T.IDENTIFIER else A.LITERAL for tipo in LITERALES | {T.IDENTIFIER}}
+
+# Anidamiento máximo por defecto (sentencias y expresiones). El análisis no usa la pila de Python, así
+# que es un límite de trabajo y no de recursión: con profundidad=None sólo lo limita la memoria
+PROFUNDIDAD_MAXIMA = 200
+# Cada cuántos tokens avanzados se consulta el reloj cuando hay plazo
+TOKENS_ENTRE_COMPROBACIONES = 512
+# Caracteres por tramo cuando se tokeniza con presupuesto (entre tramos se revisan tokens y plazo)
+TRAMO_TOKENIZACION = 1 << 14
+# Tokens por tramo en el análisis en paralelo (por debajo de dos tramos se analiza aquí mismo)
+TOKENS_POR_TRAMO = 1 << 15
+
+MOTIVOS_PRESUPUESTO = {
+    'tokens': 'se superó el máximo de {limite} tokens',
+    'profundidad': 'se superó la profundidad máxima de anidamiento ({limite})',
+    'tiempo': 'se superó el tiempo límite de {limite} s',
+}
+
+
+class PresupuestoExcedido(Exception):
+    # Aborta el análisis desde cualquier profundidad; analizarsintactico la convierte en un resultado
+    def __init__(self, motivo, limite, posicion=None):
+        super().__init__(MOTIVOS_PRESUPUESTO[motivo].format(limite=limite))
+        self.motivo = motivo
+        self.limite = limite
+        self.posicion = posicion
+
+
+class Presupuesto:
+    # Límites de trabajo de un análisis: tokens, profundidad de anidamiento y segundos (None: sin
+    # límite). El plazo empieza a contar al crear la gramática, o antes si se llama a iniciar().
+    def __init__(self, tokens=None, profundidad=PROFUNDIDAD_MAXIMA, segundos=None, plazo=None):
+        self.tokens = tokens
+        self.profundidad = profundidad
+        self.segundos = segundos
+        self.plazo = plazo
+
+    def limitar(self, tokens=None, profundidad=None, segundos=None):
+        # Presupuesto con el menor de cada límite: lo pedido nunca supera lo configurado
+        def menor(actual, pedido):
+            if pedido is None: return actual
+            return pedido if actual is None else min(actual, pedido)
+        return Presupuesto(menor(self.tokens, tokens), menor(self.profundidad, profundidad),
+                           menor(self.segundos, segundos), self.plazo)
+
+    def iniciar(self):
+        # El mismo presupuesto con el plazo fijado desde ahora (p. ej. para toda una petición)
+        plazo = time.perf_counter() + self.segundos if self.segundos is not None else None
+        return Presupuesto(self.tokens, self.profundidad, self.segundos, plazo)
+
+
+# Cortes entre tramos del análisis en paralelo: a profundidad cero, tras un ';' o '}' que no siga
+# un 'else' o el 'while' de un do
+APERTURAS = (T.LBRACE, T.LPAREN, T.LBRACKET)
+CIERRES = (T.RBRACE, T.RPAREN, T.RBRACKET)
+FINALES_CORTE = frozenset({T.SEMICOLON, T.RBRACE})
+CONTINUACIONES_CORTE = frozenset({T.ELSE, T.WHILE})
+# Por tipo de token, 1 más lo que cambia la profundidad: acumulado, menos los tokens sumados, da
+# la profundidad
+PASOS_PROFUNDIDAD = bytes(2 if tipo in APERTURAS else 0 if tipo in CIERRES else 1 for tipo in range(256))
+
+
+def cortes_nivel_superior(tipos, tamano=None):
+    # Posiciones [0, ..., n] que parten los tokens en tramos de al menos `tamano` tokens que empiezan
+    # (casi siempre) en una construcción de nivel superior. Se busca un corte token a token sólo en
+    # una ventana tras cada objetivo; si no hay ninguno (p. ej. dentro de una función enorme), el
+    # tramo crece y se prueba un tramo más allá. La profundidad entre ventanas se cuenta con
+    # bytes.count, así que el coste es casi todo C. Un corte mal puesto no cambia el resultado,
+    # sólo lo que se reaprovecha del tramo (ver MotorSintactico.analizar_programa_paralelo).
+    if tamano is None: tamano = TOKENS_POR_TRAMO
+    datos, n = tipos.tobytes(), len(tipos)
+    ventana = max(1, tamano // 8)
+    cortes, profundidad, contado, objetivo = [0], 0, 0, tamano
+    while objetivo < n:
+        profundidad += (sum(datos.count(codigo, contado, objetivo) for codigo in APERTURAS)
+                        - sum(datos.count(codigo, contado, objetivo) for codigo in CIERRES))
+        contado, fin = objetivo, min(objetivo + ventana, n)
+        alturas = accumulate(datos[objetivo:fin].translate(PASOS_PROFUNDIDAD), initial=profundidad)
+        for pos, altura in enumerate(alturas, objetivo):
+            if (altura == pos - objetivo and pos < fin and tipos[pos - 1] in FINALES_CORTE
+                    and tipos[pos] not in CONTINUACIONES_CORTE):
+                cortes.append(pos)
+                profundidad, contado, objetivo = 0, pos, pos + tamano
+                break
+        else:
+            objetivo = fin + tamano
+    cortes.append(n)
+    return cortes
+
+
+def analizar_tramo(tipos, desplazamiento, profundidad=PROFUNDIDAD_MAXIMA, segundos=None):
+    # En un proceso trabajador: las construcciones de nivel superior de un tramo como (inicio, fin,
+    # exito, diagnostico) con índices del buffer entero. La gramática sólo mira los tipos de token,
+    # así que no hace falta el texto. Si se agota el presupuesto se devuelve lo analizado: el
+    # proceso principal vuelve a analizar la construcción y es él quien aborta.
+    tokens = BufferTokens('', tipos)
+    ctx = ContextoAnalisis(Presupuesto(profundidad=profundidad, segundos=segundos))
+    pasos, pos, n = [], 0, len(tokens)
+    try:
+        while pos < n:
+            if pos > ctx.proximo_control: ctx.comprobar_presupuesto(pos)
+            exito, siguiente, diagnostico = motor_sintactico.analizar_construccion(ctx, tokens, pos)
+            pasos.append((pos + desplazamiento, siguiente + desplazamiento, exito,
+                          desplazar(diagnostico, desplazamiento)))
+            pos = siguiente
+    except PresupuestoExcedido:
+        pass
+    return pasos
+
+
+# Presupuesto por defecto, compartido: Presupuesto no se modifica (limitar e iniciar crean otro)
+SIN_PRESUPUESTO = Presupuesto()
+
+
+class ContextoAnalisis:
+    """Estado de un análisis: diagnósticos, contadores del presupuesto y nodos del árbol.
+
+    Es lo único que cambia durante el análisis; se crea uno por llamada, y el
+    motor sintáctico, sin estado, se comparte entre hilos.
+    """
+    __slots__ = ('errores', 'estructuras_reconocidas', 'tokens_encontrados', 'presupuesto', 'maximo_tokens',
+                 'maxima_profundidad', 'plazo', 'profundidad', 'proximo_control', 'nodos')
+
+    def __init__(self, presupuesto=None, arbol=False):
         self.errores = []
         self.estructuras_reconocidas = []
         self.tokens_encontrados = []
+        if presupuesto is None: presupuesto = SIN_PRESUPUESTO
+        elif presupuesto.plazo is None: presupuesto = presupuesto.iniciar()
+        self.presupuesto = presupuesto
+        self.maximo_tokens = presupuesto.tokens
+        self.maxima_profundidad = presupuesto.profundidad if presupuesto.profundidad is not None else sys.maxsize
+        self.plazo = presupuesto.plazo
+        self.profundidad = 0
+        # Posición a partir de la cual toca volver a mirar el reloj (nunca, si no hay plazo)
+        self.proximo_control = 0 if self.plazo is not None else sys.maxsize
+        # Registro de nodos del árbol sintáctico, sólo si se pide (ver arbolsintactico)
+        self.nodos = nuevo_registro() if arbol else None
+
+    def comprobar_tokens(self, tokens):
+        if self.maximo_tokens is not None and len(tokens) > self.maximo_tokens:
+            raise PresupuestoExcedido('tokens', self.maximo_tokens, len(tokens))
+
+    def comprobar_presupuesto(self, pos):
+        # Se llama al pasar de la profundidad máxima o de proximo_control: las comprobaciones en el
+        # camino caliente son sólo dos comparaciones de enteros
+        if self.profundidad > self.maxima_profundidad:
+            raise PresupuestoExcedido('profundidad', self.maxima_profundidad, pos)
+        if self.plazo is not None:
+            if time.perf_counter() > self.plazo:
+                raise PresupuestoExcedido('tiempo', self.presupuesto.segundos, pos)
+            self.proximo_control = pos + TOKENS_ENTRE_COMPROBACIONES
+
+    def arbol(self):
+        # El árbol de lo analizado con arbol=True, o None
+        return None if self.nodos is None else ArbolSintactico.desde_registro(self.nodos)
+
+
+class MotorSintactico:
+    """Gramática del analizador, sin estado: cada método recibe el ContextoAnalisis de la llamada.
+
+    Las tablas de la gramática son constantes del módulo y las del léxico están
+    en el motor léxico, todas construidas una vez al importar; un mismo motor
+    sirve a la vez a cualquier número de hilos.
+    """
+    __slots__ = ('lexico',)
+
+    def __init__(self, lexico=motor_lexico):
+        self.lexico = lexico
+
+    def contexto(self, presupuesto=None, arbol=False):
+        return ContextoAnalisis(presupuesto, arbol)
+
+    def tokenizar(self, ctx, texto):
+        if ctx.maximo_tokens is None and ctx.plazo is None: return self.lexico.tokenizar(texto)
+        # Por tramos, para poder abortar sin tokenizar entero un texto enorme
+        buffer, pos, n = BufferTokens(texto), 0, len(texto)
+        while pos < n:
+            pos = self.lexico.escanear(texto, pos, min(pos + TRAMO_TOKENIZACION, n), buffer)
+            ctx.comprobar_tokens(buffer)
+            ctx.comprobar_presupuesto(len(buffer))
+        return buffer
+
+    def analizar_programa(self, ctx, tokens, inicio=0):
+        pos, n = inicio, len(tokens)
+        while pos < n:
+            if pos > ctx.proximo_control: ctx.comprobar_presupuesto(pos)
+            exito, pos, diagnostico = self.analizar_construccion(ctx, tokens, pos)
+            (ctx.estructuras_reconocidas if exito else ctx.errores).append(diagnostico)
+        if ctx.nodos is not None: ctx.nodos.extend((A.PROGRAMA, -1, inicio, pos, 0))
+        return True, pos, D.PROGRAMA
+
+    def analizar_programa_paralelo(self, ctx, tokens, ejecutor, tamano=None):
+        # Como analizar_programa, repartiendo los tramos de cortes_nivel_superior en un ejecutor de
+        # procesos. Se unen en orden y el resultado es idéntico al secuencial: de un tramo sólo se
+        # toman construcciones que terminan antes de su final (las que llegan al final pueden
+        # depender de los tokens siguientes, p. ej. un 'else'), a partir de la posición a la que
+        # llegó el análisis; lo que no se puede tomar de un tramo se analiza aquí. El árbol se
+        # construye siempre en secuencia.
+        n = len(tokens)
+        if tamano is None: tamano = TOKENS_POR_TRAMO
+        if ctx.nodos is not None or n < 2 * tamano: return self.analizar_programa(ctx, tokens)
+        cortes = cortes_nivel_superior(tokens.tipos, tamano)
+        if len(cortes) < 3: return self.analizar_programa(ctx, tokens)
+        segundos = None if ctx.plazo is None else max(0.0, ctx.plazo - time.perf_counter())
+        futuros = []
+        try:
+            for a, b in zip(cortes, cortes[1:]):
+                futuros.append(ejecutor.submit(analizar_tramo, tokens.tipos[a:b], a, ctx.presupuesto.profundidad, segundos))
+        except Exception:
+            # Ejecutor cerrado o roto: los tramos que no se enviaron se analizan aquí
+            pass
+        
+        pos, inicio_paso = 0, itemgetter(0)
+        try:
+            for b, futuro in zip(cortes[1:], futuros):
+                try:
+                    pasos = futuro.result()
+                except Exception:
+                    pasos = []
+                j, final = 0, b == n
+                while pos < b:
+                    if pos > ctx.proximo_control: ctx.comprobar_presupuesto(pos)
+                    if j < len(pasos) and pasos[j][0] < pos: j = bisect_left(pasos, pos, j, key=inicio_paso)
+                    if j < len(pasos) and pasos[j][0] == pos and (final or pasos[j][1] < b):
+                        _, pos, exito, diagnostico = pasos[j]
+                        j += 1
+                    else:
+                        exito, pos, diagnostico = self.analizar_construccion(ctx, tokens, pos)
+                    (ctx.estructuras_reconocidas if exito else ctx.errores).append(diagnostico)
+        finally:
+            for futuro in futuros: futuro.cancel()
+        return self.analizar_programa(ctx, tokens, pos) if pos < n else (True, pos, D.PROGRAMA)
+
+    def analizar_construccion(self, ctx, tokens, inicio=0):
+        # Una declaración o sentencia de nivel superior; si falla, la posición devuelta ya es la
+        # siguiente a la construcción rota
+        ctx.profundidad = 0
+        nodos = ctx.nodos
+        if nodos is not None: marca = len(nodos) // CAMPOS_NODO
+        raiz = RAIZ_DECLARACION if tokens.tipos[inicio] in TIPOS_DATO else RAIZ_SENTENCIA
+        exito, pos, diagnostico = self._ejecutar(ctx, tokens, inicio, raiz)
+        if exito: return True, pos, (diagnostico, inicio, None, None)
+        siguiente = self._sincronizar(tokens, inicio, pos)
+        if nodos is not None:
+            # Los nodos de la construcción rota se cambian por uno de error que la abarca entera
+            del nodos[marca * CAMPOS_NODO:]
+            nodos.extend((A.ERROR, pos if pos < len(tokens) else -1, inicio, siguiente, marca))
+        return False, siguiente, diagnostico
+
+    def _sincronizar(self, tokens, inicio, error):
+        # Recuperación en modo pánico: descarta la construcción rota desde el token del error hasta
+        # un ';' o '}' que la cierre, o hasta una palabra clave que empiece una sentencia nueva.
+        # Recorre una sola vez los tokens de la construcción, así que el coste total es lineal.
+        tipos, n = tokens.tipos, len(tokens)
+        profundidad, parentesis = 0, []  # llaves abiertas; por cada '(' abierto, si es cabecera de for
+        # 'else' (y el 'while' de un do) prolongan la construcción en lugar de empezar otra
+        continuaciones = {T.ELSE, T.WHILE} if tipos[inicio] == T.DO else {T.ELSE}
+        desde = max(error, inicio + 1)
+        for pos in range(inicio, n):
+            tipo = tipos[pos]
+            if tipo == T.LBRACE:
+                profundidad += 1
+                parentesis.clear()
+            elif tipo == T.RBRACE:
+                if profundidad:
+                    profundidad -= 1
+                    if not profundidad and pos >= desde and (pos + 1 >= n or tipos[pos + 1] not in continuaciones):
+                        return pos + 1
+            elif profundidad:
+                continue
+            elif tipo == T.LPAREN:
+                parentesis.append(pos > 0 and tipos[pos - 1] == T.FOR)
+            elif tipo == T.RPAREN:
+                if parentesis: parentesis.pop()
+            elif tipo in continuaciones:
+                continuaciones.discard(T.WHILE)
+            elif pos < desde:
+                continue
+            elif tipo == T.SEMICOLON:
+                if not (parentesis and parentesis[-1]) and (pos + 1 >= n or tipos[pos + 1] not in continuaciones):
+                    return pos + 1
+            elif tipo in SINCRONIZACION:
+                return pos
+        return n
+
+    def analizar_declaracion(self, ctx, tokens, inicio=0):
+        return self._ejecutar(ctx, tokens, inicio, RAIZ_DECLARACION)
+
+    def analizar_sentencia(self, ctx, tokens, inicio=0):
+        return self._ejecutar(ctx, tokens, inicio, RAIZ_SENTENCIA)
+
+    def _ejecutar(self, ctx, tokens, inicio, raiz):
+        # Analizador predictivo sobre las tablas de gramatica_ll1, con una pila explícita de
+        # producciones en curso: (instrucciones, siguiente instrucción, inicio, primer nodo, contexto).
+        # Un fallo desapila envolviendo el diagnóstico con el contexto de cada producción.
+        tipos, n, pos = tokens.tipos, len(tokens), inicio
+        nodos = ctx.nodos
+        pila = []
+        tabla, cuenta = raiz
+        simbolos, indice, desde, contexto = tabla[tipos[pos] if pos < n else FIN], 0, pos, None
+        marca = len(nodos) // CAMPOS_NODO if nodos is not None else 0
+        if cuenta and simbolos[0][0] != ERROR:
+            ctx.profundidad += 1
+            if ctx.profundidad > ctx.maxima_profundidad or pos > ctx.proximo_control:
+                ctx.comprobar_presupuesto(pos)
+        while True:
+            simbolo = simbolos[indice]
+            indice += 1
+            operacion = simbolo[0]
+            if operacion == TERMINAL:
+                if pos < n and tipos[pos] in simbolo[1]:
+                    if simbolo[4] is not None and nodos is not None:
+                        nodos.extend((simbolo[4], pos, pos, pos + 1, len(nodos) // CAMPOS_NODO))
+                    pos += 1
+                    continue
+                error = (simbolo[2], pos, simbolo[3], None)
+            elif operacion == EXTERNO:
+                if simbolo[1] == 'expresion': correcto, pos, error = self.analizar_expresion(ctx, tokens, pos)
+                else: correcto, pos, error = self.analizar_lista_valores(ctx, tokens, pos)
+                if correcto: continue
+                if simbolo[2] is not None: error = (simbolo[2], pos, None, error)
+            elif operacion == NO_TERMINAL:
+                produccion = simbolo[1][tipos[pos] if pos < n else FIN]
+                if produccion is None: continue
+                if simbolo[5] and produccion[0][0] != ERROR:
+                    ctx.profundidad += 1
+                    if ctx.profundidad > ctx.maxima_profundidad or pos > ctx.proximo_control:
+                        ctx.comprobar_presupuesto(pos)
+                # En cola de una producción sin nada más que hacer: no hace falta volver a ella
+                if not (simbolo[4] and contexto is None):
+                    pila.append((simbolos, indice, desde, marca, contexto))
+                simbolos, indice = produccion, 0
+                if simbolo[3]:
+                    contexto = None
+                else:
+                    contexto, desde = simbolo[2], pos
+                    if nodos is not None: marca = len(nodos) // CAMPOS_NODO
+                continue
+            elif operacion == COMPLETAR:
+                if simbolo[1] is not None and nodos is not None:
+                    nodos.extend((simbolo[1], -1 if simbolo[2] is None else desde + simbolo[2], desde, pos, marca))
+                if simbolo[4]: ctx.profundidad -= 1
+                if not pila: return True, pos, simbolo[3]
+                simbolos, indice, desde, marca, contexto = pila.pop()
+                continue
+            else:
+                error = (simbolo[1], pos, None, None)
+
+            while True:
+                if contexto is not None: error = (contexto, pos, None, error)
+                if not pila: return False, pos, error
+                simbolos, indice, desde, marca, contexto = pila.pop()
+
+    def analizar_expresion(self, ctx, tokens, inicio=0, potencia_minima=0):
+        # Precedencia por potencia de enlace: un operando (prefijos, primaria y sufijos) seguido de
+        # los operadores cuya potencia sea al menos potencia_minima. Sin recursión: cada subexpresión
+        # (entre paréntesis, índice, argumento o lado derecho de un operador) apila el estado de la
+        # expresión que la contiene, (punto de retorno, inicio, potencia mínima, marca, base, token del
+        # operador), así que el anidamiento sólo lo limitan la memoria y el presupuesto.
+        tipos, n, pos = tokens.tipos, len(tokens), inicio
+        nodos = ctx.nodos
+        if (pos < n and tipos[pos] in CLASES_HOJA
+                and POTENCIAS_CONTINUACION[tipos[pos + 1] if pos + 1 < n else FIN] < potencia_minima
+                and ctx.profundidad < ctx.maxima_profundidad and pos <= ctx.proximo_control):
+            if nodos is not None: nodos.extend((CLASES_HOJA[tipos[pos]], pos, pos, pos + 1, len(nodos) // CAMPOS_NODO))
+            return True, pos + 1, D.EXPRESION
+        pila = []
+        fase, marca, base, error = FASE_OPERANDO, 0, inicio, None
+        while True:
+            if fase == FASE_OPERANDO:
+                # Presupuesto: la profundidad sólo se descuenta al salir con éxito, porque un fallo
+                # aborta la construcción entera y analizar_construccion la vuelve a cero
+                ctx.profundidad += 1
+                if ctx.profundidad > ctx.maxima_profundidad or pos > ctx.proximo_control:
+                    ctx.comprobar_presupuesto(pos)
+                # Árbol: el operando empieza en el nodo `marca`; los prefijos se aplican tras los sufijos
+                if nodos is not None: marca = len(nodos) // CAMPOS_NODO
+                while pos < n and tipos[pos] in OPERADORES_UNARIOS: pos += 1
+                if pos >= n:
+                    error = (D.ESPERABA_EXPRESION, pos, None, None)
+                    break
+                base = pos
+                tipo = tipos[pos]
+                if tipo == T.IDENTIFIER or tipo in LITERALES:
+                    if nodos is not None: nodos.extend((CLASES_HOJA[tipo], pos, pos, pos + 1, marca))
+                    pos += 1
+                elif tipo == T.LPAREN:
+                    pila.append((TRAS_PARENTESIS, inicio, potencia_minima, marca, base, pos))
+                    pos += 1
+                    inicio, potencia_minima = pos, 0
+                    continue
+                else:
+                    error = (D.TOKEN_INESPERADO, pos, None, None)
+                    break
+                fase = FASE_SUFIJOS
+
+            if fase == FASE_SUFIJOS:
+                # Sufijos: índice, llamada, acceso a miembro e incremento/decremento
+                while pos < n:
+                    tipo = tipos[pos]
+                    if tipo == T.LBRACKET:
+                        pila.append((TRAS_INDICE, inicio, potencia_minima, marca, base, pos))
+                        fase = FASE_OPERANDO
+                        break
+                    elif tipo == T.LPAREN:
+                        if pos + 1 < n and tipos[pos + 1] != T.RPAREN:
+                            pila.append((TRAS_PRIMER_ARGUMENTO, inicio, potencia_minima, marca, base, pos))
+                            fase = FASE_OPERANDO
+                            break
+                        pos += 1
+                        if pos >= n:
+                            error = (D.ESPERABA_PARENTESIS_CIERRE, pos, None, None)
+                            break
+                        pos += 1
+                        if nodos is not None: nodos.extend((A.LLAMADA, pos - 2, base, pos, marca))
+                    elif tipo in ACCESO_MIEMBRO:
+                        pos += 1
+                        if pos >= n or tipos[pos] != T.IDENTIFIER:
+                            error = (D.ESPERABA_MIEMBRO, pos, None, None)
+                            break
+                        pos += 1
+                        if nodos is not None: nodos.extend((A.MIEMBRO, pos - 2, base, pos, marca))
+                    elif tipo in SUFIJOS:
+                        pos += 1
+                        if nodos is not None: nodos.extend((A.SUFIJO, pos - 1, base, pos, marca))
+                    else: break
+                if error is not None: break
+                if fase == FASE_OPERANDO:
+                    pos += 1
+                    inicio, potencia_minima = pos, 0
+                    continue
+                if nodos is not None:
+                    for prefijo in range(base - 1, inicio - 1, -1): nodos.extend((A.UNARIO, prefijo, prefijo, pos, marca))
+
+            # Operadores binarios (asociativos a izquierda), ternario y asignación (a derecha): de uno
+            # en uno, volviendo aquí al completar el lado derecho de cada uno
+            if pos < n:
+                tipo = tipos[pos]
+                potencia = POTENCIAS_BINARIAS.get(tipo)
+                if potencia is not None:
+                    retorno = TRAS_BINARIO if potencia >= potencia_minima else None
+                    potencia += 1
+                elif tipo == T.QUESTION and potencia_minima <= POTENCIA_TERNARIO:
+                    retorno, potencia = TRAS_TERNARIO_VERDADERO, 0
+                elif tipo in OPERADORES_ASIGNACION and potencia_minima <= POTENCIA_ASIGNACION:
+                    retorno, potencia = TRAS_ASIGNACION, POTENCIA_ASIGNACION
+                else:
+                    retorno = None
+                if retorno is not None:
+                    derecha = pos + 1
+                    if (retorno != TRAS_TERNARIO_VERDADERO and derecha < n and tipos[derecha] in CLASES_HOJA
+                            and POTENCIAS_CONTINUACION[tipos[derecha + 1] if derecha + 1 < n else FIN] < potencia
+                            and ctx.profundidad < ctx.maxima_profundidad and derecha <= ctx.proximo_control):
+                        # Lado derecho de una sola hoja
+                        if nodos is not None:
+                            nodos.extend((CLASES_HOJA[tipos[derecha]], derecha, derecha, derecha + 1,
+                                          len(nodos) // CAMPOS_NODO,
+                                          A.BINARIO if retorno == TRAS_BINARIO else A.ASIGNACION, pos, inicio,
+                                          derecha + 1, marca))
+                        pos = derecha + 1
+                        fase = FASE_OPERADORES
+                        continue
+                    pila.append((retorno, inicio, potencia_minima, marca, base, pos))
+                    pos += 1
+                    inicio, potencia_minima, fase = pos, potencia, FASE_OPERANDO
+                    continue
+
+            # Expresión completa: se retoma la que la contiene
+            ctx.profundidad -= 1
+            if not pila: return True, pos, D.EXPRESION
+            retorno, inicio, potencia_minima, marca, base, simbolo = pila.pop()
+            if retorno == TRAS_BINARIO:
+                if nodos is not None: nodos.extend((A.BINARIO, simbolo, inicio, pos, marca))
+                fase = FASE_OPERADORES
+            elif retorno == TRAS_PARENTESIS:
+                if pos >= n or tipos[pos] != T.RPAREN:
+                    error = (D.ESPERABA_PARENTESIS_CIERRE, pos, None, None)
+                    break
+                pos += 1
+                fase = FASE_SUFIJOS
+            elif retorno == TRAS_INDICE:
+                if pos >= n or tipos[pos] != T.RBRACKET:
+                    error = (D.ESPERABA_CORCHETE_CIERRE, pos, None, None)
+                    break
+                pos += 1
+                if nodos is not None: nodos.extend((A.INDICE, simbolo, base, pos, marca))
+                fase = FASE_SUFIJOS
+            elif retorno == TRAS_PRIMER_ARGUMENTO or retorno == TRAS_ARGUMENTO:
+                if pos < n and tipos[pos] == T.COMMA:
+                    pila.append((TRAS_ARGUMENTO, inicio, potencia_minima, marca, base, simbolo))
+                    pos += 1
+                    inicio, potencia_minima, fase = pos, 0, FASE_OPERANDO
+                    continue
+                if pos >= n or tipos[pos] != T.RPAREN:
+                    error = (D.ESPERABA_PARENTESIS_CIERRE, pos, None, None)
+                    break
+                pos += 1
+                if nodos is not None: nodos.extend((A.LLAMADA, simbolo, base, pos, marca))
+                fase = FASE_SUFIJOS
+            elif retorno == TRAS_TERNARIO_VERDADERO:
+                if pos >= n or tipos[pos] != T.COLON:
+                    error = (D.ESPERABA_DOS_PUNTOS_TERNARIO, pos, None, None)
+                    break
+                pila.append((TRAS_TERNARIO_FALSO, inicio, potencia_minima, marca, base, simbolo))
+                pos += 1
+                inicio, potencia_minima, fase = pos, POTENCIA_TERNARIO, FASE_OPERANDO
+            else:
+                if nodos is not None:
+                    clase = A.TERNARIO if retorno == TRAS_TERNARIO_FALSO else A.ASIGNACION
+                    nodos.extend((clase, simbolo, inicio, pos, marca))
+                fase = FASE_OPERADORES
+
+        # Fallo: cada expresión apilada envuelve el diagnóstico según dónde estaba su subexpresión
+        while pila:
+            retorno, _, _, _, _, simbolo = pila.pop()
+            if retorno == TRAS_BINARIO:
+                error = (D.DESPUES_OPERADOR, pos, OPERADORES_BINARIOS[tipos[simbolo]][1], error)
+            else:
+                for contexto in CONTEXTOS_RETORNO[retorno]: error = (contexto, pos, None, error)
+        return False, pos, error
+
+    def analizar_lista_argumentos(self, ctx, tokens, inicio=0):
+        return self._analizar_lista_expresiones(ctx, tokens, inicio, D.EN_ARGUMENTO, D.EN_ARGUMENTO_SIGUIENTE,
+                                                D.LISTA_ARGUMENTOS)
+
+    def analizar_lista_valores(self, ctx, tokens, inicio=0):
+        return self._analizar_lista_expresiones(ctx, tokens, inicio, D.EN_VALOR, D.EN_VALOR_SIGUIENTE, D.LISTA_VALORES)
+
+    def _analizar_lista_expresiones(self, ctx, tokens, inicio, en_primero, en_siguiente, codigo_exito):
+        tipos, n, pos = tokens.tipos, len(tokens), inicio
+        exito, pos, error = self.analizar_expresion(ctx, tokens, pos)
+        if not exito: return False, pos, (en_primero, pos, None, error)
+        
+        while pos < n and tipos[pos] == T.COMMA:
+            pos += 1
+            exito, pos, error = self.analizar_expresion(ctx, tokens, pos)
+            if not exito: return False, pos, (en_siguiente, pos, None, error)
+        return True, pos, codigo_exito
+
+    def analizar(self, texto, tokens=None, fases=None, presupuesto=None, diagnosticos=False, arbol=None,
+                 paralelo=None):
+        # Análisis completo de texto, con el resultado en el formato de la API (ver analizarsintactico)
+        if arbol is True: arbol = 'columnas'
+        ctx = ContextoAnalisis(presupuesto, arbol=bool(arbol))
+        registros = []
+        
+        try:
+            if not texto or texto.isspace():
+                registros.append((D.TEXTO_VACIO, None, None, None))
+                resultado = resultado_vacio('No se proporcionó código para analizar', 'Texto vacío o solo espacios')
+            else:
+                try:
+                    # Sin recortar los espacios: dan los mismos tokens y las posiciones quedan en texto
+                    if tokens is None: tokens = self.tokenizar(ctx, texto)
+                    else: ctx.comprobar_tokens(tokens)
+                    if fases: fases('tokenizacion')
+                    # Los valores de los tokens se recortan del texto al serializar el resultado
+                    ctx.tokens_encontrados = ValoresTokens(tokens)
+                    
+                    if not tokens:
+                        registros.append((D.SIN_TOKENS_VALIDOS, None, None, None))
+                        resultado = resultado_vacio('No se encontraron tokens válidos en el código',
+                                                    'No se encontraron tokens válidos')
+                    else:
+                        if paralelo is not None:
+                            exito, final_pos, _ = self.analizar_programa_paralelo(ctx, tokens, paralelo)
+                        else:
+                            exito, final_pos, _ = self.analizar_programa(ctx, tokens, 0)
+                        
+                        if final_pos < len(tokens):
+                            tokens_restantes = tokens.valores(final_pos, min(final_pos + 5, len(tokens)))
+                            ctx.errores.append((D.TOKENS_NO_PROCESADOS, final_pos, ', '.join(tokens_restantes), None))
+                        if fases: fases('analisis')
+                        
+                        resultado = _redactar_resultado(ctx, tokens)
+                        if arbol: resultado['arbol'] = serializar(ctx.arbol(), arbol)
+                        registros = ctx.errores
+                        if fases: fases('ensamblado')
+                except PresupuestoExcedido as e:
+                    resultado = _redactar_resultado(ctx, tokens, e)
+                    registros = ctx.errores + [(D.PRESUPUESTO_EXCEDIDO, None, str(e), None)]
+            
+        except Exception as e:
+            registros = [(D.ERROR_INTERNO, None, str(e), None)]
+            resultado = {'success': False, 'mensaje': f'Error interno en el análisis sintáctico: {str(e)}',
+                         'errores': [f"Error interno: {str(e)}"], 'resultados_sintacticos': [],
+                         'tokens_lexicos': [], 'total_estructuras': 0, 'total_errores': 1}
+        
+        if arbol: resultado.setdefault('arbol', None)
+        if diagnosticos:
+            resultado['diagnosticos'] = [describir(registro, tokens) for registro in registros]
+        return resultado
+
+
+# Motor compartido por todo el proceso, como motor_lexico
+motor_sintactico = MotorSintactico()
+
+
+class GramaticaCompleta(ContextoAnalisis):
+    # Interfaz anterior: un contexto con los métodos del motor compartido ya ligados, que devuelven
+    # (exito, pos, mensaje) con el mensaje redactado y dejan redactados, con su prefijo ✅/❌, los
+    # registros de errores y estructuras_reconocidas. Como la clase original, tokenizar devuelve una
+    # lista de diccionarios {tipo, valor, posicion} y cada nivel de expresión responde con su propio
+    # mensaje; la conversión a BufferTokens se hace aquí, en la frontera. Los niveles se analizan por
+    # potencia, así que también aceptan los operadores de bits y de desplazamiento, que la original no
+    # tenía.
+    __slots__ = ('_lista', '_buffer')
+
+    def __init__(self, presupuesto=None, arbol=False):
+        super().__init__(presupuesto, arbol)
+        self._lista = self._buffer = None
+
+    def _convertir(self, tokens):
+        # Lista de diccionarios a BufferTokens, sobre un texto con los valores separados por espacios.
+        # Se guarda la última: los métodos se llaman unos a otros con la misma lista.
+        if isinstance(tokens, BufferTokens): return tokens
+        if tokens is not self._lista or len(tokens) != len(self._buffer):
+            valores = [token['valor'] for token in tokens]
+            inicios = array('I', accumulate((len(valor) + 1 for valor in valores[:-1]), initial=0) if valores else ())
+            fines = array('I', (inicio + len(valor) for inicio, valor in zip(inicios, valores)))
+            tipos = array('B', (TipoToken[token['tipo']] for token in tokens))
+            self._lista, self._buffer = tokens, BufferTokens(' '.join(valores), tipos, inicios, fines)
+        return self._buffer
+
+    def _redactado(self, tokens, inicio, resultado, mensaje=None):
+        # mensaje: el que daba la clase original si tuvo éxito, en lugar del del motor
+        exito, pos, registro = resultado
+        if not isinstance(registro, tuple): registro = (registro, inicio, None, None)
+        for registros in (self.errores, self.estructuras_reconocidas):
+            registros[:] = [redactar(r, tokens) if isinstance(r, tuple) else r for r in registros]
+        if exito and mensaje is not None: return exito, pos, mensaje
+        return exito, pos, redactar(registro, tokens, prefijo=False)
+
+    def _sentencia_de(self, tokens, inicio, tipos, error):
+        # Las sentencias que empiezan por una palabra clave: el motor las elige por ese token
+        tokens = self._convertir(tokens)
+        if inicio >= len(tokens) or tokens.tipos[inicio] not in tipos: return False, inicio, error
+        return self.analizar_sentencia(tokens, inicio)
+
+    def _expresion_desde(self, tokens, inicio, potencia_minima, mensaje):
+        tokens = self._convertir(tokens)
+        resultado = motor_sintactico.analizar_expresion(self, tokens, inicio, potencia_minima)
+        return self._redactado(tokens, inicio, resultado, mensaje)
 
     def tokenizar(self, texto):
-        token_regex = '|'.join(f'(?P<{nombre}>{patron})' for nombre, patron in self.tokens_regex.items())
-        tokens = []
-        for match in re.finditer(token_regex, texto, re.DOTALL):
-            tipo, valor = match.lastgroup, match.group()
-            if tipo in ['WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI']: continue
-            if tipo == 'IDENTIFIER' and valor.lower() in self.palabras_reservadas:
-                tokens.append({'tipo': valor.upper(), 'valor': valor, 'posicion': match.start()})
-            else: tokens.append({'tipo': tipo, 'valor': valor, 'posicion': match.start()})
-        return tokens
+        buffer = motor_sintactico.tokenizar(self, texto)
+        return [buffer.token(i) for i in range(len(buffer))]
 
     def analizar_programa(self, tokens, inicio=0):
-        pos = inicio
+        # Con la recuperación de la clase original: tras un error se salta un solo token
+        tokens, pos = self._convertir(tokens), inicio
         while pos < len(tokens):
-            if tokens[pos]['tipo'] in ['INT','FLOAT','DOUBLE','CHAR','BOOL','VOID']:
-                exito, nuevo_pos, mensaje = self.analizar_declaracion(tokens, pos)
-            else:
-                exito, nuevo_pos, mensaje = self.analizar_sentencia(tokens, pos)
-            
+            if tokens.tipos[pos] in TIPOS_DATO: exito, siguiente, mensaje = self.analizar_declaracion(tokens, pos)
+            else: exito, siguiente, mensaje = self.analizar_sentencia(tokens, pos)
             if exito:
                 self.estructuras_reconocidas.append(f"✅ {mensaje}")
-                pos = nuevo_pos
+                pos = siguiente
             else:
                 self.errores.append(f"❌ {mensaje}")
                 pos += 1
         return True, pos, "Programa analizado"
 
+    def analizar_construccion(self, tokens, inicio=0):
+        tokens = self._convertir(tokens)
+        return self._redactado(tokens, inicio, motor_sintactico.analizar_construccion(self, tokens, inicio))
+
+    def _sincronizar(self, tokens, inicio, error):
+        return motor_sintactico._sincronizar(self._convertir(tokens), inicio, error)
+
     def analizar_declaracion(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens) or tokens[pos]['tipo'] not in ['INT','FLOAT','DOUBLE','CHAR','BOOL','VOID']:
-            return False, pos, "Se esperaba tipo de dato"
-        tipo = tokens[pos]['valor']
-        pos += 1
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'IDENTIFIER':
-            return False, pos, "Se esperaba identificador después del tipo"
-        identificador = tokens[pos]['valor']
-        pos += 1
-        
-        # Array opcional
-        if pos < len(tokens) and tokens[pos]['tipo'] == 'LBRACKET':
-            pos += 1
-            if pos >= len(tokens) or tokens[pos]['tipo'] != 'NUMBER':
-                return False, pos, "Se esperaba tamaño del array"
-            pos += 1
-            if pos >= len(tokens) or tokens[pos]['tipo'] != 'RBRACKET':
-                return False, pos, "Se esperaba ']'"
-            pos += 1
-            
-            if pos < len(tokens) and tokens[pos]['tipo'] == 'ASSIGN':
-                pos += 1
-                if pos >= len(tokens) or tokens[pos]['tipo'] != 'LBRACE':
-                    return False, pos, "Se esperaba '{' para inicialización del array"
-                pos += 1
-                if pos < len(tokens) and tokens[pos]['tipo'] != 'RBRACE':
-                    exito, pos, error = self.analizar_lista_valores(tokens, pos)
-                    if not exito: return False, pos, f"Error en lista de valores: {error}"
-                if pos >= len(tokens) or tokens[pos]['tipo'] != 'RBRACE':
-                    return False, pos, "Se esperaba '}'"
-                pos += 1
-        elif pos < len(tokens) and tokens[pos]['tipo'] == 'ASSIGN':
-            pos += 1
-            exito, pos, error = self.analizar_expresion(tokens, pos)
-            if not exito: return False, pos, f"Error en inicialización: {error}"
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'SEMICOLON':
-            return False, pos, "Se esperaba ';'"
-        return True, pos + 1, f"Declaración: {tipo} {identificador}"
+        tokens = self._convertir(tokens)
+        return self._redactado(tokens, inicio, motor_sintactico.analizar_declaracion(self, tokens, inicio))
 
     def analizar_sentencia(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens): return False, pos, "No hay tokens para analizar"
-        
-        if tokens[pos]['tipo'] == 'LBRACE': return self.analizar_bloque(tokens, pos)
-        elif tokens[pos]['tipo'] == 'IF': return self.analizar_sentencia_if(tokens, pos)
-        elif tokens[pos]['tipo'] == 'SWITCH': return self.analizar_sentencia_switch(tokens, pos)
-        elif tokens[pos]['tipo'] == 'WHILE': return self.analizar_sentencia_while(tokens, pos)
-        elif tokens[pos]['tipo'] == 'FOR': return self.analizar_sentencia_for(tokens, pos)
-        elif tokens[pos]['tipo'] == 'DO': return self.analizar_sentencia_do_while(tokens, pos)
-        elif tokens[pos]['tipo'] in ['BREAK','CONTINUE','RETURN']: return self.analizar_sentencia_salto(tokens, pos)
-        else: return self.analizar_sentencia_expresion(tokens, pos)
+        tokens = self._convertir(tokens)
+        return self._redactado(tokens, inicio, motor_sintactico.analizar_sentencia(self, tokens, inicio))
 
     def analizar_bloque(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'LBRACE':
-            return False, pos, "Se esperaba '{'"
-        pos += 1
-        
-        while pos < len(tokens) and tokens[pos]['tipo'] != 'RBRACE':
-            if tokens[pos]['tipo'] in ['INT','FLOAT','DOUBLE','CHAR','BOOL','VOID']:
-                exito, pos, error = self.analizar_declaracion(tokens, pos)
-                if not exito: return False, pos, f"Error en declaración del bloque: {error}"
-            else:
-                exito, pos, error = self.analizar_sentencia(tokens, pos)
-                if not exito: return False, pos, f"Error en sentencia del bloque: {error}"
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'RBRACE':
-            return False, pos, "Se esperaba '}'"
-        return True, pos + 1, "Bloque válido"
+        return self._sentencia_de(tokens, inicio, {T.LBRACE}, "Se esperaba '{'")
 
     def analizar_sentencia_expresion(self, tokens, inicio=0):
+        tokens = self._convertir(tokens)
         pos = inicio
-        if pos < len(tokens) and tokens[pos]['tipo'] != 'SEMICOLON':
+        if pos < len(tokens) and tokens.tipos[pos] != T.SEMICOLON:
             exito, pos, error = self.analizar_expresion(tokens, pos)
             if not exito: return False, pos, f"Error en expresión: {error}"
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'SEMICOLON':
-            return False, pos, "Se esperaba ';'"
+        if pos >= len(tokens) or tokens.tipos[pos] != T.SEMICOLON: return False, pos, "Se esperaba ';'"
         return True, pos + 1, "Sentencia de expresión válida"
 
     def analizar_sentencia_if(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'IF': return False, pos, "Se esperaba 'if'"
-        pos += 1
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'LPAREN': return False, pos, "Se esperaba '(' después de 'if'"
-        pos += 1
-        exito, pos, error = self.analizar_expresion(tokens, pos)
-        if not exito: return False, pos, f"Error en condición del if: {error}"
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'RPAREN': return False, pos, "Se esperaba ')' después de la condición"
-        pos += 1
-        exito, pos, error = self.analizar_sentencia(tokens, pos)
-        if not exito: return False, pos, f"Error en cuerpo del if: {error}"
-        
-        if pos < len(tokens) and tokens[pos]['tipo'] == 'ELSE':
-            pos += 1
-            exito, pos, error = self.analizar_sentencia(tokens, pos)
-            if not exito: return False, pos, f"Error en cuerpo del else: {error}"
-        return True, pos, "Sentencia if válida"
+        return self._sentencia_de(tokens, inicio, {T.IF}, "Se esperaba 'if'")
 
     def analizar_sentencia_for(self, tokens, inicio=0):
-        pos = inicio
-        required_checks = [('FOR', "'for'"), ('LPAREN', "'(' después de 'for'")]
-        for check_type, error_msg in required_checks:
-            if pos >= len(tokens) or tokens[pos]['tipo'] != check_type:
-                return False, pos, f"Se esperaba {error_msg}"
-            pos += 1
-        
-        # Tres expresiones del for
-        for i, desc in enumerate(['inicialización', 'condición', 'actualización']):
-            if pos < len(tokens) and tokens[pos]['tipo'] != 'SEMICOLON' and (i < 2 or tokens[pos]['tipo'] != 'RPAREN'):
-                exito, pos, error = self.analizar_expresion(tokens, pos)
-                if not exito: return False, pos, f"Error en {desc} del for: {error}"
-            
-            if i < 2:  # Primeras dos necesitan ';'
-                if pos >= len(tokens) or tokens[pos]['tipo'] != 'SEMICOLON':
-                    return False, pos, f"Se esperaba ';' después de la {desc}"
-                pos += 1
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'RPAREN':
-            return False, pos, "Se esperaba ')' después de la actualización"
-        pos += 1
-        exito, pos, error = self.analizar_sentencia(tokens, pos)
-        if not exito: return False, pos, f"Error en cuerpo del for: {error}"
-        return True, pos, "Sentencia for válida"
+        return self._sentencia_de(tokens, inicio, {T.FOR}, "Se esperaba 'for'")
 
     def analizar_sentencia_while(self, tokens, inicio=0):
-        return self._analizar_bucle_simple(tokens, inicio, 'WHILE', 'while', "Sentencia while válida")
+        return self._sentencia_de(tokens, inicio, {T.WHILE}, "Se esperaba 'while'")
 
     def analizar_sentencia_do_while(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'DO': return False, pos, "Se esperaba 'do'"
-        pos += 1
-        exito, pos, error = self.analizar_sentencia(tokens, pos)
-        if not exito: return False, pos, f"Error en cuerpo del do: {error}"
-        
-        checks = [('WHILE', "'while' después del cuerpo do"), ('LPAREN', "'(' después de 'while'")]
-        for check_type, error_msg in checks:
-            if pos >= len(tokens) or tokens[pos]['tipo'] != check_type:
-                return False, pos, f"Se esperaba {error_msg}"
-            pos += 1
-        
-        exito, pos, error = self.analizar_expresion(tokens, pos)
-        if not exito: return False, pos, f"Error en condición del while: {error}"
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'RPAREN':
-            return False, pos, "Se esperaba ')' después de la condición"
-        pos += 1
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'SEMICOLON':
-            return False, pos, "Se esperaba ';' después del do-while"
-        return True, pos + 1, "Sentencia do-while válida"
-
-    def _analizar_bucle_simple(self, tokens, inicio, token_tipo, palabra, mensaje_exito):
-        pos = inicio
-        checks = [(token_tipo, f"'{palabra}'"), ('LPAREN', f"'(' después de '{palabra}'")]
-        for check_type, error_msg in checks:
-            if pos >= len(tokens) or tokens[pos]['tipo'] != check_type:
-                return False, pos, f"Se esperaba {error_msg}"
-            pos += 1
-        
-        exito, pos, error = self.analizar_expresion(tokens, pos)
-        if not exito: return False, pos, f"Error en condición del {palabra}: {error}"
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'RPAREN':
-            return False, pos, "Se esperaba ')' después de la condición"
-        pos += 1
-        exito, pos, error = self.analizar_sentencia(tokens, pos)
-        if not exito: return False, pos, f"Error en cuerpo del {palabra}: {error}"
-        return True, pos, mensaje_exito
+        return self._sentencia_de(tokens, inicio, {T.DO}, "Se esperaba 'do'")
 
     def analizar_sentencia_salto(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens) or tokens[pos]['tipo'] not in ['BREAK','CONTINUE','RETURN']:
-            return False, pos, "Se esperaba break, continue o return"
-        tipo_salto = tokens[pos]['valor']
-        pos += 1
-        
-        if tipo_salto == 'return' and pos < len(tokens) and tokens[pos]['tipo'] != 'SEMICOLON':
-            exito, pos, error = self.analizar_expresion(tokens, pos)
-            if not exito: return False, pos, f"Error en expresión de return: {error}"
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'SEMICOLON':
-            return False, pos, f"Se esperaba ';' después de {tipo_salto}"
-        return True, pos + 1, f"Sentencia {tipo_salto} válida"
+        return self._sentencia_de(tokens, inicio, {T.BREAK, T.CONTINUE, T.RETURN},
+                                  'Se esperaba break, continue o return')
+
+    def analizar_sentencia_switch(self, tokens, inicio=0):
+        return self._sentencia_de(tokens, inicio, {T.SWITCH}, "Se esperaba 'switch'")
 
     def analizar_expresion(self, tokens, inicio=0):
         return self.analizar_expresion_asignacion(tokens, inicio)
 
     def analizar_expresion_asignacion(self, tokens, inicio=0):
-        pos = inicio
-        exito, pos, error = self.analizar_expresion_ternaria(tokens, pos)
-        if not exito: return False, pos, error
-        
-        assign_ops = ['ASSIGN','PLUS_ASSIGN','MINUS_ASSIGN','MULTIPLY_ASSIGN','DIVIDE_ASSIGN',
-                     'MODULO_ASSIGN','BITWISE_AND_ASSIGN','BITWISE_OR_ASSIGN','BITWISE_XOR_ASSIGN',
-                     'LEFT_SHIFT_ASSIGN','RIGHT_SHIFT_ASSIGN']
-        if pos < len(tokens) and tokens[pos]['tipo'] in assign_ops:
-            pos += 1
-            exito, pos, error = self.analizar_expresion_asignacion(tokens, pos)
-            if not exito: return False, pos, f"Error después del operador de asignación: {error}"
-        return True, pos, "Expresión de asignación válida"
+        return self._expresion_desde(tokens, inicio, POTENCIA_ASIGNACION, 'Expresión de asignación válida')
 
     def analizar_expresion_ternaria(self, tokens, inicio=0):
-        pos = inicio
-        exito, pos, error = self.analizar_expresion_logica_or(tokens, pos)
-        if not exito: return False, pos, error
-        
-        if pos < len(tokens) and tokens[pos]['tipo'] == 'QUESTION':
-            pos += 1
-            exito, pos, error = self.analizar_expresion(tokens, pos)
-            if not exito: return False, pos, f"Error en parte verdadera del operador ternario: {error}"
-            if pos >= len(tokens) or tokens[pos]['tipo'] != 'COLON':
-                return False, pos, "Se esperaba ':' en operador ternario"
-            pos += 1
-            exito, pos, error = self.analizar_expresion_ternaria(tokens, pos)
-            if not exito: return False, pos, f"Error en parte falsa del operador ternario: {error}"
-        return True, pos, "Expresión condicional válida"
-
-    def _analizar_expresion_binaria(self, tokens, inicio, metodo_inferior, operadores, nombre):
-        pos = inicio
-        exito, pos, error = metodo_inferior(tokens, pos)
-        if not exito: return False, pos, error
-        while pos < len(tokens) and tokens[pos]['tipo'] in operadores:
-            pos += 1
-            exito, pos, error = metodo_inferior(tokens, pos)
-            if not exito: return False, pos, f"Error después del operador {nombre}: {error}"
-        return True, pos, f"Expresión {nombre} válida"
+        return self._expresion_desde(tokens, inicio, POTENCIA_TERNARIO, 'Expresión condicional válida')
 
     def analizar_expresion_logica_or(self, tokens, inicio=0):
-        return self._analizar_expresion_binaria(tokens, inicio, self.analizar_expresion_logica_and, ['LOGICALOR'], 'lógica OR')
+        return self._expresion_binaria(tokens, inicio, T.LOGICALOR)
 
     def analizar_expresion_logica_and(self, tokens, inicio=0):
-        return self._analizar_expresion_binaria(tokens, inicio, self.analizar_expresion_igualdad, ['LOGICALAND'], 'lógica AND')
+        return self._expresion_binaria(tokens, inicio, T.LOGICALAND)
 
     def analizar_expresion_igualdad(self, tokens, inicio=0):
-        return self._analizar_expresion_binaria(tokens, inicio, self.analizar_expresion_relacional, ['EQUALITY','NOTEQUAL'], 'de igualdad')
+        return self._expresion_binaria(tokens, inicio, T.EQUALITY)
 
     def analizar_expresion_relacional(self, tokens, inicio=0):
-        return self._analizar_expresion_binaria(tokens, inicio, self.analizar_expresion_aditiva, 
-                                              ['LESSTHAN','GREATERTHAN','LESSTHANOREQUAL','GREATERTHANOREQUAL'], 'relacional')
+        return self._expresion_binaria(tokens, inicio, T.LESSTHAN)
 
     def analizar_expresion_aditiva(self, tokens, inicio=0):
-        return self._analizar_expresion_binaria(tokens, inicio, self.analizar_expresion_multiplicativa, ['PLUS','MINUS'], 'aditiva')
+        return self._expresion_binaria(tokens, inicio, T.PLUS)
 
     def analizar_expresion_multiplicativa(self, tokens, inicio=0):
-        return self._analizar_expresion_binaria(tokens, inicio, self.analizar_expresion_unaria, ['MULTIPLY','DIVIDE','MODULO'], 'multiplicativa')
+        return self._expresion_binaria(tokens, inicio, T.MULTIPLY)
+
+    def _expresion_binaria(self, tokens, inicio, operador):
+        potencia, nombre = OPERADORES_BINARIOS[operador]
+        return self._expresion_desde(tokens, inicio, potencia, f'Expresión {nombre} válida')
 
     def analizar_expresion_unaria(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens): return False, pos, "Se esperaba expresión unaria"
-        
-        if tokens[pos]['tipo'] in ['INCREMENT','DECREMENT','PLUS','MINUS','NOT','BITWISE_NOT']:
-            pos += 1
-            return self.analizar_expresion_unaria(tokens, pos)
-        return self.analizar_expresion_postfijo(tokens, pos)
+        if inicio >= len(tokens): return False, inicio, 'Se esperaba expresión unaria'
+        return self._expresion_desde(tokens, inicio, POTENCIA_UNARIA, 'Expresión postfijo válida')
 
     def analizar_expresion_postfijo(self, tokens, inicio=0):
-        pos = inicio
-        exito, pos, error = self.analizar_expresion_primaria(tokens, pos)
-        if not exito: return False, pos, error
-        
-        while pos < len(tokens):
-            if tokens[pos]['tipo'] == 'LBRACKET':
-                pos += 1
-                exito, pos, error = self.analizar_expresion(tokens, pos)
-                if not exito: return False, pos, f"Error en índice del array: {error}"
-                if pos >= len(tokens) or tokens[pos]['tipo'] != 'RBRACKET':
-                    return False, pos, "Se esperaba ']'"
-                pos += 1
-            elif tokens[pos]['tipo'] == 'LPAREN':
-                pos += 1
-                if pos < len(tokens) and tokens[pos]['tipo'] != 'RPAREN':
-                    exito, pos, error = self.analizar_lista_argumentos(tokens, pos)
-                    if not exito: return False, pos, f"Error en argumentos: {error}"
-                if pos >= len(tokens) or tokens[pos]['tipo'] != 'RPAREN':
-                    return False, pos, "Se esperaba ')'"
-                pos += 1
-            elif tokens[pos]['tipo'] in ['DOT','ARROW']:
-                pos += 1
-                if pos >= len(tokens) or tokens[pos]['tipo'] != 'IDENTIFIER':
-                    return False, pos, f"Se esperaba identificador después de '{tokens[pos-1]['valor']}'"
-                pos += 1
-            elif tokens[pos]['tipo'] in ['INCREMENT','DECREMENT']:
-                pos += 1
-            else: break
-        return True, pos, "Expresión postfijo válida"
+        # Sin prefijos: empieza por una expresión primaria
+        buffer = self._convertir(tokens)
+        if inicio >= len(buffer) or buffer.tipos[inicio] in OPERADORES_UNARIOS:
+            return self.analizar_expresion_primaria(buffer, inicio)
+        return self._expresion_desde(buffer, inicio, POTENCIA_UNARIA, 'Expresión postfijo válida')
 
     def analizar_expresion_primaria(self, tokens, inicio=0):
-        pos = inicio
-        if pos >= len(tokens): return False, pos, "Se esperaba expresión primaria"
-        
-        if tokens[pos]['tipo'] == 'IDENTIFIER':
-            return True, pos + 1, f"Identificador: {tokens[pos]['valor']}"
-        elif tokens[pos]['tipo'] in ['NUMBER','FLOAT','CHAR','TRUE','FALSE','STRING']:
-            return True, pos + 1, f"Literal: {tokens[pos]['valor']}"
-        elif tokens[pos]['tipo'] == 'LPAREN':
-            pos += 1
-            exito, pos, error = self.analizar_expresion(tokens, pos)
-            if not exito: return False, pos, f"Error en expresión entre paréntesis: {error}"
-            if pos >= len(tokens) or tokens[pos]['tipo'] != 'RPAREN':
-                return False, pos, "Se esperaba ')'"
-            return True, pos + 1, "Expresión entre paréntesis válida"
-        return False, pos, f"Token inesperado en expresión primaria: '{tokens[pos]['valor']}'"
+        tokens = self._convertir(tokens)
+        if inicio >= len(tokens): return False, inicio, 'Se esperaba expresión primaria'
+        tipo = tokens.tipos[inicio]
+        if tipo == T.IDENTIFIER: return True, inicio + 1, f'Identificador: {tokens.valor(inicio)}'
+        if tipo in LITERALES: return True, inicio + 1, f'Literal: {tokens.valor(inicio)}'
+        if tipo == T.LPAREN:
+            exito, pos, error = self.analizar_expresion(tokens, inicio + 1)
+            if not exito: return False, pos, f'Error en expresión entre paréntesis: {error}'
+            if pos >= len(tokens) or tokens.tipos[pos] != T.RPAREN: return False, pos, "Se esperaba ')'"
+            return True, pos + 1, 'Expresión entre paréntesis válida'
+        return False, inicio, f"Token inesperado en expresión primaria: '{tokens.valor(inicio)}'"
 
     def analizar_lista_argumentos(self, tokens, inicio=0):
-        return self._analizar_lista_expresiones(tokens, inicio, "argumento")
+        tokens = self._convertir(tokens)
+        return self._redactado(tokens, inicio, motor_sintactico.analizar_lista_argumentos(self, tokens, inicio),
+                               'Lista de argumentos válida')
 
     def analizar_lista_valores(self, tokens, inicio=0):
-        return self._analizar_lista_expresiones(tokens, inicio, "valor")
+        tokens = self._convertir(tokens)
+        # Con la errata de la clase original, que armaba el plural con una 's'
+        return self._redactado(tokens, inicio, motor_sintactico.analizar_lista_valores(self, tokens, inicio),
+                               'Lista de valors válida')
 
-    def _analizar_lista_expresiones(self, tokens, inicio, tipo_elemento):
-        pos = inicio
-        exito, pos, error = self.analizar_expresion(tokens, pos)
-        if not exito: return False, pos, f"Error en {tipo_elemento}: {error}"
-        
-        while pos < len(tokens) and tokens[pos]['tipo'] == 'COMMA':
-            pos += 1
-            exito, pos, error = self.analizar_expresion(tokens, pos)
-            if not exito: return False, pos, f"Error en {tipo_elemento} después de ',': {error}"
-        return True, pos, f"Lista de {tipo_elemento}s válida"
 
-    def analizar_sentencia_switch(self, tokens, inicio=0):
-        pos = inicio
-        checks = [('SWITCH',"'switch'"),('LPAREN',"'(' después de 'switch'")]
-        for check_type, error_msg in checks:
-            if pos >= len(tokens) or tokens[pos]['tipo'] != check_type:
-                return False, pos, f"Se esperaba {error_msg}"
-            pos += 1
-        
-        exito, pos, error = self.analizar_expresion(tokens, pos)
-        if not exito: return False, pos, f"Error en expresión del switch: {error}"
-        
-        final_checks = [('RPAREN',"')' después de la expresión"),('LBRACE',"'{' después de switch")]
-        for check_type, error_msg in final_checks:
-            if pos >= len(tokens) or tokens[pos]['tipo'] != check_type:
-                return False, pos, f"Se esperaba {error_msg}"
-            pos += 1
-        
-        while pos < len(tokens) and tokens[pos]['tipo'] != 'RBRACE':
-            if tokens[pos]['tipo'] == 'CASE':
-                exito, pos, error = self._analizar_caso_o_default(tokens, pos, True)
-            elif tokens[pos]['tipo'] == 'DEFAULT':
-                exito, pos, error = self._analizar_caso_o_default(tokens, pos, False)
-            else: return False, pos, f"Se esperaba 'case' o 'default', se encontró '{tokens[pos]['valor']}'"
-            if not exito: return False, pos, error
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'RBRACE':
-            return False, pos, "Se esperaba '}' para cerrar switch"
-        return True, pos + 1, "Sentencia switch válida"
+def resultado_vacio(mensaje, error):
+    return {'success': False, 'mensaje': mensaje, 'errores': [error], 'resultados_sintacticos': [],
+            'tokens_lexicos': [], 'total_estructuras': 0, 'total_errores': 1}
 
-    def _analizar_caso_o_default(self, tokens, inicio, es_case):
-        pos = inicio
-        palabra = 'case' if es_case else 'default'
-        pos += 1
-        
-        if es_case:
-            if pos >= len(tokens) or tokens[pos]['tipo'] not in ['NUMBER','FLOAT','CHAR','TRUE','FALSE']:
-                return False, pos, f"Se esperaba constante después de '{palabra}'"
-            pos += 1
-        
-        if pos >= len(tokens) or tokens[pos]['tipo'] != 'COLON':
-            return False, pos, f"Se esperaba ':' después de {palabra}"
-        pos += 1
-        
-        while pos < len(tokens) and tokens[pos]['tipo'] not in ['CASE','DEFAULT','RBRACE']:
-            exito, pos, error = self.analizar_sentencia(tokens, pos)
-            if not exito: return False, pos, f"Error en sentencia del {palabra}: {error}"
-        return True, pos, f"{palabra.capitalize()} válido"
-
-
-def analizarsintactico(texto):
-    analizador = GramaticaCompleta()
-    analizador.errores = []
-    analizador.estructuras_reconocidas = []
-    analizador.tokens_encontrados = []
-    
-    try:
-        if not texto or not texto.strip():
-            return {'success': False, 'mensaje': 'No se proporcionó código para analizar',
-                   'errores': ['Texto vacío o solo espacios'], 'resultados_sintacticos': [],
-                   'tokens_lexicos': [], 'total_estructuras': 0, 'total_errores': 1}
-        
-        tokens = analizador.tokenizar(texto.strip())
-        analizador.tokens_encontrados = [t['valor'] for t in tokens]
-        
-        if not tokens:
-            return {'success': False, 'mensaje': 'No se encontraron tokens válidos en el código',
-                   'errores': ['No se encontraron tokens válidos'], 'resultados_sintacticos': [],
-                   'tokens_lexicos': [], 'total_estructuras': 0, 'total_errores': 1}
-        
-        exito, final_pos, mensaje = analizador.analizar_programa(tokens, 0)
-        
-        if final_pos < len(tokens):
-            tokens_restantes = [tokens[i]['valor'] for i in range(final_pos, min(final_pos + 5, len(tokens)))]
-            analizador.errores.append(f"Tokens no procesados: {', '.join(tokens_restantes)}")
-        
-        total_errores = len(analizador.errores)
-        total_estructuras = len(analizador.estructuras_reconocidas)
-        
-        if total_errores == 0 and total_estructuras > 0:
-            mensaje_final = f"✅ Análisis sintáctico exitoso: {total_estructuras} estructura(s) válida(s)"
-            success = True
-        else:
-            mensaje_final = f"❌ Análisis con errores: {total_errores} error(es), {total_estructuras} estructura(s) válida(s)"
-            success = False
-        
-        return {'success': success, 'mensaje': mensaje_final, 'errores': analizador.errores,
-               'resultados_sintacticos': analizador.estructuras_reconocidas,
-               'tokens_lexicos': analizador.tokens_encontrados, 'total_estructuras': total_estructuras,
-               'total_errores': total_errores}
-        
-    except Exception as e:
-        return {'success': False, 'mensaje': f'Error interno en el análisis sintáctico: {str(e)}',
-               'errores': [f"Error interno: {str(e)}"], 'resultados_sintacticos': [],
-               'tokens_lexicos': [], 'total_estructuras': 0, 'total_errores': 1}
 
-def analizar_sintactico(texto):
-    return analizarsintactico(texto)
\ No newline at end of file
+def resumen_resultado(total_errores, total_estructuras):
+    # (success, mensaje) del resultado según los totales
+    if total_errores == 0 and total_estructuras > 0:
+        return True, f"✅ Análisis sintáctico exitoso: {total_estructuras} estructura(s) válida(s)"
+    return False, f"❌ Análisis con errores: {total_errores} error(es), {total_estructuras} estructura(s) válida(s)"
+
+
+def construir_resultado(errores, estructuras, tokens_lexicos):
+    total_errores = len(errores)
+    total_estructuras = len(estructuras)
+    success, mensaje_final = resumen_resultado(total_errores, total_estructuras)
+
+    return {'success': success, 'mensaje': mensaje_final, 'errores': errores,
+            'resultados_sintacticos': estructuras, 'tokens_lexicos': tokens_lexicos,
+            'total_estructuras': total_estructuras, 'total_errores': total_errores}
+
+
+def resultado_presupuesto_excedido(excedido, errores=(), estructuras=(), tokens_lexicos=()):
+    # Lo analizado hasta abortar (ya redactado), más el motivo
+    errores, estructuras = list(errores), list(estructuras)
+    aviso = redactar((D.PRESUPUESTO_EXCEDIDO, None, str(excedido), None), None)
+    resultado = construir_resultado(errores + [aviso], estructuras, tokens_lexicos or [])
+    resultado['success'] = False
+    resultado['mensaje'] = (f"⛔ Análisis abortado: {excedido} ({len(errores)} error(es) y "
+                            f"{len(estructuras)} estructura(s) antes de abortar)")
+    resultado['presupuesto_excedido'] = {'motivo': excedido.motivo, 'limite': excedido.limite,
+                                         'posicion': excedido.posicion}
+    return resultado
+
+
+def _redactar_resultado(analizador, tokens, excedido=None):
+    # Los mensajes se redactan aquí, una vez terminado el análisis, a partir de los registros
+    errores = [redactar(registro, tokens) for registro in analizador.errores]
+    estructuras = [redactar(registro, tokens) for registro in analizador.estructuras_reconocidas]
+    if excedido is None: return construir_resultado(errores, estructuras, analizador.tokens_encontrados)
+    return resultado_presupuesto_excedido(excedido, errores, estructuras, analizador.tokens_encontrados)
+
+
+def analizarsintactico(texto, tokens=None, fases=None, presupuesto=None, diagnosticos=False, arbol=None,
+                       paralelo=None):
+    # tokens: el BufferTokens de texto si ya se tokenizó (p. ej. para el análisis léxico).
+    # fases: función opcional que se llama con el nombre de cada fase al terminarla (métricas).
+    # presupuesto: límites de tokens, profundidad y tiempo; al superarlos se aborta con un resultado
+    # que lleva 'presupuesto_excedido' y los diagnósticos reunidos hasta ese momento.
+    # diagnosticos: añade 'diagnosticos', los errores en la forma de diagnosticos.describir, con
+    # posiciones en caracteres y línea y columna en texto.
+    # arbol: añade 'arbol', el árbol sintáctico en uno de arbolsintactico.FORMATOS_ARBOL ('columnas'
+    # también con True), con los tokens como índices de 'tokens_lexicos'; None si el análisis se abortó.
+    # paralelo: un ejecutor de procesos (concurrent.futures) en el que repartir por tramos las
+    # construcciones de nivel superior de las entradas grandes; el resultado es el mismo.
+    return motor_sintactico.analizar(texto, tokens, fases, presupuesto, diagnosticos, arbol, paralelo)
+
+def analizar_sintactico(texto, tokens=None, fases=None, presupuesto=None, diagnosticos=False, arbol=None,
+                        paralelo=None):
+    return analizarsintactico(texto, tokens, fases, presupuesto, diagnosticos, arbol, paralelo)
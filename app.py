@@ -1,130 +1,220 @@
-from flask import Flask, render_template, request, jsonify
-import re
+from flask import Flask, Response, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import gzip
+import json
+import sys
+import threading
+import time
+from operator import sub
+import analizadorsintactico as modulo_sintactico
+import arbolsintactico as modulo_arbol
+import diagnosticos as modulo_diagnosticos
+import generadorll1
+import motorlexico
+from motorlexico import NOMBRES_TIPOS, IndiceLineas, TipoToken, ValoresTokens, motor_lexico
 from analizadorsintactico import analizarsintactico   # 👈 Importamos el parser
+from analizadorsintactico import (PROFUNDIDAD_MAXIMA, Presupuesto, PresupuestoExcedido, motor_sintactico,
+                                  resultado_presupuesto_excedido)
+from arbolsintactico import FORMATOS_ARBOL
+from diagnosticos import D, describir
+from analizadorincremental import CERRADO, CanalDocumento, RegistroDocumentos
+from analizadorlotes import AnalizadorLotes
+from cacheresultados import CacheDisco, CacheResultados, huella_modulos
+from metricas import LIMITES_BYTES, RegistroMetricas
+
+# brotli es opcional: sin él las respuestas comprimibles sólo se comprimen con gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATOS_LEXICO = ('filas', 'columnas')
+CODIFICACIONES = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    # Los tokens de los resultados sintácticos (ValoresTokens) no se copian del texto hasta serializarlos
+    @staticmethod
+    def default(o):
+        if isinstance(o, ValoresTokens): return list(o)
+        return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__)
+app.json = ProveedorJSON(app)
+
+# Análisis por lotes: procesos trabajadores, fuentes en curso por lote, segundos por fuente y fuentes por lote
+app.config.setdefault('LOTE_TRABAJADORES', None)
+app.config.setdefault('LOTE_CONCURRENCIA', None)
+app.config.setdefault('LOTE_TIEMPO_LIMITE', 10.0)
+app.config.setdefault('LOTE_MAXIMO_FUENTES', 1000)
+# Fuentes desde este tamaño (caracteres) se analizan por tramos en el pool de los lotes (None: nunca)
+app.config.setdefault('PARALELO_MINIMO', 1 << 20)
+app.config.setdefault('METRICAS_ACTIVAS', True)
+# Presupuesto de cada análisis: tokens, profundidad de anidamiento y segundos (None: sin límite). Una
+# petición puede pedir límites menores con {"presupuesto": {"tokens", "profundidad", "segundos"}}
+app.config.setdefault('PRESUPUESTO_TOKENS', 1_000_000)
+app.config.setdefault('PRESUPUESTO_PROFUNDIDAD', PROFUNDIDAD_MAXIMA)
+app.config.setdefault('PRESUPUESTO_SEGUNDOS', 5.0)
+# Cache en disco compartido por los procesos del servidor (archivo SQLite local; None: sólo el de memoria),
+# su tamaño máximo y los segundos que un proceso espera a que otro termine de calcular la misma clave
+app.config.setdefault('CACHE_DISCO', None)
+app.config.setdefault('CACHE_DISCO_MAXIMO_BYTES', 256 * 1024 * 1024)
+app.config.setdefault('CACHE_DISCO_ESPERA', 10.0)
+# Segundos sin cambios tras los que el canal en vivo envía un latido (así se detectan los clientes caídos)
+app.config.setdefault('VIVO_LATIDO', 15.0)
+# Tamaño máximo del cuerpo de una petición; más grande se rechaza con 413 sin leerlo. Flask ya trae
+# la clave (None, sin límite), así que setdefault no serviría
+if app.config['MAX_CONTENT_LENGTH'] is None:
+    app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024
 
 # =======================
 #   ANALIZADOR LÉXICO
 # =======================
 class AnalizadorLexico:
-    def __init__(self):
-        # Palabras reservadas
-        self.palabras_reservadas = {'if', 'else', 'for', 'while', 'int', 'float', 'return', 'void'}
-
-        # Tokens con expresiones regulares
-        self.tokens = {
-            'INCREMENT': r'\+\+',
-            'DECREMENT': r'--',
-            'LESSTHANOREQUAL': r'<=',
-            'GREATERTHANOREQUAL': r'>=',
-            'EQUALITY': r'==',
-            'NOTEQUAL': r'!=',
-            'LOGICALAND': r'&&',
-            'LOGICALOR': r'\|\|',
-            'ASSIGN': r'=',
-            'LPAREN': r'\(',
-            'RPAREN': r'\)',
-            'LBRACE': r'\{',
-            'RBRACE': r'\}',
-            'LBRACKET': r'\[',
-            'RBRACKET': r'\]',
-            'SEMICOLON': r';',
-            'COMMA': r',',
-            'DOT': r'\.',
-            'LESSTHAN': r'<',
-            'GREATERTHAN': r'>',
-            'PLUS': r'\+',
-            'MINUS': r'-',
-            'MULTIPLY': r'\*',
-            'DIVIDE': r'/',
-            'MODULO': r'%',
-            'NOT': r'!',
-            'QUESTION': r'\?',
-            'COLON': r':',
-            'NUMBER': r'\d+(\.\d+)?',
-            'IDENTIFIER': r'[a-zA-Z_][a-zA-Z0-9_]*'
-        }
+    # Tabla léxica de la interfaz. Usa el mismo motor léxico (tokens y palabras reservadas) que el
+    # analizador sintáctico, así ambos análisis ven exactamente los mismos tokens.
+    def __init__(self, motor=motor_lexico):
+        self.motor = motor
+        self.palabras_reservadas = motor.palabras_reservadas
+        self.tokens = {nombre: patron for nombre, patron in motor.tokens_regex.items()
+                       if TipoToken[nombre] not in motor.omitidos}
+        self._reservadas = frozenset(int(TipoToken[p.upper()]) for p in motor.palabras_reservadas)
+        # Tipos de palabra reservada que también da un patrón (los literales de 'float' y 'char')
+        self._compartidas = frozenset(codigo for codigo in self._reservadas if NOMBRES_TIPOS[codigo] in self.tokens)
+        # Leyenda: las clases distintas de fila (tipo, color, estado y marcas), y la de cada tipo de token
+        # como tabla de bytes.translate; los tipos compartidos llevan la del literal y aparte la reservada.
+        self.leyenda, self._clase_reservada = [], {}
+        clase_tipo = bytearray(256)
+        for codigo in range(len(NOMBRES_TIPOS)):
+            if codigo in self._reservadas:
+                self._clase_reservada[codigo] = clase_tipo[codigo] = self._indice_clase(codigo, True)
+            if NOMBRES_TIPOS[codigo] in self.tokens:
+                clase_tipo[codigo] = self._indice_clase(codigo, False)
+        self._clase_tipo = bytes(clase_tipo)
+
+    def _indice_clase(self, codigo, reservada):
+        clase = self.clase(codigo, reservada)
+        if clase not in self.leyenda: self.leyenda.append(clase)
+        return self.leyenda.index(clase)
 
-    def analizar(self, texto):
-        if not texto.strip():
+    def analizar(self, texto, tokens=None):
+        # tokens: el BufferTokens de texto si ya se tokenizó (p. ej. para el análisis sintáctico)
+        if not texto or texto.isspace():
             return [], 0, 0, 0, 0
+        if tokens is None: tokens = self.motor.tokenizar(texto)
 
-        token_regex = '|'.join(f'(?P<{nombre}>{patron})' for nombre, patron in self.tokens.items())
-        resultados = []
-        posicion = 1
-        contador_palabras_reservadas = 0
-        contador_identificadores = 0
-        contador_numeros = 0
-        contador_simbolos = 0
-
-        for match in re.finditer(token_regex, texto):
-            tipo = match.lastgroup
-            valor = match.group()
-
-            resultado = {
-                'token': valor,
-                'posicion': posicion,
-                'palabra_reservada': '',
-                'simbolo': '',
-                'parentesis_izq': '',
-                'parentesis_der': ''
-            }
+        ubicar = tokens.lineas().ubicar
+        resultados = [self.fila(codigo, valor, i + 1, *ubicar(inicio))
+                      for i, (codigo, valor, inicio) in enumerate(zip(tokens.tipos, tokens.valores(), tokens.inicios))]
+        return (resultados, *self.contar(resultados))
+
+    def analizar_columnas(self, texto, tokens=None):
+        # La misma tabla en columnas: la clase de cada token (índice en self.leyenda), su inicio y su
+        # longitud en caracteres. El valor, la línea y la columna salen del texto, que el cliente ya tiene.
+        if not texto or texto.isspace():
+            return bytearray(), [], []
+        if tokens is None: tokens = self.motor.tokenizar(texto)
 
-            if tipo == 'IDENTIFIER' and valor.lower() in self.palabras_reservadas:
-                resultado.update({
-                    'tipo': 'PALABRA_RESERVADA',
-                    'color': 'success',
-                    'palabra_reservada': '✓',
-                    'estado': 'Palabra Clave'
-                })
-                contador_palabras_reservadas += 1
-            elif tipo == 'IDENTIFIER':
-                resultado.update({
-                    'tipo': 'IDENTIFICADOR',
-                    'color': 'info',
-                    'estado': 'Variable'
-                })
-                contador_identificadores += 1
-            elif tipo == 'NUMBER':
-                resultado.update({
-                    'tipo': 'NUMERO',
-                    'color': 'primary',
-                    'estado': 'Valor Numérico'
-                })
-                contador_numeros += 1
-            elif tipo == 'LPAREN':
-                resultado.update({
-                    'tipo': 'PARENTESIS_IZQ',
-                    'color': 'warning',
-                    'simbolo': '✓',
-                    'parentesis_izq': '✓',
-                    'estado': 'Delimitador'
-                })
-                contador_simbolos += 1
-            elif tipo == 'RPAREN':
-                resultado.update({
-                    'tipo': 'PARENTESIS_DER',
-                    'color': 'warning',
-                    'simbolo': '✓',
-                    'parentesis_der': '✓',
-                    'estado': 'Delimitador'
-                })
-                contador_simbolos += 1
-            else:
-                tipo_traducido = self._traducir_tipo(tipo)
-                resultado.update({
-                    'tipo': tipo_traducido,
-                    'color': 'warning',
-                    'simbolo': '✓',
-                    'estado': 'Símbolo'
-                })
-                contador_simbolos += 1
-
-            resultados.append(resultado)
-            posicion += 1
-
-        return resultados, contador_palabras_reservadas, contador_identificadores, contador_numeros, contador_simbolos
+        tipos = tokens.tipos.tobytes()
+        clases = bytearray(tipos.translate(self._clase_tipo))
+        inicios = tokens.inicios
+        for codigo in self._compartidas:
+            reservada = self._clase_reservada[codigo]
+            i = tipos.find(codigo)
+            while i >= 0:
+                if texto[inicios[i]].isalpha(): clases[i] = reservada
+                i = tipos.find(codigo, i + 1)
+        return clases, inicios, list(map(sub, tokens.fines, inicios))
+
+    def contar(self, filas):
+        # (palabras reservadas, identificadores, números, símbolos) de unas filas de la tabla
+        palabras_reservadas = identificadores = numeros = simbolos = 0
+        for fila in filas:
+            if fila['palabra_reservada']: palabras_reservadas += 1
+            elif fila['tipo'] == 'IDENTIFICADOR': identificadores += 1
+            elif fila['tipo'] == 'NUMERO': numeros += 1
+            elif fila['simbolo']: simbolos += 1
+        return palabras_reservadas, identificadores, numeros, simbolos
+
+    def contar_clases(self, clases):
+        # Lo mismo que contar() a partir de la columna de clases: una cuenta por clase de la leyenda
+        totales = [0, 0, 0, 0]
+        for indice, clase in enumerate(self.leyenda):
+            cantidad = clases.count(indice)
+            if not cantidad: continue
+            for i, uno in enumerate(self.contar([clase])): totales[i] += uno * cantidad
+        return tuple(totales)
+
+    def fila(self, codigo, valor, posicion, linea, columna):
+        # Fila de la tabla léxica para un token del motor (posicion es el número de orden del token;
+        # linea y columna, dónde empieza en el texto)
+        # 'float' y 'char' comparten tipo con sus literales: se distinguen por el primer carácter
+        if codigo in self._compartidas and valor[0].isalpha():
+            clase = self._clase_reservada[codigo]
+        else:
+            clase = self._clase_tipo[codigo]
+        return {'token': valor, 'posicion': posicion, 'linea': linea, 'columna': columna, **self.leyenda[clase]}
+
+    def clase(self, codigo, reservada):
+        # Columnas de la fila que sólo dependen del tipo del token (y de si es la palabra reservada)
+        tipo = NOMBRES_TIPOS[codigo]
+        resultado = {
+            'palabra_reservada': '',
+            'simbolo': '',
+            'parentesis_izq': '',
+            'parentesis_der': ''
+        }
+
+        if reservada:
+            resultado.update({
+                'tipo': 'PALABRA_RESERVADA',
+                'color': 'success',
+                'palabra_reservada': '✓',
+                'estado': 'Palabra Clave'
+            })
+        elif tipo == 'IDENTIFIER':
+            resultado.update({
+                'tipo': 'IDENTIFICADOR',
+                'color': 'info',
+                'estado': 'Variable'
+            })
+        elif tipo in ('NUMBER', 'FLOAT'):
+            resultado.update({
+                'tipo': 'NUMERO',
+                'color': 'primary',
+                'estado': 'Valor Numérico'
+            })
+        elif tipo in ('STRING', 'CHAR'):
+            resultado.update({
+                'tipo': self._traducir_tipo(tipo),
+                'color': 'secondary',
+                'estado': 'Literal'
+            })
+        elif tipo == 'LPAREN':
+            resultado.update({
+                'tipo': 'PARENTESIS_IZQ',
+                'color': 'warning',
+                'simbolo': '✓',
+                'parentesis_izq': '✓',
+                'estado': 'Delimitador'
+            })
+        elif tipo == 'RPAREN':
+            resultado.update({
+                'tipo': 'PARENTESIS_DER',
+                'color': 'warning',
+                'simbolo': '✓',
+                'parentesis_der': '✓',
+                'estado': 'Delimitador'
+            })
+        else:
+            resultado.update({
+                'tipo': self._traducir_tipo(tipo),
+                'color': 'warning',
+                'simbolo': '✓',
+                'estado': 'Símbolo'
+            })
+        return resultado
 
     def _traducir_tipo(self, tipo):
         traducciones = {
@@ -155,7 +245,26 @@ class AnalizadorLexico:
             'NOT': 'NEGACION',
             'DOT': 'PUNTO',
             'QUESTION': 'INTERROGACION',
-            'COLON': 'DOS_PUNTOS'
+            'COLON': 'DOS_PUNTOS',
+            'STRING': 'CADENA',
+            'CHAR': 'CARACTER',
+            'ARROW': 'FLECHA',
+            'PLUS_ASSIGN': 'SUMA_ASIGNACION',
+            'MINUS_ASSIGN': 'RESTA_ASIGNACION',
+            'MULTIPLY_ASSIGN': 'MULTIPLICACION_ASIGNACION',
+            'DIVIDE_ASSIGN': 'DIVISION_ASIGNACION',
+            'MODULO_ASSIGN': 'MODULO_ASIGNACION',
+            'LEFT_SHIFT': 'DESPLAZAMIENTO_IZQ',
+            'RIGHT_SHIFT': 'DESPLAZAMIENTO_DER',
+            'LEFT_SHIFT_ASSIGN': 'DESPLAZAMIENTO_IZQ_ASIGNACION',
+            'RIGHT_SHIFT_ASSIGN': 'DESPLAZAMIENTO_DER_ASIGNACION',
+            'BITWISE_AND': 'Y_BIT',
+            'BITWISE_OR': 'O_BIT',
+            'BITWISE_XOR': 'XOR_BIT',
+            'BITWISE_NOT': 'NEGACION_BIT',
+            'BITWISE_AND_ASSIGN': 'Y_BIT_ASIGNACION',
+            'BITWISE_OR_ASSIGN': 'O_BIT_ASIGNACION',
+            'BITWISE_XOR_ASSIGN': 'XOR_BIT_ASIGNACION'
         }
         return traducciones.get(tipo, tipo)
 
@@ -163,6 +272,287 @@ class AnalizadorLexico:
 # Instancia del analizador léxico
 analizador_lexico = AnalizadorLexico()
 
+# Cache de respuestas: el mismo texto con la misma versión del analizador da siempre el mismo resultado.
+# La versión incluye el generador de las tablas LL(1): si cambian la gramática o las tablas, cambia.
+cache_resultados = CacheResultados(huella_modulos(motorlexico, modulo_sintactico, generadorll1, modulo_diagnosticos,
+                                                   modulo_arbol, sys.modules[__name__]))
+_cache_disco, _lock_cache_disco = None, threading.Lock()
+
+
+def cache_disco():
+    # El cache en disco de CACHE_DISCO, abierto con la primera petición que lo usa (None si no hay)
+    global _cache_disco
+    ruta = app.config['CACHE_DISCO']
+    if ruta is None: return None
+    with _lock_cache_disco:
+        if _cache_disco is None or _cache_disco.ruta != ruta:
+            _cache_disco = CacheDisco(ruta, cache_resultados.version, app.config['CACHE_DISCO_MAXIMO_BYTES'],
+                                      app.config['CACHE_DISCO_ESPERA'])
+        return _cache_disco
+
+
+# =======================
+#   MÉTRICAS (/metrics)
+# =======================
+# METRICAS_ACTIVAS se vuelve a leer en cada petición (ver actualizar_metricas): se puede cambiar en marcha
+metricas = RegistroMetricas(app.config['METRICAS_ACTIVAS'])
+duracion_fases = metricas.histograma('analizador_fase_segundos', 'Duración de cada fase de una petición de análisis',
+                                     ('endpoint', 'fase'))
+peticiones = metricas.contador('analizador_peticiones_total', 'Peticiones recibidas por endpoint', ('endpoint',))
+tamano_entrada = metricas.histograma('analizador_entrada_bytes', 'Tamaño del cuerpo de las peticiones de análisis',
+                                     ('endpoint',), LIMITES_BYTES)
+tokens_analizados = metricas.contador('analizador_tokens_total',
+                                      'Tokens analizados (las respuestas servidas desde el cache no cuentan)',
+                                      ('endpoint',))
+errores_sintacticos = metricas.contador('analizador_errores_sintacticos_total',
+                                        'Errores sintácticos encontrados', ('endpoint',))
+presupuestos_excedidos = metricas.contador('analizador_presupuesto_excedido_total',
+                                           'Análisis abortados por superar su presupuesto', ('endpoint', 'motivo'))
+metricas.medidor('analizador_cache_aciertos_total', 'Respuestas servidas desde el cache',
+                 lambda: cache_resultados.aciertos, tipo='counter')
+metricas.medidor('analizador_cache_fallos_total', 'Respuestas que no estaban en el cache',
+                 lambda: cache_resultados.fallos, tipo='counter')
+metricas.medidor('analizador_cache_bytes', 'Bytes guardados en el cache de respuestas', lambda: cache_resultados.bytes)
+metricas.medidor('analizador_cache_disco_aciertos_total', 'Respuestas servidas desde el cache en disco (este proceso)',
+                 lambda: cache_disco().aciertos if cache_disco() is not None else 0, tipo='counter')
+metricas.medidor('analizador_cache_disco_esperas_total',
+                 'Consultas al cache en disco mientras otro proceso calculaba la misma clave (este proceso)',
+                 lambda: cache_disco().esperas if cache_disco() is not None else 0, tipo='counter')
+
+
+def iniciar_medicion(endpoint):
+    peticiones.incrementar(1, endpoint)
+    tamano_entrada.observar(request.content_length or 0, endpoint)
+    return metricas.cronometro(duracion_fases, endpoint)
+
+
+def presupuesto_peticion(data):
+    # El presupuesto configurado, o menor si el cliente lo pide; el plazo cuenta desde ya
+    pedido = (data or {}).get('presupuesto') or {}
+    presupuesto = Presupuesto(app.config['PRESUPUESTO_TOKENS'], app.config['PRESUPUESTO_PROFUNDIDAD'],
+                              app.config['PRESUPUESTO_SEGUNDOS'])
+    return presupuesto.limitar(
+        int(pedido['tokens']) if pedido.get('tokens') is not None else None,
+        int(pedido['profundidad']) if pedido.get('profundidad') is not None else None,
+        float(pedido['segundos']) if pedido.get('segundos') is not None else None)
+
+
+def opciones_sintacticas(data):
+    # Extras opcionales del análisis sintáctico: "diagnosticos": true y "arbol": true, "columnas" o
+    # "binario". Devuelve también el sufijo que distingue la respuesta en el cache.
+    diagnosticos = bool(data.get('diagnosticos'))
+    arbol = data.get('arbol') or None
+    if arbol is True: arbol = 'columnas'
+    if arbol is not None and arbol not in FORMATOS_ARBOL:
+        raise ValueError(f"formato de árbol desconocido: {arbol!r} (se admite {', '.join(FORMATOS_ARBOL)})")
+    sufijo = ('/diagnosticos' if diagnosticos else '') + (f'/arbol-{arbol}' if arbol else '')
+    return diagnosticos, arbol, sufijo
+
+
+def opcion_invalida(error):
+    # Respuesta 400 para una opción de la petición que no se entiende (formato, presupuesto...)
+    return jsonify({'success': False, 'error': f'Opción inválida: {str(error)}'}), 400
+
+
+def contar_presupuesto(resultado, endpoint):
+    excedido = resultado.get('presupuesto_excedido')
+    if excedido is not None: presupuestos_excedidos.incrementar(1, endpoint, excedido['motivo'])
+
+
+def resultado_estable(resultado):
+    # Un análisis abortado por el plazo depende de la carga del servidor en ese momento: no se guarda
+    # ni lleva ETag. Los abortados por tokens o profundidad sólo dependen del texto y los límites.
+    excedido = resultado.get('sintactico', resultado).get('presupuesto_excedido')
+    return excedido is None or excedido['motivo'] != 'tiempo'
+
+
+def codificacion_aceptada():
+    # Compresión de la respuesta que acepta el cliente: brotli si está instalado, si no gzip (None: ninguna)
+    return request.accept_encodings.best_match(CODIFICACIONES)
+
+
+def comprimir(cuerpo, codificacion):
+    if codificacion == 'br': return brotli.compress(cuerpo, quality=5)
+    return gzip.compress(cuerpo, compresslevel=6)
+
+
+def respuesta_cacheada(tipo, texto, calcular, cronometro, presupuesto=None, comprimible=False):
+    # La clave del cache es el ETag: si el cliente ya tiene esta versión se responde 304 sin buscar nada.
+    # Los límites de tokens y profundidad cambian el resultado, así que forman parte de la clave.
+    # comprimible: se comprime según Accept-Encoding; la versión comprimida es otra representación,
+    # con su propio ETag y su propia entrada en el cache de memoria (el de disco guarda la original).
+    if presupuesto is not None: tipo = f'{tipo}/{presupuesto.tokens}/{presupuesto.profundidad}'
+    clave = cache_resultados.clave(tipo, texto)
+    codificacion = codificacion_aceptada() if comprimible else None
+    etag = clave if codificacion is None else f'{clave}-{codificacion}'
+    estable = True
+    if request.if_none_match.contains(etag):
+        respuesta = app.response_class(status=304)
+        cronometro.fase('cache')
+    else:
+        cuerpo = cache_resultados.obtener(etag)
+        if cuerpo is None:
+            def serializar():
+                resultado = calcular()
+                cuerpo = app.json.dumps(resultado).encode('utf-8')
+                cronometro.fase('serializacion')
+                return cuerpo, resultado_estable(resultado)
+            # Con cache en disco, lo que ya calculó otro proceso (o este antes de reiniciarse) se reutiliza
+            disco = cache_disco()
+            cuerpo, estable = serializar() if disco is None else disco.obtener_o_calcular(clave, serializar)
+            if codificacion is not None:
+                cuerpo = comprimir(cuerpo, codificacion)
+                cronometro.fase('compresion')
+            if estable: cache_resultados.guardar(etag, cuerpo)
+        else:
+            cronometro.fase('cache')
+        respuesta = app.response_class(cuerpo, mimetype='application/json')
+        if codificacion is not None: respuesta.content_encoding = codificacion
+    if comprimible: respuesta.vary.add('Accept-Encoding')
+    if estable: respuesta.set_etag(etag)
+    return respuesta
+
+
+def calcular_lexico(texto, cronometro, formato='filas'):
+    tokens = motor_lexico.tokenizar(texto)
+    cronometro.fase('tokenizacion')
+    resultado = resultado_lexico(texto, tokens, formato)
+    cronometro.fase('ensamblado')
+    tokens_analizados.incrementar(len(tokens), 'lexico')
+    return resultado
+
+
+def ejecutor_paralelo(texto):
+    # El pool de procesos de los lotes para las fuentes grandes; el análisis en paralelo da el mismo resultado
+    minimo = app.config['PARALELO_MINIMO']
+    if minimo is None or len(texto) < minimo: return None
+    return analizador_lotes().ejecutor()
+
+
+def calcular_sintactico(texto, cronometro, presupuesto=None, diagnosticos=False, arbol=None):
+    resultado = analizarsintactico(texto, fases=cronometro.fase, presupuesto=presupuesto, diagnosticos=diagnosticos,
+                                   arbol=arbol, paralelo=ejecutor_paralelo(texto))
+    tokens_analizados.incrementar(len(resultado['tokens_lexicos']), 'sintactico')
+    errores_sintacticos.incrementar(resultado['total_errores'], 'sintactico')
+    contar_presupuesto(resultado, 'sintactico')
+    return resultado
+
+
+def opcion_formato_lexico(formato):
+    # Forma de la tabla léxica: "filas" (un objeto por token, por defecto) o "columnas"
+    formato = formato or 'filas'
+    if formato not in FORMATOS_LEXICO:
+        raise ValueError(f"formato léxico desconocido: {formato!r} (se admite {', '.join(FORMATOS_LEXICO)})")
+    return formato
+
+
+def resultado_lexico(texto, tokens=None, formato='filas'):
+    if formato == 'columnas': return resultado_lexico_columnas(texto, tokens)
+    resultados, palabras_reservadas, identificadores, numeros, simbolos = analizador_lexico.analizar(texto, tokens)
+    return {
+        'success': True,
+        'resultados': resultados,
+        'total_tokens': len(resultados),
+        'palabras_reservadas': palabras_reservadas,
+        'identificadores': identificadores,
+        'numeros': numeros,
+        'simbolos': simbolos,
+        'mensaje': f'Se analizaron {len(resultados)} tokens correctamente'
+    }
+
+
+def resultado_lexico_columnas(texto, tokens=None):
+    # Tabla léxica compacta: en lugar de un objeto por token, la leyenda de clases (las columnas de la
+    # fila que sólo dependen del tipo) y tres listas paralelas con la clase, el inicio y la longitud de
+    # cada token en caracteres. La fila i es {token: texto[inicio:inicio + longitud], posicion: i + 1,
+    # linea, columna, **leyenda[clase]}, con la línea y la columna del inicio contadas desde 1.
+    clases, inicios, longitudes = analizador_lexico.analizar_columnas(texto, tokens)
+    palabras_reservadas, identificadores, numeros, simbolos = analizador_lexico.contar_clases(clases)
+    return {
+        'success': True,
+        'columnas': {
+            'leyenda': analizador_lexico.leyenda,
+            'clase': list(clases),
+            'inicio': list(inicios),
+            'longitud': longitudes
+        },
+        'total_tokens': len(clases),
+        'palabras_reservadas': palabras_reservadas,
+        'identificadores': identificadores,
+        'numeros': numeros,
+        'simbolos': simbolos,
+        'mensaje': f'Se analizaron {len(clases)} tokens correctamente'
+    }
+
+
+def lexico_ndjson(texto):
+    # Tabla léxica como JSON por líneas, emitida mientras se escanea: {"evento": "token", ...fila},
+    # {"evento": "diagnostico", ...} por carácter no reconocido y al final {"evento": "resumen", ...}.
+    # Sólo se guarda un tramo de tokens a la vez, sea cual sea el tamaño del texto.
+    posicion, contadores = 0, [0, 0, 0, 0]
+    # Un solo índice de líneas para todos los tramos (cuesta mucho menos que la tabla léxica misma)
+    ubicar = IndiceLineas(texto).ubicar
+    for buffer, desconocidos in motor_lexico.bloques(texto, 1 << 13):
+        filas = [analizador_lexico.fila(codigo, valor, posicion + i + 1, *ubicar(inicio))
+                 for i, (codigo, valor, inicio) in enumerate(zip(buffer.tipos, buffer.valores(), buffer.inicios))]
+        posicion += len(filas)
+        for i, cantidad in enumerate(analizador_lexico.contar(filas)):
+            contadores[i] += cantidad
+        lineas = [json.dumps({'evento': 'token', **fila}, ensure_ascii=False) for fila in filas]
+        for p in desconocidos:
+            linea, columna = ubicar(p)
+            lineas.append(json.dumps({
+                'evento': 'diagnostico',
+                'mensaje': f'Carácter no reconocido: {texto[p]!r}',
+                'posicion': p,
+                'linea': linea,
+                'columna': columna
+            }, ensure_ascii=False))
+        if lineas: yield '\n'.join(lineas) + '\n'
+
+    palabras_reservadas, identificadores, numeros, simbolos = contadores
+    yield json.dumps({
+        'evento': 'resumen',
+        'success': True,
+        'total_tokens': posicion,
+        'palabras_reservadas': palabras_reservadas,
+        'identificadores': identificadores,
+        'numeros': numeros,
+        'simbolos': simbolos,
+        'mensaje': f'Se analizaron {posicion} tokens correctamente'
+    }, ensure_ascii=False) + '\n'
+
+
+def resultado_completo(texto, cronometro, presupuesto=None, diagnosticos=False, arbol=None, formato_lexico='filas'):
+    # Una sola tokenización para la tabla léxica y el análisis sintáctico. Con presupuesto la
+    # tokenización también se puede abortar: entonces no hay tabla léxica
+    try:
+        tokens = motor_sintactico.tokenizar(motor_sintactico.contexto(presupuesto), texto)
+    except PresupuestoExcedido as excedido:
+        sintactico = resultado_presupuesto_excedido(excedido)
+        if diagnosticos: sintactico['diagnosticos'] = [describir((D.PRESUPUESTO_EXCEDIDO, None, str(excedido), None), None)]
+        if arbol: sintactico['arbol'] = None
+        contar_presupuesto(sintactico, 'completo')
+        return {
+            'success': False,
+            'lexico': {'success': False, 'error': sintactico['mensaje']},
+            'sintactico': sintactico
+        }
+    cronometro.fase('tokenizacion')
+    lexico = resultado_lexico(texto, tokens, formato_lexico)
+    cronometro.fase('tabla_lexica')
+    sintactico = analizarsintactico(texto, tokens, presupuesto=presupuesto, diagnosticos=diagnosticos, arbol=arbol,
+                                    paralelo=ejecutor_paralelo(texto))
+    cronometro.fase('analisis')
+    tokens_analizados.incrementar(len(tokens), 'completo')
+    errores_sintacticos.incrementar(sintactico['total_errores'], 'completo')
+    contar_presupuesto(sintactico, 'completo')
+    return {
+        'success': lexico['success'] and sintactico['success'],
+        'lexico': lexico,
+        'sintactico': sintactico
+    }
+
 # =======================
 #   RUTAS FLASK
 # =======================
@@ -170,31 +560,51 @@ analizador_lexico = AnalizadorLexico()
 def index():
     return render_template('index.html')
 
+@app.before_request
+def actualizar_metricas():
+    metricas.activo = app.config['METRICAS_ACTIVAS']
+
+# Cuerpos por encima de MAX_CONTENT_LENGTH: se rechazan antes de que el endpoint intente leerlos
+@app.before_request
+def limitar_cuerpo():
+    limite = app.config['MAX_CONTENT_LENGTH']
+    if limite is not None and (request.content_length or 0) > limite:
+        return jsonify({
+            'success': False,
+            'error': f'El cuerpo supera el máximo de {limite} bytes'
+        }), 413
+
 # --- Endpoint Análisis Léxico ---
 @app.route('/analizar_lexico', methods=['POST'])
 def analizar_lexico():
     try:
-        data = request.get_json()
-        texto = data.get('texto', '')
+        cronometro = iniciar_medicion('lexico')
+        # Fuentes grandes: también se acepta el código como cuerpo text/plain, sin envolverlo en JSON
+        if request.mimetype == 'text/plain':
+            texto, formato = request.get_data(as_text=True), None
+        else:
+            data = request.get_json()
+            texto, formato = data.get('texto', ''), data.get('formato')
+        cronometro.fase('decodificacion')
         
-        if not texto.strip():
+        if not texto or texto.isspace():
             return jsonify({
                 'success': False,
                 'error': 'No se proporcionó texto para analizar'
             })
         
-        resultados, palabras_reservadas, identificadores, numeros, simbolos = analizador_lexico.analizar(texto)
-        
-        return jsonify({
-            'success': True,
-            'resultados': resultados,
-            'total_tokens': len(resultados),
-            'palabras_reservadas': palabras_reservadas,
-            'identificadores': identificadores,
-            'numeros': numeros,
-            'simbolos': simbolos,
-            'mensaje': f'Se analizaron {len(resultados)} tokens correctamente'
-        })
+        formato = request.args.get('formato') or formato
+        if formato == 'ndjson' or request.accept_mimetypes.best_match(
+                ['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+            return Response(lexico_ndjson(texto), mimetype='application/x-ndjson')
+        # "columnas": la forma compacta, que además se comprime si el cliente lo acepta
+        try:
+            formato = opcion_formato_lexico(formato)
+        except ValueError as e:
+            return opcion_invalida(e)
+        return respuesta_cacheada('lexico' if formato == 'filas' else f'lexico-{formato}', texto,
+                                  lambda: calcular_lexico(texto, cronometro, formato), cronometro,
+                                  comprimible=formato == 'columnas')
         
     except Exception as e:
         return jsonify({
@@ -206,10 +616,12 @@ def analizar_lexico():
 @app.route('/analizar_sintactico', methods=['POST'])
 def analizar_sintactico_endpoint():
     try:
+        cronometro = iniciar_medicion('sintactico')
         data = request.get_json()
         texto = data.get('texto', '')
+        cronometro.fase('decodificacion')
 
-        if not texto.strip():
+        if not texto or texto.isspace():
             return jsonify({
                 'success': False,
                 'error': 'No se proporcionó texto para analizar',
@@ -220,11 +632,17 @@ def analizar_sintactico_endpoint():
                 'total_errores': 1
             })
 
-        # Llamar al analizador sintáctico
-        resultado = analizarsintactico(texto)
-        
-        # El resultado ya viene en el formato correcto
-        return jsonify(resultado)
+        # Llamar al analizador sintáctico (el resultado ya viene en el formato correcto)
+        # "diagnosticos": true añade los errores en forma estructurada (código, posición, contexto) y
+        # "arbol" el árbol sintáctico, para no tener que volver a analizar el código en otra herramienta
+        try:
+            presupuesto = presupuesto_peticion(data).iniciar()
+            diagnosticos, arbol, sufijo = opciones_sintacticas(data)
+        except (TypeError, ValueError) as e:
+            return opcion_invalida(e)
+        return respuesta_cacheada('sintactico' + sufijo, texto,
+                                  lambda: calcular_sintactico(texto, cronometro, presupuesto, diagnosticos, arbol),
+                                  cronometro, presupuesto)
 
     except Exception as e:
         return jsonify({
@@ -237,12 +655,260 @@ def analizar_sintactico_endpoint():
             'total_errores': 1
         })
 
+# --- Endpoint Análisis Completo (léxico + sintáctico) ---
+@app.route('/analizar', methods=['POST'])
+def analizar():
+    try:
+        cronometro = iniciar_medicion('completo')
+        data = request.get_json()
+        texto = data.get('texto', '')
+        cronometro.fase('decodificacion')
+
+        if not texto or texto.isspace():
+            return jsonify({
+                'success': False,
+                'error': 'No se proporcionó texto para analizar'
+            })
+
+        try:
+            presupuesto = presupuesto_peticion(data).iniciar()
+            diagnosticos, arbol, sufijo = opciones_sintacticas(data)
+            # "lexico": "columnas" pide la tabla léxica compacta, como el formato de /analizar_lexico
+            formato_lexico = opcion_formato_lexico(data.get('lexico'))
+        except (TypeError, ValueError) as e:
+            return opcion_invalida(e)
+        if formato_lexico != 'filas': sufijo += f'/lexico-{formato_lexico}'
+        return respuesta_cacheada('completo' + sufijo, texto,
+                                  lambda: resultado_completo(texto, cronometro, presupuesto, diagnosticos, arbol,
+                                                             formato_lexico),
+                                  cronometro, presupuesto, comprimible=formato_lexico == 'columnas')
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error al analizar: {str(e)}'
+        })
+
+# Pool de procesos para los lotes (se crea con el primer lote y se reutiliza)
+_analizador_lotes, _config_lotes, _lock_lotes = None, None, threading.Lock()
+
+
+def analizador_lotes():
+    # El analizador de lotes con LOTE_TRABAJADORES y LOTE_TIEMPO_LIMITE actuales, creado al usarlo por
+    # primera vez; si la configuración cambió desde entonces se reemplaza y se cierra el anterior
+    global _analizador_lotes, _config_lotes
+    config = (app.config['LOTE_TRABAJADORES'], app.config['LOTE_TIEMPO_LIMITE'])
+    anterior = None
+    with _lock_lotes:
+        if _analizador_lotes is None or _config_lotes != config:
+            anterior, _analizador_lotes, _config_lotes = _analizador_lotes, AnalizadorLotes(*config), config
+        analizador = _analizador_lotes
+    if anterior is not None: anterior.cerrar()
+    return analizador
+
+# --- Endpoint Análisis por Lotes ---
+@app.route('/analizar_lote', methods=['POST'])
+def analizar_lote():
+    # {fuentes: [{nombre, texto}, ...] o {nombre: texto}, concurrencia?, tiempo_limite?, presupuesto?}
+    try:
+        iniciar_medicion('lote')
+        data = request.get_json()
+        fuentes = data.get('fuentes', [])
+        if isinstance(fuentes, dict):
+            fuentes = [{'nombre': nombre, 'texto': texto} for nombre, texto in fuentes.items()]
+        fuentes = [(str(f.get('nombre', i)), f.get('texto', '')) for i, f in enumerate(fuentes)]
+        if not fuentes:
+            return jsonify({'success': False, 'error': 'No se proporcionaron fuentes para analizar'}), 400
+        if len(fuentes) > app.config['LOTE_MAXIMO_FUENTES']:
+            return jsonify({
+                'success': False,
+                'error': f"El lote admite como mucho {app.config['LOTE_MAXIMO_FUENTES']} fuentes"
+            }), 413
+        if not all(isinstance(texto, str) for _, texto in fuentes):
+            return jsonify({'success': False, 'error': 'Cada fuente debe tener un texto'}), 400
+
+        # Lo pedido por el cliente no puede superar lo configurado
+        concurrencia = data.get('concurrencia') or app.config['LOTE_CONCURRENCIA']
+        if app.config['LOTE_CONCURRENCIA'] and concurrencia:
+            concurrencia = min(int(concurrencia), app.config['LOTE_CONCURRENCIA'])
+        tiempo_limite = min(float(data.get('tiempo_limite') or app.config['LOTE_TIEMPO_LIMITE']),
+                            app.config['LOTE_TIEMPO_LIMITE'])
+
+        # El plazo del presupuesto empieza en el trabajador, con cada fuente
+        presupuesto = presupuesto_peticion(data)
+        inicio = time.perf_counter()
+        resultados = analizador_lotes().analizar(fuentes, concurrencia and int(concurrencia), tiempo_limite, presupuesto)
+        tiempo_total = (time.perf_counter() - inicio) * 1000
+
+        fallidos = sum(1 for r in resultados if 'error' in r)
+        return jsonify({
+            'success': fallidos == 0,
+            'resultados': resultados,
+            'total_fuentes': len(resultados),
+            'total_fallidos': fallidos,
+            'total_con_errores': sum(1 for r in resultados if 'resultado' in r and not r['resultado']['success']),
+            'tiempo_total_ms': round(tiempo_total, 3)
+        })
+
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Lote inválido: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error en el análisis por lotes: {str(e)}'
+        })
+
+# Documentos del editor en vivo: tokens y construcciones de la última versión de cada uno
+documentos = RegistroDocumentos()
+
+# --- Endpoint Análisis Incremental ---
+@app.route('/analizar_incremental', methods=['POST'])
+def analizar_incremental():
+    # {documento, texto} abre o reinicia el documento; {documento, version, ediciones: [{inicio, fin, texto}]}
+    # aplica ediciones (posiciones en caracteres) sobre esa versión. Si el servidor no tiene esa versión
+    # responde 409 y el cliente debe reenviar el texto completo.
+    # Responde como los mensajes de /vivo: al abrir, todos los fragmentos; tras editar, sólo los que
+    # cambiaron desde `version`. Con "completo": true se añade además el resultado entero.
+    # Cada petición tiene el presupuesto de /analizar_sintactico: si lo supera se responde el análisis
+    # abortado, sin versión (el documento no se abre o queda como estaba) y el cliente reenvía el texto.
+    try:
+        iniciar_medicion('incremental')
+        data = request.get_json()
+        id_documento = str(data.get('documento', ''))
+        if not id_documento:
+            return jsonify({'success': False, 'error': 'No se indicó el documento'}), 400
+        presupuesto = presupuesto_peticion(data).iniciar()
+
+        if 'texto' in data:
+            documento = documentos.abrir(id_documento, data['texto'], presupuesto)
+        else:
+            documento = documentos.obtener(id_documento)
+            if documento is None:
+                return jsonify({'success': False, 'error': 'Documento desconocido', 'version': None}), 409
+
+        with documento.lock:
+            if 'texto' not in data:
+                if data.get('version') != documento.version:
+                    return jsonify({
+                        'success': False,
+                        'error': 'La versión del documento no coincide',
+                        'version': documento.version
+                    }), 409
+                for edicion in data.get('ediciones', []):
+                    documento.editar(int(edicion['inicio']), int(edicion['fin']), edicion.get('texto', ''),
+                                     presupuesto)
+            resultado = {'documento': id_documento, 'version': documento.version,
+                         **documento.cambios(completo='texto' in data)}
+            if data.get('completo'): resultado.update(documento.resultado())
+        return jsonify(resultado)
+
+    except PresupuestoExcedido as excedido:
+        resultado = resultado_presupuesto_excedido(excedido)
+        contar_presupuesto(resultado, 'incremental')
+        return jsonify({'documento': id_documento, **resultado})
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Edición inválida: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error en el análisis incremental: {str(e)}',
+            'errores': [f'Error interno: {str(e)}'],
+            'resultados_sintacticos': [],
+            'tokens_lexicos': [],
+            'total_estructuras': 0,
+            'total_errores': 1
+        })
+
+# Canales en vivo de los editores (ver CanalDocumento)
+canales = RegistroDocumentos(fabrica=CanalDocumento)
+
+
+def evento_sse(evento, datos):
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+# --- Canal en vivo: eventos del servidor (SSE) ---
+@app.route('/vivo/<documento>', methods=['GET'])
+def vivo_eventos(documento):
+    # Flujo text/event-stream del documento: "cambios" con los fragmentos que cambiaron desde el mensaje
+    # anterior (el primero trae el documento entero), comentarios de latido y "cerrado" si otra
+    # conexión toma el canal. Las ediciones llegan aparte, por POST a la misma ruta.
+    iniciar_medicion('vivo')
+    canal = canales.obtener_o_abrir(documento)
+    suscripcion = canal.suscribir()
+    latido = app.config['VIVO_LATIDO']
+
+    def eventos():
+        yield 'retry: 1000\n\n'
+        while True:
+            try:
+                mensaje = canal.siguiente(suscripcion, latido)
+            except Exception as e:
+                yield evento_sse('error', {'error': f'Error en el análisis incremental: {str(e)}'})
+                continue
+            if mensaje is CERRADO:
+                yield evento_sse('cerrado', {})
+                return
+            if mensaje is None:
+                yield ': latido\n\n'
+                continue
+            contar_presupuesto(mensaje, 'vivo')
+            tokens_analizados.incrementar(sum(len(f['tokens']) for f in mensaje['fragmentos']), 'vivo')
+            yield evento_sse('cambios', mensaje)
+
+    return Response(eventos(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def texto_edicion(texto):
+    # El canal guarda el texto tal cual y lo analiza más tarde: lo que no es texto se rechaza aquí
+    if not isinstance(texto, str): raise TypeError(f'el texto debe ser una cadena, no {type(texto).__name__}')
+    return texto
+
+
+# --- Canal en vivo: ediciones ---
+@app.route('/vivo/<documento>', methods=['POST'])
+def vivo_editar(documento):
+    # {texto} reemplaza el documento; {version, ediciones: [{inicio, fin, texto}]} aplica ediciones sobre
+    # esa versión (409 si el canal está en otra). Responde enseguida con la versión nueva: el análisis
+    # lo hace el flujo de eventos, que publica sólo la última versión si llegan varias seguidas.
+    try:
+        iniciar_medicion('vivo')
+        data = request.get_json()
+        # El presupuesto de /analizar_sintactico, para el análisis que hace el flujo de eventos
+        presupuesto = presupuesto_peticion(data)
+        if 'texto' in data:
+            version = canales.obtener_o_abrir(documento).reemplazar(texto_edicion(data['texto']), presupuesto)
+        else:
+            canal = canales.obtener(documento)
+            ediciones = [(int(edicion['inicio']), int(edicion['fin']), texto_edicion(edicion.get('texto', '')))
+                         for edicion in data.get('ediciones', [])]
+            version = canal.editar(data.get('version'), ediciones, presupuesto) if canal is not None else None
+            if version is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'La versión del documento no coincide',
+                    'version': canal.version if canal is not None else None
+                }), 409
+        return jsonify({'success': True, 'documento': documento, 'version': version}), 202
+
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Edición inválida: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error en el canal en vivo: {str(e)}'})
+
+# --- Endpoint Métricas (formato de texto de Prometheus) ---
+@app.route('/metrics')
+def metrics():
+    return Response(metricas.exponer(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 # --- Endpoint Test ---
 @app.route('/test')
 def test():
     return jsonify({
         'status': 'OK',
         'message': 'Analizador léxico y sintáctico funcionando',
+        'cache': cache_resultados.estadisticas(),
+        'cache_disco': cache_disco().estadisticas() if cache_disco() is not None else None,
         'tokens_soportados': list(analizador_lexico.tokens.keys()),
         'palabras_reservadas': list(analizador_lexico.palabras_reservadas),
         'estructuras_sintacticas': [
@@ -294,9 +960,14 @@ if __name__ == '__main__':
     print("🚀 Iniciando Analizador Léxico y Sintáctico...")
     print("📍 Disponible en: http://localhost:5000")
     print("🧪 Endpoint de prueba: GET -> http://localhost:5000/test")
+    print("🧪 Endpoint completo: POST -> http://localhost:5000/analizar")
     print("🧪 Endpoint léxico: POST -> http://localhost:5000/analizar_lexico")
     print("🧪 Endpoint sintáctico: POST -> http://localhost:5000/analizar_sintactico")
+    print("🧪 Endpoint incremental: POST -> http://localhost:5000/analizar_incremental")
+    print("🧪 Endpoint por lotes: POST -> http://localhost:5000/analizar_lote")
     print("📚 Ejemplos disponibles: GET -> http://localhost:5000/ejemplos")
+    print("📈 Métricas Prometheus: GET -> http://localhost:5000/metrics")
+    print("⚙️  Servidor asíncrono con límites y contrapresión: python -m servidorasincrono")
     print("=" * 60)
     print("📋 Estructuras sintácticas soportadas:")
     print("   • Declaraciones: int x = 5;")
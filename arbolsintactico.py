@@ -0,0 +1,108 @@
+# Árbol sintáctico compacto. El analizador lo construye sólo si se le pide, y no copia texto: cada
+# nodo es una fila de enteros en columnas (clase, token principal, primer token, token siguiente al
+# último y primer nodo de su subárbol), y los nodos quedan en postorden, así que el subárbol del nodo
+# i son los nodos primeros[i]..i y la raíz es el último.
+import base64
+import struct
+import sys
+from array import array
+from types import SimpleNamespace
+
+CLASES_NODO = (
+    'programa', 'error',
+    # Sentencias (token principal: la palabra clave, o el identificador declarado)
+    'declaracion', 'declaracion_arreglo', 'bloque', 'sentencia_expresion', 'if', 'for', 'while', 'do_while',
+    'salto', 'switch', 'case', 'default', 'vacio',
+    # Expresiones (token principal: el operador, o el propio token en las hojas; en un miembro el
+    # nombre es el token que sigue al operador). Los paréntesis no generan nodo.
+    'identificador', 'literal', 'unario', 'binario', 'ternario', 'asignacion', 'indice', 'llamada',
+    'miembro', 'sufijo', 'lista_valores',
+)
+# Códigos por nombre, como T y D: A.IF, A.BINARIO...
+A = SimpleNamespace(**{clase.upper(): codigo for codigo, clase in enumerate(CLASES_NODO)})
+
+FORMATOS_ARBOL = ('columnas', 'binario')
+# Enteros por nodo en el registro plano que llena el analizador
+CAMPOS_NODO = 5
+FORMATO_BINARIO = b'AST1'
+
+
+def nuevo_registro():
+    # Registro plano: clase, token, inicio, fin y primero de cada nodo, seguidos. Un extend por nodo en
+    # una lista es lo más barato desde el analizador (array.extend con una tupla es unas cinco veces
+    # más lento, y convertir una lista de tuplas a columnas también); las columnas salen al final
+    # con rebanadas.
+    return []
+
+
+class ArbolSintactico:
+    """Nodos del árbol en columnas de enteros (listas, o arrays si vienen del formato binario), en postorden.
+
+    Los tokens se indican por su índice en el BufferTokens del análisis (fin es
+    exclusivo) y el token principal es -1 si el nodo no tiene uno.
+    """
+    __slots__ = ('clases', 'tokens', 'inicios', 'fines', 'primeros')
+
+    def __init__(self, clases, tokens, inicios, fines, primeros):
+        self.clases, self.tokens, self.inicios, self.fines, self.primeros = clases, tokens, inicios, fines, primeros
+
+    @classmethod
+    def desde_registro(cls, registro):
+        return cls(*(registro[campo::CAMPOS_NODO] for campo in range(CAMPOS_NODO)))
+
+    def __len__(self):
+        return len(self.clases)
+
+    @property
+    def raiz(self):
+        return len(self.clases) - 1
+
+    def clase(self, i):
+        return CLASES_NODO[self.clases[i]]
+
+    def hijos(self, i):
+        # De izquierda a derecha: se salta de cada hijo al anterior por el inicio de su subárbol
+        hijos, j, primero = [], i - 1, self.primeros[i]
+        while j >= primero:
+            hijos.append(j)
+            j = self.primeros[j] - 1
+        hijos.reverse()
+        return hijos
+
+    def a_columnas(self):
+        # Forma JSON: una lista por campo en lugar de un objeto por nodo
+        return {
+            'clases': list(CLASES_NODO),
+            'clase': list(self.clases),
+            'token': list(self.tokens),
+            'inicio': list(self.inicios),
+            'fin': list(self.fines),
+            'primero': list(self.primeros),
+        }
+
+    def a_bytes(self):
+        # Formato binario: 'AST1', número de nodos y las columnas en little-endian (la de clases en bytes)
+        columnas = [array('i', columna) for columna in (self.tokens, self.inicios, self.fines, self.primeros)]
+        if sys.byteorder == 'big':
+            for columna in columnas: columna.byteswap()
+        return b''.join([FORMATO_BINARIO, struct.pack('<I', len(self.clases)), bytes(self.clases),
+                         *(columna.tobytes() for columna in columnas)])
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        if datos[:4] != FORMATO_BINARIO: raise ValueError('No es un árbol sintáctico en formato binario')
+        n, = struct.unpack_from('<I', datos, 4)
+        clases = array('B', datos[8:8 + n])
+        columnas, pos = [], 8 + n
+        for _ in range(4):
+            columna = array('i', datos[pos:pos + 4 * n])
+            if sys.byteorder == 'big': columna.byteswap()
+            columnas.append(columna)
+            pos += 4 * n
+        return cls(clases, *columnas)
+
+
+def serializar(arbol, formato='columnas'):
+    # Para una respuesta JSON: las columnas, o el formato binario en base64
+    if formato == 'binario': return base64.b64encode(arbol.a_bytes()).decode('ascii')
+    return arbol.a_columnas()
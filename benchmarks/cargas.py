@@ -0,0 +1,67 @@
+# Generadores de cargas sintéticas en C para los benchmarks. Son deterministas: la misma llamada
+# produce siempre el mismo texto, así los resultados son comparables con la línea base.
+import random
+
+TIPOS = ('int', 'float', 'double', 'char', 'bool')
+OPERADORES = ('+', '-', '*', '/', '%', '<<', '>>', '&', '|', '^', '&&', '||', '<', '>=', '==', '!=')
+
+
+def declaraciones(cantidad=20000):
+    # Muchas declaraciones con inicialización, de todos los tipos
+    valores = {'int': '{i}', 'float': '{i}.5f', 'double': '{i}.25e-3', 'char': "'c'", 'bool': 'true'}
+    lineas = []
+    for i in range(cantidad):
+        tipo = TIPOS[i % len(TIPOS)]
+        lineas.append(f"{tipo} v{i} = {valores[tipo].format(i=i)};")
+    return '\n'.join(lineas) + '\n'
+
+
+def expresion_plana(operandos=20000):
+    # Una sola expresión muy larga sin paréntesis: todos los niveles de precedencia mezclados
+    partes = ['resultado = a0']
+    for i in range(1, operandos):
+        partes.append(f' {OPERADORES[i % len(OPERADORES)]} a{i}')
+    return ''.join(partes) + ';\n'
+
+
+def anidado(profundidad=30, repeticiones=40):
+    # if / for / while / switch alternados, cada nivel con una sentencia y el siguiente dentro
+    def nivel(d):
+        sangria = '    ' * d
+        if d == profundidad:
+            return f'{sangria}x = x + {d};\n'
+        interior = nivel(d + 1)
+        forma = d % 4
+        if forma == 0:
+            return (f'{sangria}if (x > {d}) {{\n{sangria}    y = y * 2;\n{interior}{sangria}}} else {{\n'
+                    f'{sangria}    y = y - 1;\n{sangria}}}\n')
+        if forma == 1:
+            return f'{sangria}for (i{d} = 0; i{d} < 10; i{d}++) {{\n{sangria}    z = z + i{d};\n{interior}{sangria}}}\n'
+        if forma == 2:
+            return f'{sangria}while (w < {d}) {{\n{sangria}    w++;\n{interior}{sangria}}}\n'
+        return (f'{sangria}switch (s) {{\n{sangria}case {d}:\n{interior}{sangria}    break;\n'
+                f'{sangria}default:\n{sangria}    s = 0;\n{sangria}}}\n')
+    return nivel(0) * repeticiones
+
+
+def inicializador(elementos=50000):
+    # Una lista de inicialización de arreglo enorme
+    return f"int datos[{elementos}] = {{{', '.join(str(i * 7 % 1000) for i in range(elementos))}}};\n"
+
+
+def basura(tokens=30000, semilla=0):
+    # Secuencia aleatoria de tokens válidos sin estructura: un error tras otro, para medir la recuperación
+    piezas = ('int', 'if', 'else', 'for', 'while', 'switch', 'case', 'return', 'x', 'y', '42', '3.14', '"s"',
+              "'c'", '(', ')', '{', '}', '[', ']', ';', ',', '=', '+', '*', '<', '&&', '?', ':', '->', '@')
+    rng = random.Random(semilla)
+    return ' '.join(rng.choice(piezas) for _ in range(tokens)) + '\n'
+
+
+# Nombre de la carga y generador con el tamaño por defecto multiplicado por la escala
+CARGAS = {
+    'declaraciones': lambda escala: declaraciones(max(1, int(20000 * escala))),
+    'expresion_plana': lambda escala: expresion_plana(max(2, int(20000 * escala))),
+    'anidado': lambda escala: anidado(30, max(1, int(40 * escala))),
+    'inicializador': lambda escala: inicializador(max(1, int(50000 * escala))),
+    'basura': lambda escala: basura(max(1, int(30000 * escala))),
+}
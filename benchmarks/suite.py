@@ -0,0 +1,187 @@
+# Suite de rendimiento: cada carga sintética contra cada fase del análisis y los endpoints HTTP.
+# Guarda el throughput en una línea base JSON y falla si alguna medición cae más del umbral.
+#
+#   python -m benchmarks.suite [--guardar] [--umbral 15] [--escala 1.0] [--repeticiones 5]
+#                              [--base benchmarks/linea_base.json] [--filtro texto] [--minimo 0.1]
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+from analizadorsintactico import motor_sintactico
+from benchmarks.cargas import CARGAS
+
+LINEA_BASE = os.path.join(os.path.dirname(__file__), 'linea_base.json')
+
+
+def _cliente_http():
+    # Importado al usarlo: la suite de fases no necesita Flask. El cache de respuestas se desactiva
+    # para medir el análisis y no la búsqueda.
+    import app as aplicacion
+    aplicacion.cache_resultados.maximo_bytes = 0
+    return aplicacion, aplicacion.app.test_client()
+
+
+# Cada objetivo recibe el texto, hace la preparación que no se mide y devuelve la función que se mide
+def _tokenizar(texto):
+    return lambda: motor_sintactico.tokenizar(motor_sintactico.contexto(), texto)
+
+
+def _analizar_programa(texto):
+    tokens = _tokenizar(texto)()
+    return lambda: motor_sintactico.analizar_programa(motor_sintactico.contexto(), tokens, 0)
+
+
+def _arbol(texto):
+    # Análisis construyendo el árbol sintáctico: la diferencia con analizar_programa es lo que cuesta
+    tokens = _tokenizar(texto)()
+
+    def analizar():
+        ctx = motor_sintactico.contexto(arbol=True)
+        motor_sintactico.analizar_programa(ctx, tokens, 0)
+        return ctx.arbol()
+    return analizar
+
+
+def _paralelo(texto):
+    # analizar_programa repartido por tramos en un pool con un proceso por núcleo
+    from concurrent.futures import ProcessPoolExecutor
+    global _pool
+    if _pool is None: _pool = ProcessPoolExecutor()
+    tokens = _tokenizar(texto)()
+    return lambda: motor_sintactico.analizar_programa_paralelo(motor_sintactico.contexto(), tokens, _pool)
+
+
+_pool = None
+
+
+def _tabla_lexica(texto):
+    aplicacion, _ = _cliente_http()
+    return lambda: aplicacion.analizador_lexico.analizar(texto)
+
+
+def _endpoint(ruta, **opciones):
+    def preparar(texto):
+        _, cliente = _cliente_http()
+        return lambda: cliente.post(ruta, json={'texto': texto, **opciones}).data
+    return preparar
+
+
+OBJETIVOS = {
+    'tokenizar': _tokenizar,
+    'analizar_programa': _analizar_programa,
+    'arbol': _arbol,
+    'paralelo': _paralelo,
+    'tabla_lexica': _tabla_lexica,
+    'http_lexico': _endpoint('/analizar_lexico'),
+    'http_lexico_columnas': _endpoint('/analizar_lexico', formato='columnas'),
+    'http_sintactico': _endpoint('/analizar_sintactico'),
+    'http_completo': _endpoint('/analizar'),
+}
+
+
+def mejor_tiempo(funcion, repeticiones, minimo=0.1):
+    # Mejor de N con el recolector de basura apagado, como timeit. Cada repetición llama a la función
+    # las vueltas necesarias para durar al menos `minimo` segundos: las cargas de pocos milisegundos
+    # son demasiado ruidosas para compararlas contra un umbral.
+    funcion()
+    gc.collect()
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        vueltas = 1
+        while True:
+            inicio = time.perf_counter()
+            for _ in range(vueltas): funcion()
+            duracion = time.perf_counter() - inicio
+            if duracion >= minimo: break
+            vueltas *= 2
+        mejor = duracion / vueltas
+        for _ in range(repeticiones - 1):
+            inicio = time.perf_counter()
+            for _ in range(vueltas): funcion()
+            mejor = min(mejor, (time.perf_counter() - inicio) / vueltas)
+        return mejor
+    finally:
+        if activo: gc.enable()
+
+
+def ejecutar(escala, repeticiones, filtro=None, minimo=0.1):
+    resultados = {}
+    for nombre_carga, generar in CARGAS.items():
+        texto = generar(escala)
+        megabytes = len(texto.encode('utf-8')) / 1e6
+        tokens = len(_tokenizar(texto)())
+        for nombre_objetivo, preparar in OBJETIVOS.items():
+            caso = f'{nombre_carga}/{nombre_objetivo}'
+            if filtro and filtro not in caso: continue
+            funcion = preparar(texto)
+            segundos = mejor_tiempo(funcion, repeticiones, minimo)
+            resultados[caso] = {
+                'mb_s': round(megabytes / segundos, 4),
+                'tokens_s': round(tokens / segundos, 1),
+                'segundos': round(segundos, 6),
+                'bytes': int(megabytes * 1e6),
+                'tokens': tokens,
+            }
+            print(f"  {caso:<36} {megabytes / segundos:8.2f} MB/s {tokens / segundos:12.0f} tokens/s", flush=True)
+    return resultados
+
+
+def comparar(resultados, base, umbral):
+    # Casos cuyo throughput cayó más de `umbral` por ciento respecto de la línea base
+    regresiones = []
+    for caso, medicion in resultados.items():
+        anterior = base.get(caso)
+        if anterior is None: continue
+        cambio = (medicion['mb_s'] - anterior['mb_s']) / anterior['mb_s'] * 100
+        marca = '❌' if cambio < -umbral else '✅'
+        print(f"  {marca} {caso:<36} {anterior['mb_s']:8.2f} -> {medicion['mb_s']:8.2f} MB/s ({cambio:+.1f}%)")
+        if cambio < -umbral: regresiones.append(caso)
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Suite de rendimiento del analizador con líneas base')
+    parser.add_argument('--base', default=LINEA_BASE, help='archivo JSON de la línea base')
+    parser.add_argument('--guardar', action='store_true', help='guardar los resultados como nueva línea base')
+    parser.add_argument('--umbral', type=float, default=15.0, help='caída máxima de throughput tolerada (%%)')
+    parser.add_argument('--escala', type=float, default=1.0, help='multiplica el tamaño de todas las cargas')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--filtro', help='sólo los casos cuyo nombre contenga este texto')
+    parser.add_argument('--minimo', type=float, default=0.1, help='segundos mínimos por repetición')
+    args = parser.parse_args(argv)
+
+    print(f"Escala {args.escala}, mejor de {args.repeticiones} repeticiones")
+    resultados = ejecutar(args.escala, args.repeticiones, args.filtro, args.minimo)
+
+    if args.guardar:
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump({'escala': args.escala, 'python': platform.python_version(), 'maquina': platform.node(),
+                       'fecha': time.strftime('%Y-%m-%d %H:%M:%S'), 'resultados': resultados}, f, indent=2)
+        print(f"💾 Línea base guardada en {args.base}")
+        return 0
+
+    if not os.path.exists(args.base):
+        print(f"ℹ️  No hay línea base en {args.base}: ejecuta con --guardar para crearla")
+        return 0
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    if base.get('escala') != args.escala:
+        print(f"❌ La línea base se midió con escala {base.get('escala')}, no {args.escala}")
+        return 2
+
+    print(f"Comparación con la línea base ({base.get('fecha')}, umbral {args.umbral:.0f}%):")
+    regresiones = comparar(resultados, base['resultados'], args.umbral)
+    if regresiones:
+        print(f"❌ {len(regresiones)} caso(s) más lentos que la línea base: {', '.join(regresiones)}")
+        return 1
+    print("✅ Sin regresiones de rendimiento")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def huella_modulos(*modulos):
+    # Versión del analizador: hash del código fuente de los módulos que producen los resultados, así
+    # un cambio en el analizador invalida las entradas y ETags anteriores sin tener que recordarlo
+    h = hashlib.sha256()
+    for modulo in modulos:
+        with open(modulo.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+class CacheResultados:
+    """Resultados ya serializados, indexados por el contenido analizado.
+
+    La clave es un hash de la versión del analizador, el tipo de análisis y el
+    texto, y sirve también como ETag. Se expulsan las entradas usadas hace más
+    tiempo cuando el total de bytes guardados supera el máximo.
+    """
+
+    def __init__(self, version, maximo_bytes=32 * 1024 * 1024):
+        self.version = version
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clave(self, tipo, texto):
+        h = hashlib.sha256(f'{self.version}\0{tipo}\0'.encode())
+        h.update(texto.encode('utf-8', 'surrogatepass'))
+        return h.hexdigest()
+
+    def obtener(self, clave):
+        with self._lock:
+            cuerpo = self._entradas.get(clave)
+            if cuerpo is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return cuerpo
+
+    def guardar(self, clave, cuerpo):
+        if len(cuerpo) > self.maximo_bytes: return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None: self.bytes -= len(anterior)
+            self._entradas[clave] = cuerpo
+            self.bytes += len(cuerpo)
+            while self.bytes > self.maximo_bytes:
+                _, expulsado = self._entradas.popitem(last=False)
+                self.bytes -= len(expulsado)
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self.bytes,
+                'maximo_bytes': self.maximo_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0
+            }
+
+
+# Esquema del cache en disco. El total de bytes lo mantienen los disparadores, así es el mismo para
+# todos los procesos sin recorrer la tabla; calculos tiene las reservas de las claves en cálculo.
+ESQUEMA_DISCO = """
+CREATE TABLE IF NOT EXISTS entradas (clave TEXT PRIMARY KEY, version TEXT NOT NULL, cuerpo BLOB NOT NULL,
+                                     usado REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS entradas_usado ON entradas (usado);
+CREATE TABLE IF NOT EXISTS calculos (clave TEXT PRIMARY KEY, expira REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO total VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entradas_insertar AFTER INSERT ON entradas
+    BEGIN UPDATE total SET bytes = bytes + length(NEW.cuerpo); END;
+CREATE TRIGGER IF NOT EXISTS entradas_actualizar AFTER UPDATE OF cuerpo ON entradas
+    BEGIN UPDATE total SET bytes = bytes + length(NEW.cuerpo) - length(OLD.cuerpo); END;
+CREATE TRIGGER IF NOT EXISTS entradas_borrar AFTER DELETE ON entradas
+    BEGIN UPDATE total SET bytes = bytes - length(OLD.cuerpo); END;
+"""
+# Segundos entre actualizaciones de la hora de uso de una entrada (un acierto no escribe cada vez)
+REFRESCO_USO = 60.0
+# Entradas que se expulsan de una vez al pasar del máximo
+EXPULSION_POR_LOTE = 64
+
+
+class CacheDisco:
+    """Resultados serializados en un archivo SQLite local, compartido por los procesos del servidor.
+
+    Usa las claves de CacheResultados (con la misma versión), así que un
+    proceso encuentra lo que calculó otro, y lo calculado sobrevive a un
+    reinicio. El archivo está en modo WAL: las lecturas no esperan a las
+    escrituras. Al abrirlo se borran las entradas de otras versiones del
+    analizador, y al pasar de maximo_bytes se expulsan las usadas hace más
+    tiempo. Una clave que falta la calcula un solo proceso: los demás esperan
+    a que aparezca (como mucho `espera` segundos; después la calculan ellos).
+    """
+
+    def __init__(self, ruta, version, maximo_bytes=256 * 1024 * 1024, espera=10.0):
+        self.ruta = ruta
+        self.version = version
+        self.maximo_bytes = maximo_bytes
+        self.espera = espera
+        self.aciertos = 0
+        self.fallos = 0
+        self.esperas = 0
+        self._lock = threading.Lock()
+        # Una conexión por hilo, y otra nueva en un proceso hijo (no se comparten a través de fork)
+        self._local = threading.local()
+        self._conexion().execute('DELETE FROM entradas WHERE version != ?', (version,))
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            conexion.executescript(ESQUEMA_DISCO)
+            self._local.conexion, self._local.pid = conexion, os.getpid()
+        return conexion
+
+    def obtener(self, clave):
+        cuerpo = self._leer(clave)
+        self._contar(cuerpo is not None)
+        return cuerpo
+
+    def _contar(self, acierto, espera=False):
+        # Un solo resultado por consulta: acierto, espera (servida por el cálculo de otro proceso) o fallo
+        with self._lock:
+            if espera: self.esperas += 1
+            elif acierto: self.aciertos += 1
+            else: self.fallos += 1
+
+    def _leer(self, clave):
+        conexion = self._conexion()
+        fila = conexion.execute('SELECT cuerpo, usado FROM entradas WHERE clave = ?', (clave,)).fetchone()
+        if fila is None: return None
+        ahora = time.time()
+        if ahora - fila[1] > REFRESCO_USO:
+            conexion.execute('UPDATE entradas SET usado = ? WHERE clave = ?', (ahora, clave))
+        return bytes(fila[0])
+
+    def guardar(self, clave, cuerpo):
+        if len(cuerpo) > self.maximo_bytes: return
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            conexion.execute('INSERT INTO entradas VALUES (?, ?, ?, ?) ON CONFLICT (clave) DO UPDATE SET '
+                             'cuerpo = excluded.cuerpo, usado = excluded.usado',
+                             (clave, self.version, cuerpo, time.time()))
+            while conexion.execute('SELECT bytes FROM total').fetchone()[0] > self.maximo_bytes:
+                conexion.execute('DELETE FROM entradas WHERE clave IN '
+                                 '(SELECT clave FROM entradas ORDER BY usado LIMIT ?)', (EXPULSION_POR_LOTE,))
+            conexion.execute('COMMIT')
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+
+    def _reservar(self, clave):
+        # True si este proceso se queda con el cálculo de la clave (la reserva de otro que se pasó de
+        # la espera, p. ej. porque murió, ya no cuenta)
+        conexion, ahora = self._conexion(), time.time()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            conexion.execute('DELETE FROM calculos WHERE clave = ? AND expira < ?', (clave, ahora))
+            reservada = conexion.execute('INSERT OR IGNORE INTO calculos VALUES (?, ?)',
+                                         (clave, ahora + self.espera)).rowcount == 1
+            conexion.execute('COMMIT')
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        return reservada
+
+    def _liberar(self, clave):
+        self._conexion().execute('DELETE FROM calculos WHERE clave = ?', (clave,))
+
+    def obtener_o_calcular(self, clave, calcular):
+        # (cuerpo, guardable): el guardado, o el que devuelve calcular() si no estaba. Mientras otro
+        # proceso calcula la misma clave se espera a su resultado en lugar de repetir el trabajo; lo
+        # no guardable (p. ej. un análisis cortado por el plazo) sólo lo recibe quien lo calculó.
+        cuerpo = self._leer(clave)
+        if cuerpo is not None:
+            self._contar(True)
+            return cuerpo, True
+        limite, pausa = time.monotonic() + self.espera, 0.005
+        while not self._reservar(clave):
+            if time.monotonic() > limite: break
+            time.sleep(pausa)
+            pausa = min(pausa * 2, 0.1)
+            cuerpo = self._leer(clave)
+            if cuerpo is not None:
+                self._contar(True, espera=True)
+                return cuerpo, True
+        self._contar(False)
+        try:
+            cuerpo, guardable = calcular()
+            if guardable: self.guardar(clave, cuerpo)
+        finally:
+            self._liberar(clave)
+        return cuerpo, guardable
+
+    def estadisticas(self):
+        conexion = self._conexion()
+        with self._lock: aciertos, fallos, esperas = self.aciertos, self.fallos, self.esperas
+        # Las esperas también se sirven del cache: cuentan como aciertos en la tasa
+        consultas = aciertos + fallos + esperas
+        return {
+            'ruta': self.ruta,
+            'entradas': conexion.execute('SELECT COUNT(*) FROM entradas').fetchone()[0],
+            'bytes': conexion.execute('SELECT bytes FROM total').fetchone()[0],
+            'maximo_bytes': self.maximo_bytes,
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'esperas': esperas,
+            'tasa_aciertos': round((aciertos + esperas) / consultas, 4) if consultas else 0.0
+        }
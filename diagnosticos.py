@@ -0,0 +1,179 @@
+# Diagnósticos del analizador sintáctico como registros compactos. Durante el análisis sólo se
+# guardan tuplas (código, índice de token, argumento, causa) y códigos enteros; los mensajes en
+# español se redactan al construir la respuesta, y sólo los que se van a enviar.
+#
+# Un fallo dentro de otra construcción se envuelve con un código de contexto cuya causa es el
+# diagnóstico interior: ('en_condicion_if', ..., causa=('esperaba_parentesis_cierre', ...)) se
+# redacta "Error en condición del if: Se esperaba ')'".
+from string import Formatter
+from types import SimpleNamespace
+
+# (clave, prefijo, plantilla) por código, que es la posición en la lista. Campos de las plantillas:
+# {valor} el token del diagnóstico, {siguiente} y {anterior} sus vecinos, {argumento} el argumento.
+# El prefijo se usa cuando el código es el más externo de la cadena.
+CATALOGO = [
+    # Construcciones reconocidas (el índice es el primer token)
+    ('declaracion', '✅ ', 'Declaración: {valor} {siguiente}'),
+    ('bloque', '✅ ', 'Bloque válido'),
+    ('sentencia_expresion', '✅ ', 'Sentencia de expresión válida'),
+    ('sentencia_if', '✅ ', 'Sentencia if válida'),
+    ('sentencia_for', '✅ ', 'Sentencia for válida'),
+    ('sentencia_while', '✅ ', 'Sentencia while válida'),
+    ('sentencia_do_while', '✅ ', 'Sentencia do-while válida'),
+    ('sentencia_salto', '✅ ', 'Sentencia {valor} válida'),
+    ('sentencia_switch', '✅ ', 'Sentencia switch válida'),
+    ('expresion', '✅ ', 'Expresión válida'),
+    ('lista_argumentos', '✅ ', 'Lista de argumentos válida'),
+    ('lista_valores', '✅ ', 'Lista de valores válida'),
+    ('case', '✅ ', 'Case válido'),
+    ('default', '✅ ', 'Default válido'),
+    ('programa', '✅ ', 'Programa analizado'),
+
+    # Errores (el índice es el token en el que se detectó)
+    ('sin_tokens', '❌ ', 'No hay tokens para analizar'),
+    ('esperaba_tipo', '❌ ', 'Se esperaba tipo de dato'),
+    ('esperaba_identificador', '❌ ', 'Se esperaba identificador después del tipo'),
+    ('esperaba_tamano_array', '❌ ', 'Se esperaba tamaño del array'),
+    ('esperaba_corchete_cierre', '❌ ', "Se esperaba ']'"),
+    ('esperaba_llave_inicializacion', '❌ ', "Se esperaba '{{' para inicialización del array"),
+    ('esperaba_llave_apertura', '❌ ', "Se esperaba '{{'"),
+    ('esperaba_llave_cierre', '❌ ', "Se esperaba '}}'"),
+    ('esperaba_punto_y_coma', '❌ ', "Se esperaba ';'"),
+    ('esperaba_palabra', '❌ ', "Se esperaba '{argumento}'"),
+    ('esperaba_parentesis_tras', '❌ ', "Se esperaba '(' después de '{argumento}'"),
+    ('esperaba_parentesis_condicion', '❌ ', "Se esperaba ')' después de la condición"),
+    ('esperaba_punto_y_coma_inicializacion_for', '❌ ', "Se esperaba ';' después de la inicialización"),
+    ('esperaba_punto_y_coma_condicion_for', '❌ ', "Se esperaba ';' después de la condición"),
+    ('esperaba_parentesis_actualizacion', '❌ ', "Se esperaba ')' después de la actualización"),
+    ('esperaba_while_do', '❌ ', "Se esperaba 'while' después del cuerpo do"),
+    ('esperaba_punto_y_coma_do_while', '❌ ', "Se esperaba ';' después del do-while"),
+    ('esperaba_salto', '❌ ', 'Se esperaba break, continue o return'),
+    ('esperaba_punto_y_coma_salto', '❌ ', "Se esperaba ';' después de {argumento}"),
+    ('esperaba_expresion', '❌ ', 'Se esperaba expresión unaria'),
+    ('esperaba_parentesis_cierre', '❌ ', "Se esperaba ')'"),
+    ('token_inesperado', '❌ ', "Token inesperado en expresión primaria: '{valor}'"),
+    ('esperaba_miembro', '❌ ', "Se esperaba identificador después de '{anterior}'"),
+    ('esperaba_dos_puntos_ternario', '❌ ', "Se esperaba ':' en operador ternario"),
+    ('esperaba_parentesis_switch', '❌ ', "Se esperaba ')' después de la expresión"),
+    ('esperaba_llave_switch', '❌ ', "Se esperaba '{{' después de switch"),
+    ('esperaba_case', '❌ ', "Se esperaba 'case' o 'default', se encontró '{valor}'"),
+    ('esperaba_llave_cierre_switch', '❌ ', "Se esperaba '}}' para cerrar switch"),
+    ('esperaba_constante_case', '❌ ', "Se esperaba constante después de 'case'"),
+    ('esperaba_dos_puntos', '❌ ', "Se esperaba ':' después de {argumento}"),
+
+    # Contextos: envuelven el diagnóstico de la construcción interior que falló
+    ('en_lista_valores', '❌ ', 'Error en lista de valores'),
+    ('en_inicializacion', '❌ ', 'Error en inicialización'),
+    ('en_declaracion_bloque', '❌ ', 'Error en declaración del bloque'),
+    ('en_sentencia_bloque', '❌ ', 'Error en sentencia del bloque'),
+    ('en_expresion', '❌ ', 'Error en expresión'),
+    ('en_condicion_if', '❌ ', 'Error en condición del if'),
+    ('en_cuerpo_if', '❌ ', 'Error en cuerpo del if'),
+    ('en_cuerpo_else', '❌ ', 'Error en cuerpo del else'),
+    ('en_inicializacion_for', '❌ ', 'Error en inicialización del for'),
+    ('en_condicion_for', '❌ ', 'Error en condición del for'),
+    ('en_actualizacion_for', '❌ ', 'Error en actualización del for'),
+    ('en_cuerpo_for', '❌ ', 'Error en cuerpo del for'),
+    ('en_cuerpo_do', '❌ ', 'Error en cuerpo del do'),
+    ('en_condicion_while', '❌ ', 'Error en condición del while'),
+    ('en_cuerpo_while', '❌ ', 'Error en cuerpo del while'),
+    ('en_expresion_return', '❌ ', 'Error en expresión de return'),
+    ('en_parentesis', '❌ ', 'Error en expresión entre paréntesis'),
+    ('en_indice', '❌ ', 'Error en índice del array'),
+    ('en_argumentos', '❌ ', 'Error en argumentos'),
+    ('despues_operador', '❌ ', 'Error después del operador {argumento}'),
+    ('en_ternario_verdadero', '❌ ', 'Error en parte verdadera del operador ternario'),
+    ('en_ternario_falso', '❌ ', 'Error en parte falsa del operador ternario'),
+    ('despues_asignacion', '❌ ', 'Error después del operador de asignación'),
+    ('en_argumento', '❌ ', 'Error en argumento'),
+    ('en_argumento_siguiente', '❌ ', "Error en argumento después de ','"),
+    ('en_valor', '❌ ', 'Error en valor'),
+    ('en_valor_siguiente', '❌ ', "Error en valor después de ','"),
+    ('en_expresion_switch', '❌ ', 'Error en expresión del switch'),
+    ('en_sentencia_case', '❌ ', 'Error en sentencia del case'),
+    ('en_sentencia_default', '❌ ', 'Error en sentencia del default'),
+
+    # Del análisis completo
+    ('tokens_no_procesados', '', 'Tokens no procesados: {argumento}'),
+    ('presupuesto_excedido', '⛔ ', 'Análisis abortado: {argumento}'),
+    ('texto_vacio', '', 'Texto vacío o solo espacios'),
+    ('sin_tokens_validos', '', 'No se encontraron tokens válidos'),
+    ('error_interno', '', 'Error interno: {argumento}'),
+]
+
+# Códigos enteros por nombre, para el camino caliente: D.ESPERABA_PUNTO_Y_COMA, D.EN_CONDICION_IF...
+D = SimpleNamespace(**{clave.upper(): codigo for codigo, (clave, _, _) in enumerate(CATALOGO)})
+CLAVES = tuple(clave for clave, _, _ in CATALOGO)
+EXITOS = frozenset(codigo for codigo, (_, prefijo, _) in enumerate(CATALOGO) if prefijo == '✅ ')
+# Campos que usa cada plantilla, para no leer tokens que no hacen falta
+_CAMPOS = tuple(frozenset(campo for _, campo, _, _ in Formatter().parse(plantilla) if campo)
+                for _, _, plantilla in CATALOGO)
+
+
+def _frase(codigo, indice, argumento, tokens):
+    plantilla, campos = CATALOGO[codigo][2], _CAMPOS[codigo]
+    if not campos: return plantilla.format()
+    valores = {}
+    if 'valor' in campos: valores['valor'] = tokens.valor(indice)
+    if 'siguiente' in campos: valores['siguiente'] = tokens.valor(indice + 1)
+    if 'anterior' in campos: valores['anterior'] = tokens.valor(indice - 1)
+    if 'argumento' in campos: valores['argumento'] = argumento
+    return plantilla.format(**valores)
+
+
+def redactar(registro, tokens, prefijo=True):
+    # Mensaje en español de un diagnóstico y su cadena de causas, con el prefijo ✅/❌ del más externo
+    partes = []
+    primero = registro[0]
+    while registro is not None:
+        codigo, indice, argumento, registro = registro
+        partes.append(_frase(codigo, indice, argumento, tokens))
+    texto = ': '.join(partes)
+    return CATALOGO[primero][1] + texto if prefijo else texto
+
+
+def desplazar(registro, desplazamiento):
+    # El mismo diagnóstico con los índices de token movidos (de un tramo de tokens al buffer entero).
+    # Sin recursión: la cadena de causas es tan larga como el anidamiento de la construcción.
+    cadena = []
+    while registro is not None:
+        cadena.append(registro)
+        registro = registro[3]
+    for codigo, indice, argumento, _ in reversed(cadena):
+        registro = (codigo, indice if indice is None else indice + desplazamiento, argumento, registro)
+    return registro
+
+
+def describir(registro, tokens):
+    # Forma para clientes de la API: el código estable del diagnóstico más interno (el que dice qué
+    # falló), dónde (índice de token, posiciones en caracteres y línea y columna de inicio y fin), los
+    # contextos que lo envuelven de fuera hacia dentro y el mensaje redactado
+    contexto = []
+    actual = registro
+    while actual[3] is not None:
+        contexto.append(CLAVES[actual[0]])
+        actual = actual[3]
+    codigo, indice, argumento, _ = actual
+    if indice is None:
+        inicio = fin = None
+    elif indice < len(tokens):
+        inicio, fin = tokens.inicios[indice], tokens.fines[indice]
+    else:
+        # Al final de la entrada: justo después del último token
+        inicio = fin = tokens.fines[-1] if len(tokens) else 0
+    descripcion = {
+        'codigo': CLAVES[codigo],
+        'severidad': 'informacion' if codigo in EXITOS else 'error',
+        'mensaje': redactar(registro, tokens, prefijo=False),
+        'token': indice,
+        'inicio': inicio,
+        'fin': fin,
+        'linea': None, 'columna': None, 'linea_fin': None, 'columna_fin': None,
+        'contexto': contexto,
+    }
+    if inicio is not None:
+        ubicar = tokens.lineas().ubicar
+        descripcion['linea'], descripcion['columna'] = ubicar(inicio)
+        descripcion['linea_fin'], descripcion['columna_fin'] = ubicar(fin)
+    if argumento is not None: descripcion['argumento'] = argumento
+    return descripcion
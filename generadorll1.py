@@ -0,0 +1,247 @@
+# Generador de tablas LL(1). La gramática de las sentencias se escribe como datos (reglas con sus
+# alternativas, los diagnósticos de cada token esperado y el nodo del árbol de cada alternativa) y
+# de ahí se calculan los conjuntos PRIMERO y SIGUIENTE y una tabla por no terminal que, para cada
+# token siguiente, dice qué alternativa seguir. El motor sintáctico ejecuta las tablas con una pila
+# explícita (ver MotorSintactico._ejecutar).
+#
+#   python -m generadorll1    muestra PRIMERO, SIGUIENTE y los conflictos resueltos de la gramática
+#
+# Las tablas se indexan por código de token, con FIN para el final de la entrada. Los tokens que
+# no están en la tabla de una regla van a su alternativa por defecto: así un error se informa en
+# el mismo sitio que en un analizador descendente escrito a mano (p. ej. una sentencia que no
+# empieza por palabra clave es una expresión, y el error lo da el analizador de expresiones).
+import sys
+
+FIN = 256
+TOKENS_TABLA = FIN + 1
+
+# Instrucciones de las producciones compiladas (tuplas cuyo primer elemento es la operación)
+TERMINAL, EXTERNO, NO_TERMINAL, COMPLETAR, ERROR = range(5)
+
+
+class GramaticaNoLL1(Exception):
+    pass
+
+
+class Terminal:
+    # Un token de `tipos` (un código o varios); si falta, el diagnóstico (diagnostico, posición,
+    # argumento). hoja: clase de nodo que se añade al árbol por el propio token.
+    __slots__ = ('tipos', 'diagnostico', 'argumento', 'hoja')
+
+    def __init__(self, tipos, diagnostico=None, argumento=None, hoja=None):
+        self.tipos = frozenset(tipos) if isinstance(tipos, (set, frozenset, tuple, list)) else frozenset((tipos,))
+        self.diagnostico, self.argumento, self.hoja = diagnostico, argumento, hoja
+
+
+class NoTerminal:
+    # Otra regla. contexto: código que envuelve su diagnóstico si falla. en_linea: la regla se
+    # expande dentro de la producción actual, compartiendo su inicio y su nodo (p. ej. el resto de
+    # una declaración, que decide la clase del nodo de la declaración).
+    __slots__ = ('nombre', 'contexto', 'en_linea')
+
+    def __init__(self, nombre, contexto=None, en_linea=False):
+        self.nombre, self.contexto, self.en_linea = nombre, contexto, en_linea
+
+
+class Externo:
+    # Símbolo que analiza otro analizador (las expresiones, por precedencia), con sus PRIMERO
+    __slots__ = ('nombre', 'primeros', 'contexto')
+
+    def __init__(self, nombre, primeros, contexto=None):
+        self.nombre, self.primeros, self.contexto = nombre, frozenset(primeros), contexto
+
+
+class Error:
+    # Alternativa que sólo informa un diagnóstico (por defecto o al final de la entrada)
+    __slots__ = ('diagnostico',)
+
+    def __init__(self, diagnostico):
+        self.diagnostico = diagnostico
+
+
+class Alternativa:
+    # simbolos: la secuencia (vacía para ε). nodo: (clase, token) del nodo que se añade al
+    # completarla, con token relativo al inicio o None. exito: código de la construcción reconocida
+    # (el que devuelve el motor si es la última producción en completarse).
+    # tambien: tokens que eligen esta alternativa ε aunque no estén en SIGUIENTE.
+    __slots__ = ('simbolos', 'nodo', 'exito', 'tambien')
+
+    def __init__(self, simbolos=(), nodo=None, exito=None, tambien=()):
+        self.simbolos, self.nodo, self.exito, self.tambien = tuple(simbolos), nodo, exito, frozenset(tambien)
+
+
+class Regla:
+    # defecto: índice de la alternativa (o un Error) para los tokens sin entrada en la tabla; si no
+    # se da, la única alternativa o la alternativa ε. al_final: lo mismo para FIN; si no se da, la
+    # alternativa ε o la de defecto. preferida: índice de la alternativa que gana los tokens que están
+    # en PRIMERO de otra también. profundidad: cuenta para el presupuesto de anidamiento.
+    __slots__ = ('alternativas', 'defecto', 'al_final', 'preferida', 'profundidad')
+
+    def __init__(self, alternativas, defecto=None, al_final=None, preferida=None, profundidad=False):
+        self.alternativas, self.defecto, self.al_final = list(alternativas), defecto, al_final
+        self.preferida, self.profundidad = preferida, profundidad
+
+
+class GramaticaLL1:
+    """Resultado del generador: conjuntos PRIMERO y SIGUIENTE y tablas compiladas por regla.
+
+    tablas[regla][token] es la producción compilada (una tupla de instrucciones que
+    termina en COMPLETAR) o None si es una ε sin efectos, que se salta.
+    """
+
+    def __init__(self, gramatica, primeros, anulables, siguientes, tablas, resueltos):
+        self.gramatica, self.primeros, self.anulables, self.siguientes = gramatica, primeros, anulables, siguientes
+        self.tablas, self.resueltos = tablas, resueltos
+
+    def raiz(self, nombre):
+        # Arranque del motor en la regla `nombre`: su tabla y si cuenta para la profundidad
+        return self.tablas[nombre], self.gramatica[nombre].profundidad
+
+
+def _primeros_secuencia(simbolos, primeros, anulables):
+    resultado = set()
+    for simbolo in simbolos:
+        if isinstance(simbolo, Terminal):
+            resultado |= simbolo.tipos
+            return resultado, False
+        if isinstance(simbolo, Externo):
+            resultado |= simbolo.primeros
+            return resultado, False
+        resultado |= primeros[simbolo.nombre]
+        if simbolo.nombre not in anulables: return resultado, False
+    return resultado, True
+
+
+def calcular_conjuntos(gramatica):
+    # PRIMERO y anulables por punto fijo; después SIGUIENTE (sin FIN, que se trata aparte)
+    primeros = {nombre: set() for nombre in gramatica}
+    anulables = set()
+    cambio = True
+    while cambio:
+        cambio = False
+        for nombre, regla in gramatica.items():
+            for alternativa in regla.alternativas:
+                conjunto, anulable = _primeros_secuencia(alternativa.simbolos, primeros, anulables)
+                if not conjunto <= primeros[nombre]:
+                    primeros[nombre] |= conjunto
+                    cambio = True
+                if anulable and nombre not in anulables:
+                    anulables.add(nombre)
+                    cambio = True
+
+    siguientes = {nombre: set() for nombre in gramatica}
+    cambio = True
+    while cambio:
+        cambio = False
+        for nombre, regla in gramatica.items():
+            for alternativa in regla.alternativas:
+                simbolos = alternativa.simbolos
+                for i, simbolo in enumerate(simbolos):
+                    if not isinstance(simbolo, NoTerminal): continue
+                    conjunto, anulable = _primeros_secuencia(simbolos[i + 1:], primeros, anulables)
+                    if anulable: conjunto |= siguientes[nombre]
+                    if not conjunto <= siguientes[simbolo.nombre]:
+                        siguientes[simbolo.nombre] |= conjunto
+                        cambio = True
+    return primeros, anulables, siguientes
+
+
+def _compilar(alternativa, regla, tablas, gramatica):
+    if isinstance(alternativa, Error):
+        return ((ERROR, alternativa.diagnostico),)
+    clase, token = alternativa.nodo if alternativa.nodo is not None else (None, None)
+    completar = (COMPLETAR, clase, token, alternativa.exito, regla.profundidad)
+    if not alternativa.simbolos and clase is None and alternativa.exito is None and not regla.profundidad:
+        return None
+    instrucciones = []
+    simbolos = alternativa.simbolos
+    for i, simbolo in enumerate(simbolos):
+        if isinstance(simbolo, Terminal):
+            instrucciones.append((TERMINAL, simbolo.tipos, simbolo.diagnostico, simbolo.argumento, simbolo.hoja))
+        elif isinstance(simbolo, Externo):
+            instrucciones.append((EXTERNO, simbolo.nombre, simbolo.contexto))
+        else:
+            # En cola: si tras él sólo queda un COMPLETAR sin efectos, el motor no apila la producción
+            # (así la regla en línea del final de una declaración no cuesta un nivel de pila)
+            cola = i == len(simbolos) - 1 and clase is None and alternativa.exito is None and not regla.profundidad
+            instrucciones.append((NO_TERMINAL, tablas[simbolo.nombre], simbolo.contexto, simbolo.en_linea, cola,
+                                  gramatica[simbolo.nombre].profundidad))
+    instrucciones.append(completar)
+    return tuple(instrucciones)
+
+
+def generar(gramatica):
+    # Tablas LL(1) de la gramática. Un token que está en PRIMERO de dos alternativas es un
+    # conflicto y se rechaza, salvo que una sea la preferida de la regla; si está en PRIMERO de una
+    # y en SIGUIENTE de una ε (el 'else' colgante), gana la que lo consume, como en la mayoría de
+    # los generadores.
+    for nombre, regla in gramatica.items():
+        for alternativa in regla.alternativas:
+            for simbolo in alternativa.simbolos:
+                if isinstance(simbolo, NoTerminal) and simbolo.nombre not in gramatica:
+                    raise GramaticaNoLL1(f"{nombre}: la regla '{simbolo.nombre}' no existe")
+    primeros, anulables, siguientes = calcular_conjuntos(gramatica)
+    tablas = {nombre: [None] * TOKENS_TABLA for nombre in gramatica}
+    resueltos = set()
+
+    for nombre, regla in gramatica.items():
+        eleccion, origen = {}, {}
+
+        def poner(token, indice, via):
+            if token not in eleccion or eleccion[token] == indice:
+                eleccion[token], origen[token] = indice, via
+            elif {via, origen[token]} == {'primero', 'siguiente'}:
+                if via == 'primero': eleccion[token], origen[token] = indice, via
+                resueltos.add((nombre, token))
+            elif via == origen[token] == 'primero' and regla.preferida in (indice, eleccion[token]):
+                eleccion[token] = regla.preferida
+                resueltos.add((nombre, token))
+            else:
+                raise GramaticaNoLL1(f"{nombre}: el token {token} elige las alternativas {eleccion[token]} y {indice}")
+
+        vacia = None
+        for indice, alternativa in enumerate(regla.alternativas):
+            conjunto, anulable = _primeros_secuencia(alternativa.simbolos, primeros, anulables)
+            for token in conjunto: poner(token, indice, 'primero')
+            if anulable:
+                vacia = indice
+                for token in siguientes[nombre]: poner(token, indice, 'siguiente')
+                for token in alternativa.tambien: poner(token, indice, 'explicito')
+
+        defecto = regla.defecto
+        if defecto is None:
+            if len(regla.alternativas) == 1: defecto = 0
+            elif vacia is not None: defecto = vacia
+            else: raise GramaticaNoLL1(f"{nombre}: falta la alternativa por defecto")
+        al_final = regla.al_final if regla.al_final is not None else (vacia if vacia is not None else defecto)
+
+        def compilada(alternativa):
+            if isinstance(alternativa, int): alternativa = regla.alternativas[alternativa]
+            return _compilar(alternativa, regla, tablas, gramatica)
+
+        por_defecto = compilada(defecto)
+        compiladas = [compilada(alternativa) for alternativa in regla.alternativas]
+        tabla = tablas[nombre]
+        for token in range(FIN): tabla[token] = compiladas[eleccion[token]] if token in eleccion else por_defecto
+        tabla[FIN] = compilada(al_final)
+
+    return GramaticaLL1(gramatica, primeros, anulables, siguientes, tablas, sorted(resueltos))
+
+
+def main():
+    from analizadorsintactico import GRAMATICA, gramatica_ll1
+    from motorlexico import NOMBRES_TIPOS
+
+    def nombres(tokens):
+        return ' '.join(sorted(NOMBRES_TIPOS[token] for token in tokens))
+    for nombre in GRAMATICA:
+        print(f"{nombre}{' (ε)' if nombre in gramatica_ll1.anulables else ''}")
+        print(f"  PRIMERO:   {nombres(gramatica_ll1.primeros[nombre])}")
+        print(f"  SIGUIENTE: {nombres(gramatica_ll1.siguientes[nombre])}")
+    for nombre, token in gramatica_ll1.resueltos:
+        print(f"Conflicto resuelto: {nombre} con {NOMBRES_TIPOS[token]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
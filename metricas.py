@@ -0,0 +1,186 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Límites de los histogramas de duración (segundos) y de tamaño de entrada (bytes)
+LIMITES_SEGUNDOS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                    2.5, 5.0, 10.0)
+LIMITES_BYTES = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+# Escapes de los valores de etiqueta que exige el formato de texto: barra invertida, comillas y salto de línea
+_ESCAPES_ETIQUETA = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{n}="{str(v).translate(_ESCAPES_ETIQUETA)}"' for n, v in zip(nombres, valores)]
+    if extra: pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    def __init__(self, registro, nombre, ayuda, etiquetas):
+        self.registro = registro
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def incrementar(self, cantidad=1, *etiquetas):
+        if not self.registro.activo: return
+        valores = self.registro._fragmento().setdefault(self, {})
+        valores[etiquetas] = valores.get(etiquetas, 0) + cantidad
+
+    @staticmethod
+    def _sumar(total, valor):
+        return valor if total is None else total + valor
+
+    def _lineas(self, valores):
+        for etiquetas, valor in sorted(valores.items()):
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}'
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, registro, nombre, ayuda, etiquetas, limites):
+        super().__init__(registro, nombre, ayuda, etiquetas)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, *etiquetas):
+        # [cubeta_0, ..., cubeta_n, +Inf, suma]; la cuenta total es la cubeta +Inf acumulada
+        if not self.registro.activo: return
+        valores = self.registro._fragmento().setdefault(self, {})
+        cubetas = valores.get(etiquetas)
+        if cubetas is None: cubetas = valores[etiquetas] = [0] * (len(self.limites) + 1) + [0.0]
+        cubetas[bisect_left(self.limites, valor)] += 1
+        cubetas[-1] += valor
+
+    @staticmethod
+    def _sumar(total, cubetas):
+        if total is None: return list(cubetas)
+        return [a + b for a, b in zip(total, cubetas)]
+
+    def _lineas(self, valores):
+        for etiquetas, cubetas in sorted(valores.items()):
+            acumulado = 0
+            for limite, cantidad in zip((*self.limites, '+Inf'), cubetas):
+                acumulado += cantidad
+                le = 'le="' + (limite if limite == '+Inf' else _numero(float(limite))) + '"'
+                yield f'{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, le)} {acumulado}'
+            yield f'{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(cubetas[-1])}'
+            yield f'{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {acumulado}'
+
+
+class Medidor(_Metrica):
+    # Valor que se consulta al exponer (p. ej. las estadísticas del cache): no cuesta nada en el camino
+    # caliente. funcion() devuelve un número o {(valores de etiquetas): número}. Con tipo='counter'
+    # se expone un total que ya lleva otro objeto.
+    def __init__(self, registro, nombre, ayuda, etiquetas, funcion, tipo='gauge'):
+        super().__init__(registro, nombre, ayuda, etiquetas)
+        self.funcion = funcion
+        self.tipo = tipo
+
+    def _lineas(self, _):
+        valores = self.funcion()
+        if not isinstance(valores, dict): valores = {(): valores}
+        for etiquetas, valor in sorted(valores.items()):
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}'
+
+
+class RegistroMetricas:
+    """Métricas en formato de texto de Prometheus.
+
+    Cada hilo actualiza su propio fragmento sin locks; al exponer se suman los
+    fragmentos y los de hilos ya terminados se acumulan en uno base y se descartan.
+    """
+
+    def __init__(self, activo=True):
+        self.activo = activo
+        self._metricas = []
+        self._local = threading.local()
+        self._fragmentos = []
+        self._base = {}
+        self._lock = threading.Lock()
+
+    def _fragmento(self):
+        fragmento = getattr(self._local, 'fragmento', None)
+        if fragmento is None:
+            fragmento = self._local.fragmento = {}
+            with self._lock:
+                self._fragmentos.append((threading.current_thread(), fragmento))
+        return fragmento
+
+    def _registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Contador(self, nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_SEGUNDOS):
+        return self._registrar(Histograma(self, nombre, ayuda, etiquetas, limites))
+
+    def medidor(self, nombre, ayuda, funcion, etiquetas=(), tipo='gauge'):
+        return self._registrar(Medidor(self, nombre, ayuda, etiquetas, funcion, tipo))
+
+    def cronometro(self, histograma, *etiquetas):
+        return Cronometro(histograma, etiquetas) if self.activo else _CRONOMETRO_INACTIVO
+
+    def _combinar(self, destino, fragmento):
+        # list(): el hilo dueño puede estar añadiendo entradas mientras se leen
+        for metrica, valores in list(fragmento.items()):
+            total = destino.setdefault(metrica, {})
+            for etiquetas, valor in list(valores.items()):
+                total[etiquetas] = metrica._sumar(total.get(etiquetas), valor)
+
+    def exponer(self):
+        with self._lock:
+            vivos = []
+            for hilo, fragmento in self._fragmentos:
+                if hilo.is_alive(): vivos.append((hilo, fragmento))
+                else: self._combinar(self._base, fragmento)
+            self._fragmentos = vivos
+            totales = {}
+            self._combinar(totales, self._base)
+            for _, fragmento in vivos:
+                self._combinar(totales, fragmento)
+
+        lineas = []
+        for metrica in self._metricas:
+            lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            lineas.extend(metrica._lineas(totales.get(metrica, {})))
+        return '\n'.join(lineas) + '\n'
+
+
+class Cronometro:
+    # Mide fases consecutivas: fase(nombre) registra el tiempo desde la marca anterior
+    __slots__ = ('histograma', 'etiquetas', 'marca')
+
+    def __init__(self, histograma, etiquetas):
+        self.histograma = histograma
+        self.etiquetas = etiquetas
+        self.marca = time.perf_counter()
+
+    def fase(self, nombre):
+        ahora = time.perf_counter()
+        self.histograma.observar(ahora - self.marca, *self.etiquetas, nombre)
+        self.marca = ahora
+
+
+class _CronometroInactivo:
+    __slots__ = ()
+
+    def fase(self, nombre):
+        pass
+
+
+_CRONOMETRO_INACTIVO = _CronometroInactivo()
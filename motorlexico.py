@@ -0,0 +1,349 @@
+import re
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from enum import IntEnum
+from types import SimpleNamespace
+
+# Tabla de tokens: el orden define la prioridad, igual que en una alternancia de regex
+TOKENS_REGEX = {
+    'COMMENT_MULTI': r'/\*.*?\*/', 'COMMENT_SINGLE': r'//.*', 'STRING': r'"([^"\\]|\\.)*"',
+    'CHAR': r"'([^'\\]|\\.)'", 'LEFT_SHIFT_ASSIGN': r'<<=', 'RIGHT_SHIFT_ASSIGN': r'>>=',
+    'LEFT_SHIFT': r'<<', 'RIGHT_SHIFT': r'>>', 'INCREMENT': r'\+\+', 'DECREMENT': r'--',
+    'ARROW': r'->', 'LESSTHANOREQUAL': r'<=', 'GREATERTHANOREQUAL': r'>=', 'EQUALITY': r'==',
+    'NOTEQUAL': r'!=', 'LOGICALAND': r'&&', 'LOGICALOR': r'\|\|', 'PLUS_ASSIGN': r'\+=',
+    'MINUS_ASSIGN': r'-=', 'MULTIPLY_ASSIGN': r'\*=', 'DIVIDE_ASSIGN': r'/=', 'MODULO_ASSIGN': r'%=',
+    'BITWISE_AND_ASSIGN': r'&=', 'BITWISE_OR_ASSIGN': r'\|=', 'BITWISE_XOR_ASSIGN': r'\^=',
+    'ASSIGN': r'=', 'PLUS': r'\+', 'MINUS': r'-', 'MULTIPLY': r'\*', 'DIVIDE': r'/',
+    'MODULO': r'%', 'LESSTHAN': r'<', 'GREATERTHAN': r'>', 'NOT': r'!', 'BITWISE_AND': r'&',
+    'BITWISE_OR': r'\|', 'BITWISE_XOR': r'\^', 'BITWISE_NOT': r'~', 'LPAREN': r'\(',
+    'RPAREN': r'\)', 'LBRACE': r'\{', 'RBRACE': r'\}', 'LBRACKET': r'\[', 'RBRACKET': r'\]',
+    'SEMICOLON': r';', 'COMMA': r',', 'DOT': r'\.', 'QUESTION': r'\?', 'COLON': r':',
+    'FLOAT': r'\d+\.\d*([eE][+-]?\d+)?[fF]?|\d+[eE][+-]?\d+[fF]?|\d+[fF]', 'NUMBER': r'\d+',
+    'IDENTIFIER': r'[a-zA-Z_][a-zA-Z0-9_]*', 'WHITESPACE': r'\s+',
+}
+
+PALABRAS_RESERVADAS = frozenset({'if','else','switch','case','default','while','for','do','break',
+    'continue','return','int','float','double','char','bool','void','true','false'})
+
+TOKENS_OMITIDOS = frozenset({'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI'})
+
+SALTO_LINEA = re.compile('\n')
+
+# Tipos de token como enteros: los de la tabla y luego las palabras reservadas ('float'
+# comparte tipo con el literal FLOAT y 'char' con CHAR, igual que en la tabla original)
+NOMBRES_TIPOS = tuple(dict.fromkeys([*TOKENS_REGEX, *sorted(p.upper() for p in PALABRAS_RESERVADAS)]))
+TipoToken = IntEnum('TipoToken', NOMBRES_TIPOS, start=0)
+# Los mismos códigos como atributos int simples, más rápidos de consultar que los miembros del enum
+T = SimpleNamespace(**{tipo.name: int(tipo) for tipo in TipoToken})
+
+
+class IndiceLineas:
+    """Posición (en caracteres) en la que empieza cada línea de un texto.
+
+    Se calcula de una pasada sin bucles en Python ni copias de las líneas (las
+    posiciones de los saltos de línea van directas al array) y cada posición se
+    pasa a (línea, columna), contadas desde 1, con una búsqueda binaria.
+    """
+    __slots__ = ('inicios',)
+
+    def __init__(self, texto):
+        # Cada línea empieza justo después del '\n' de la anterior
+        self.inicios = array('I', [0])
+        self.inicios.extend(map(re.Match.end, SALTO_LINEA.finditer(texto)))
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def ubicar(self, posicion):
+        linea = bisect_right(self.inicios, posicion)
+        return linea, posicion - self.inicios[linea - 1] + 1
+
+
+class BufferTokens:
+    """Tokens en columnas compactas: código de tipo, inicio y fin dentro del texto fuente.
+
+    Los valores no se copian: se recortan del texto sólo cuando se piden.
+    """
+    __slots__ = ('texto', 'tipos', 'inicios', 'fines', '_lineas')
+
+    def __init__(self, texto, tipos=None, inicios=None, fines=None):
+        self.texto = texto
+        self.tipos = array('B') if tipos is None else tipos
+        self.inicios = array('I') if inicios is None else inicios
+        self.fines = array('I') if fines is None else fines
+        self._lineas = None
+
+    def lineas(self):
+        # Índice de líneas del texto, calculado la primera vez: los análisis que comparten el buffer
+        # (la tabla léxica y los diagnósticos sintácticos) comparten también el índice
+        if self._lineas is None: self._lineas = IndiceLineas(self.texto)
+        return self._lineas
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def valor(self, i):
+        return self.texto[self.inicios[i]:self.fines[i]]
+
+    def nombre_tipo(self, i):
+        return NOMBRES_TIPOS[self.tipos[i]]
+
+    def valores(self, inicio=0, fin=None):
+        texto, inicios, fines = self.texto, self.inicios, self.fines
+        return [texto[inicios[i]:fines[i]] for i in range(inicio, len(self.tipos) if fin is None else fin)]
+
+    def token(self, i):
+        return {'tipo': NOMBRES_TIPOS[self.tipos[i]], 'valor': self.valor(i), 'posicion': self.inicios[i]}
+
+
+class ValoresTokens(Sequence):
+    """Valores de los tokens de un buffer como secuencia de sólo lectura.
+
+    Sólo guarda el buffer, que ya tiene el texto y las posiciones: cada valor se
+    recorta del texto al pedirlo, así que los resultados no duplican la entrada
+    en miles de cadenas pequeñas. Se convierte en lista al serializarlo (ver
+    app.ProveedorJSON; con json.dumps, default=list).
+    """
+    __slots__ = ('buffer',)
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [self.buffer.valor(j) for j in range(*i.indices(len(self.buffer)))]
+        if i < 0: i += len(self.buffer)
+        if not 0 <= i < len(self.buffer): raise IndexError('índice de token fuera de rango')
+        return self.buffer.valor(i)
+
+    def __iter__(self):
+        texto = self.buffer.texto
+        return (texto[inicio:fin] for inicio, fin in zip(self.buffer.inicios, self.buffer.fines))
+
+    def __eq__(self, otro):
+        if isinstance(otro, ValoresTokens): otro = list(otro)
+        return isinstance(otro, list) and list(self) == otro
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'ValoresTokens({list(self)!r})'
+
+
+_METACARACTERES = frozenset('.^$*+?{}[]|()')
+_PRIMER_ATOMO = re.compile(r'\\.|\[(?:\\.|[^\]\\])*\]|[^\\\[(|)]')
+
+
+def _literal(patron):
+    # Texto literal de un patrón sin metacaracteres (r'\+=' -> '+='), o None si no lo es
+    caracteres, i = [], 0
+    while i < len(patron):
+        c = patron[i]
+        if c == '\\':
+            if i + 1 == len(patron) or patron[i + 1].isalnum(): return None
+            i += 1
+            c = patron[i]
+        elif c in _METACARACTERES:
+            return None
+        caracteres.append(c)
+        i += 1
+    return ''.join(caracteres)
+
+
+def _apertura(patron):
+    # Prefijo literal de un token delimitado ('"' en r'"([^"\\]|\\.)*"', '/*' en r'/\*.*?\*/'): patrones
+    # que abren con un literal, repiten sin límite y deben cerrar con otro literal. Un intento fallido
+    # de reconocerlos depende de todo el texto que sigue. Devuelve None para los demás.
+    prefijo, i = [], 0
+    while i < len(patron):
+        c = patron[i]
+        if c == '\\' and i + 1 < len(patron) and not patron[i + 1].isalnum():
+            prefijo.append(patron[i + 1])
+            i += 2
+        elif c == '\\' or c in _METACARACTERES:
+            break
+        else:
+            prefijo.append(c)
+            i += 1
+    resto = patron[i:]
+    ilimitado = any(c in '*+' and (j == 0 or resto[j - 1] != '\\') for j, c in enumerate(resto))
+    if not prefijo or not ilimitado or _literal(resto[-1]) is None or resto.endswith(('*', '+', '?', ')')):
+        return None
+    return ''.join(prefijo)
+
+
+def _alternativas(patron):
+    # Alternativas de nivel superior de un patrón ('a|b(c|d)' -> ['a', 'b(c|d)'])
+    partes, inicio, profundidad, en_clase, i = [], 0, 0, False, 0
+    while i < len(patron):
+        c = patron[i]
+        if c == '\\': i += 1
+        elif en_clase: en_clase = c != ']'
+        elif c == '[': en_clase = True
+        elif c == '(': profundidad += 1
+        elif c == ')': profundidad -= 1
+        elif c == '|' and profundidad == 0:
+            partes.append(patron[inicio:i])
+            inicio = i + 1
+        i += 1
+    partes.append(patron[inicio:])
+    return partes
+
+
+def _iniciales(nombre, patron):
+    # Regex de un carácter con los posibles primeros caracteres del patrón
+    atomos = []
+    for alternativa in _alternativas(patron):
+        m = _PRIMER_ATOMO.match(alternativa)
+        if not m or alternativa[m.end():m.end() + 1] in ('?', '*', '{'):
+            raise ValueError(f"No se puede determinar el primer carácter del token {nombre}: {patron!r}")
+        atomos.append(m.group())
+    return re.compile('|'.join(atomos))
+
+
+class MotorLexico:
+    """Escáner determinista compilado una sola vez a partir de una tabla de tokens.
+
+    Cada carácter inicial se despacha a la lista ordenada de tokens que pueden
+    empezar con él; los operadores literales se resuelven con un trie de
+    coincidencia máxima. El resultado es idéntico al de probar la alternancia
+    completa de la tabla en cada posición.
+    """
+
+    def __init__(self, tokens_regex=TOKENS_REGEX, palabras_reservadas=PALABRAS_RESERVADAS,
+                 omitidos=TOKENS_OMITIDOS):
+        self.tokens_regex = dict(tokens_regex)
+        self.palabras_reservadas = frozenset(palabras_reservadas)
+        self.omitidos = frozenset(TipoToken[nombre] for nombre in omitidos)
+        self._entradas = []
+        self.aperturas = {}
+        literales = {}
+        for nombre, patron in self.tokens_regex.items():
+            literal = _literal(patron)
+            if literal:
+                for previo, nombre_previo in literales.items():
+                    if literal.startswith(previo):
+                        raise ValueError(f"El token {nombre} ({literal!r}) debe ir antes que {nombre_previo} ({previo!r})")
+                literales[literal] = nombre
+                self._entradas.append((int(TipoToken[nombre]), literal, None))
+            else:
+                self._entradas.append((int(TipoToken[nombre]), re.compile(patron, re.DOTALL).match,
+                                       _iniciales(nombre, patron)))
+                apertura = _apertura(patron)
+                if apertura: self.aperturas[apertura] = int(TipoToken[nombre])
+        # Todas las variantes de mayúsculas de cada palabra reservada ('If' -> 'IF')
+        self._reservadas = {}
+        for palabra in self.palabras_reservadas:
+            for i in range(2 ** len(palabra)):
+                variante = ''.join(c.upper() if i >> j & 1 else c for j, c in enumerate(palabra))
+                self._reservadas[variante] = int(TipoToken[palabra.upper()])
+        self._despacho = {}
+        for codigo in range(128):
+            self._despachar(chr(codigo))
+
+    def _despachar(self, caracter):
+        candidatos, trie = [], None
+        for codigo, buscar, iniciales in self._entradas:
+            if iniciales is None:
+                if buscar[0] != caracter: continue
+                # Los literales consecutivos comparten un trie: [nombre, hijos] por nodo
+                if trie is None:
+                    trie = [None, {}]
+                    candidatos.append((None, self._operador(trie)))
+                nodo = trie
+                for c in buscar[1:]:
+                    nodo = nodo[1].setdefault(c, [None, {}])
+                if nodo[0] is None: nodo[0] = codigo
+            elif iniciales.match(caracter):
+                candidatos.append((codigo, buscar))
+                trie = None
+        self._despacho[caracter] = candidatos = tuple(candidatos)
+        return candidatos
+
+    @staticmethod
+    def _operador(trie):
+        # Coincidencia máxima sobre el trie de operadores que empiezan con un mismo carácter
+        def buscar(texto, pos):
+            codigo, fin = trie[0], pos + 1
+            hijos, i, n = trie[1], pos + 1, len(texto)
+            while i < n:
+                nodo = hijos.get(texto[i])
+                if nodo is None: break
+                i += 1
+                if nodo[0] is not None: codigo, fin = nodo[0], i
+                hijos = nodo[1]
+            return (codigo, fin) if codigo is not None else None
+        return buscar
+
+    def tokenizar(self, texto):
+        buffer = BufferTokens(texto)
+        self.escanear(texto, 0, len(texto), buffer)
+        return buffer
+
+    def bloques(self, texto, caracteres=1 << 16):
+        # Generador de (BufferTokens, caracteres no reconocidos) por tramos de texto: la memoria usada
+        # no depende del tamaño de la entrada. Los tokens son los mismos que con tokenizar().
+        pos, n = 0, len(texto)
+        while pos < n:
+            buffer, desconocidos = BufferTokens(texto), []
+            pos = self.escanear(texto, pos, min(pos + caracteres, n), buffer, desconocidos)
+            yield buffer, desconocidos
+
+    def iterar(self, texto):
+        # Generador de tokens como (tipo, valor, posición)
+        for buffer, _ in self.bloques(texto):
+            for codigo, inicio, fin in zip(buffer.tipos, buffer.inicios, buffer.fines):
+                yield NOMBRES_TIPOS[codigo], texto[inicio:fin], inicio
+
+    def escanear(self, texto, pos, limite, buffer, desconocidos=None):
+        # Añade al buffer los tokens que empiezan en [pos, limite) y devuelve la posición en la que
+        # se detuvo el escaneo (puede pasar de limite si el último token lo cruza). Si se pasa una
+        # lista de desconocidos, anota en ella los caracteres no reconocidos.
+        agregar_tipo, agregar_inicio, agregar_fin = buffer.tipos.append, buffer.inicios.append, buffer.fines.append
+        despacho, omitidos, reservadas = self._despacho, self.omitidos, self._reservadas
+        identificador = T.IDENTIFIER
+        while pos < limite:
+            c = texto[pos]
+            candidatos = despacho.get(c)
+            if candidatos is None: candidatos = self._despachar(c)
+            for codigo, buscar in candidatos:
+                if codigo is None:
+                    encontrado = buscar(texto, pos)
+                    if encontrado:
+                        codigo, fin = encontrado
+                        break
+                else:
+                    m = buscar(texto, pos)
+                    if m:
+                        fin = m.end()
+                        break
+            else:
+                # Carácter no reconocido: se omite, igual que re.finditer
+                if desconocidos is not None: desconocidos.append(pos)
+                pos += 1
+                continue
+            if codigo not in omitidos:
+                if codigo == identificador: codigo = reservadas.get(texto[pos:fin], codigo)
+                agregar_tipo(codigo)
+                agregar_inicio(pos)
+                agregar_fin(fin)
+            pos = fin
+        return pos
+
+    def aperturas_sin_cerrar(self, buffer, inicio, fin, desconocidos):
+        # Posiciones de los tokens [inicio, fin) y caracteres desconocidos en las que empieza la
+        # apertura de un token delimitado que no llegó a cerrarse ('/*' leído como '/', '"' omitido).
+        # Si más adelante aparece el cierre, el escaneo de esa posición cambia.
+        texto, tipos, inicios, posiciones = buffer.texto, buffer.tipos, buffer.inicios, []
+        for apertura, codigo in self.aperturas.items():
+            for i in range(inicio, fin):
+                if tipos[i] != codigo and texto.startswith(apertura, inicios[i]): posiciones.append(inicios[i])
+            posiciones.extend(p for p in desconocidos if texto.startswith(apertura, p))
+        return sorted(posiciones)
+
+
+# Motor compartido, compilado al importar el módulo
+motor_lexico = MotorLexico()
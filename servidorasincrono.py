@@ -0,0 +1,212 @@
+# Modo de servicio asíncrono: un bucle asyncio acepta conexiones y lee las peticiones sin bloquear,
+# y la aplicación Flask (el análisis, que es CPU puro) corre en pools de hilos aparte.
+#
+#   python -m servidorasincrono [--anfitrion 0.0.0.0] [--puerto 8000]
+#
+# Las peticiones se reparten en carriles según el tamaño del cuerpo, cada uno con sus hilos y una
+# cola acotada: las fuentes enormes no hacen esperar a las pequeñas, y si un carril está lleno se
+# responde 429 enseguida en lugar de encolar sin límite. Los flujos de eventos (text/event-stream)
+# pasan a su propio carril en cuanto tienen cabeceras: pasan casi todo el tiempo esperando el
+# siguiente evento, y en un carril de análisis dejarían sin hilos a las peticiones normales.
+import argparse
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote
+
+MAXIMO_CABECERAS = 64 * 1024
+ESPERA_CABECERAS = 10.0
+ESPERA_CUERPO = 60.0
+
+
+class Carril:
+    # Peticiones con cuerpo de hasta `maximo_cuerpo` bytes (None: sin límite). Como mucho `hilos` en
+    # ejecución y `cola` esperando; el resto recibe 429.
+    def __init__(self, nombre, maximo_cuerpo, hilos, cola):
+        self.nombre = nombre
+        self.maximo_cuerpo = maximo_cuerpo
+        self.capacidad = hilos + cola
+        self.ocupados = 0
+        self.pool = ThreadPoolExecutor(hilos, thread_name_prefix=f'carril-{nombre}')
+
+
+def _iniciar_respuesta(aplicacion, environ):
+    # Corre en el pool del carril: llama a la aplicación WSGI y obtiene el primer trozo del cuerpo
+    estado = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and estado.get('enviado'):
+            raise exc_info[1].with_traceback(exc_info[2])
+        estado['status'], estado['headers'] = status, headers
+        return estado.setdefault('escritos', []).append
+
+    cuerpo = aplicacion(environ, start_response)
+    iterador = iter(cuerpo)
+    primero = next(iterador, None)
+    estado['enviado'] = True
+    anteriores = b''.join(estado.get('escritos', ()))
+    if anteriores: primero = anteriores + (primero or b'')
+    return estado['status'], estado['headers'], primero, iterador, cuerpo
+
+
+def _es_flujo_eventos(cabeceras_respuesta):
+    return any(nombre.lower() == 'content-type' and valor.startswith('text/event-stream')
+               for nombre, valor in cabeceras_respuesta)
+
+
+class ServidorAsincrono:
+    """Servidor HTTP/1.1 sobre asyncio para una aplicación WSGI, con límites y contrapresión."""
+
+    def __init__(self, aplicacion, maximo_cuerpo=32 * 1024 * 1024, carriles=None, flujos=None):
+        self.aplicacion = aplicacion
+        self.maximo_cuerpo = maximo_cuerpo
+        # Por defecto: peticiones de hasta 64 KB con 4 hilos y el resto con 1, para que sólo un
+        # análisis grande compita a la vez con las pequeñas por el intérprete
+        self.carriles = carriles or [Carril('rapido', 64 * 1024, 4, 64), Carril('pesado', None, 1, 8)]
+        # Un hilo por flujo de eventos abierto, casi siempre bloqueado esperando; sin cola
+        self.flujos = flujos or Carril('flujos', None, 64, 0)
+        self.rechazadas = 0
+
+    def carril_para(self, tamano):
+        for carril in self.carriles:
+            if carril.maximo_cuerpo is None or tamano <= carril.maximo_cuerpo: return carril
+        return self.carriles[-1]
+
+    async def servir(self, anfitrion='0.0.0.0', puerto=8000):
+        servidor = await asyncio.start_server(self._atender, anfitrion, puerto, limit=MAXIMO_CABECERAS)
+        async with servidor:
+            await servidor.serve_forever()
+
+    async def _atender(self, reader, writer):
+        try:
+            while await self._atender_peticion(reader, writer):
+                pass
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder_error(self, writer, codigo, mensaje, cabeceras=()):
+        cuerpo = ('{"success": false, "error": "%s"}' % mensaje).encode('utf-8')
+        estado = HTTPStatus(codigo)
+        lineas = [f'HTTP/1.1 {codigo} {estado.phrase}', 'Content-Type: application/json',
+                  f'Content-Length: {len(cuerpo)}', 'Connection: close', *cabeceras]
+        writer.write(('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1') + cuerpo)
+        await writer.drain()
+        return False
+
+    async def _atender_peticion(self, reader, writer):
+        # Devuelve si la conexión sigue abierta para otra petición
+        try:
+            cabecera = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), ESPERA_CABECERAS)
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip(): raise
+            return False
+        lineas = cabecera.decode('latin-1').split('\r\n')
+        metodo, destino, protocolo = lineas[0].split(' ', 2)
+        cabeceras = {}
+        for linea in lineas[1:]:
+            if not linea: continue
+            nombre, _, valor = linea.partition(':')
+            nombre, valor = nombre.strip().lower(), valor.strip()
+            cabeceras[nombre] = f'{cabeceras[nombre]}, {valor}' if nombre in cabeceras else valor
+
+        if 'chunked' in cabeceras.get('transfer-encoding', '').lower():
+            return await self._responder_error(writer, 411, 'Se requiere Content-Length')
+        tamano = int(cabeceras.get('content-length') or 0)
+        if tamano < 0: raise ValueError('Content-Length negativo')
+        if self.maximo_cuerpo is not None and tamano > self.maximo_cuerpo:
+            return await self._responder_error(writer, 413, f'El cuerpo supera el máximo de {self.maximo_cuerpo} bytes')
+
+        # Admisión antes de leer el cuerpo: si el carril está lleno no se gasta nada en la petición
+        carril = self.carril_para(tamano)
+        if carril.ocupados >= carril.capacidad:
+            self.rechazadas += 1
+            return await self._responder_error(writer, 429, 'Servidor saturado, reintenta más tarde',
+                                               ['Retry-After: 1'])
+        carril.ocupados += 1
+        try:
+            cuerpo = await asyncio.wait_for(reader.readexactly(tamano), ESPERA_CUERPO) if tamano else b''
+            ruta, _, consulta = destino.partition('?')
+            servidor = writer.get_extra_info('sockname') or ('localhost', 0)
+            cliente = writer.get_extra_info('peername') or ('', 0)
+            environ = {
+                'REQUEST_METHOD': metodo, 'SCRIPT_NAME': '', 'PATH_INFO': unquote(ruta, 'latin-1'),
+                'QUERY_STRING': consulta, 'SERVER_NAME': str(servidor[0]), 'SERVER_PORT': str(servidor[1]),
+                'SERVER_PROTOCOL': protocolo, 'REMOTE_ADDR': str(cliente[0]),
+                'CONTENT_TYPE': cabeceras.pop('content-type', ''), 'CONTENT_LENGTH': str(tamano),
+                'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(cuerpo),
+                'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            for nombre, valor in cabeceras.items():
+                if nombre != 'content-length': environ['HTTP_' + nombre.upper().replace('-', '_')] = valor
+
+            loop = asyncio.get_running_loop()
+            status, cabeceras_respuesta, primero, iterador, respuesta = await loop.run_in_executor(
+                carril.pool, _iniciar_respuesta, self.aplicacion, environ)
+            try:
+                if _es_flujo_eventos(cabeceras_respuesta):
+                    if self.flujos.ocupados >= self.flujos.capacidad:
+                        self.rechazadas += 1
+                        return await self._responder_error(writer, 429, 'Demasiados flujos abiertos',
+                                                           ['Retry-After: 1'])
+                    carril.ocupados -= 1
+                    carril = self.flujos
+                    carril.ocupados += 1
+                return await self._escribir_respuesta(writer, carril, metodo, protocolo, cabeceras,
+                                                      status, cabeceras_respuesta, primero, iterador)
+            finally:
+                cerrar = getattr(respuesta, 'close', None)
+                if cerrar is not None: cerrar()
+        finally:
+            carril.ocupados -= 1
+
+    async def _escribir_respuesta(self, writer, carril, metodo, protocolo, cabeceras, status,
+                                  cabeceras_respuesta, primero, iterador):
+        mantener = protocolo == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+        nombres = {nombre.lower() for nombre, _ in cabeceras_respuesta}
+        # Sin Content-Length (p. ej. el NDJSON en streaming) se envía por trozos
+        por_trozos = 'content-length' not in nombres and protocolo == 'HTTP/1.1' and metodo != 'HEAD'
+        if 'content-length' not in nombres and not por_trozos: mantener = False
+        lineas = [f'HTTP/1.1 {status}', *(f'{nombre}: {valor}' for nombre, valor in cabeceras_respuesta)]
+        if por_trozos: lineas.append('Transfer-Encoding: chunked')
+        lineas.append('Connection: ' + ('keep-alive' if mantener else 'close'))
+        writer.write(('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1'))
+
+        loop = asyncio.get_running_loop()
+        trozo = primero
+        while trozo is not None:
+            if trozo and metodo != 'HEAD':
+                writer.write(b'%x\r\n%s\r\n' % (len(trozo), trozo) if por_trozos else trozo)
+                # Contrapresión: no se genera más mientras el cliente no consume lo enviado
+                await writer.drain()
+            trozo = await loop.run_in_executor(carril.pool, next, iterador, None)
+        if por_trozos: writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return mantener
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sirve el analizador con el servidor asíncrono')
+    parser.add_argument('--anfitrion', default='0.0.0.0')
+    parser.add_argument('--puerto', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    from app import app
+    servidor = ServidorAsincrono(app, maximo_cuerpo=app.config['MAX_CONTENT_LENGTH'])
+    print(f"🚀 Servidor asíncrono en http://{args.anfitrion}:{args.puerto}")
+    for carril in [*servidor.carriles, servidor.flujos]:
+        limite = 'sin límite' if carril.maximo_cuerpo is None else f'≤ {carril.maximo_cuerpo} bytes'
+        print(f"   • carril {carril.nombre}: cuerpos {limite}, capacidad {carril.capacidad}")
+    try:
+        asyncio.run(servidor.servir(args.anfitrion, args.puerto))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
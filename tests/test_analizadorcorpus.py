@@ -0,0 +1,62 @@
+import json
+
+from analizadorcorpus import leer_fuente, main
+from analizadorsintactico import analizarsintactico
+
+FUENTES = {
+    'b/uno.c': 'int x = 1;\nif (x) { x = 2; }\n'.encode('utf-8'),
+    'b/dos.c': 'x = ;\n'.encode('utf-8'),
+    'a.c': 'char *s = "ñandú";\n'.encode('utf-8'),
+    'vacio.c': b'',
+    'invalido.c': b'int y = 2; \xff\xfe int z;\n',
+    'cabecera.h': b'int h;',
+    'notas.txt': b'no es C',
+}
+
+
+def _arbol(tmp_path):
+    raiz = tmp_path / 'fuentes'
+    for nombre, contenido in FUENTES.items():
+        ruta = raiz / nombre
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_bytes(contenido)
+    return raiz
+
+
+def test_leer_fuente(tmp_path):
+    raiz = _arbol(tmp_path)
+    assert leer_fuente(str(raiz / 'vacio.c')) == ('', 0)
+    assert leer_fuente(str(raiz / 'a.c')) == ('char *s = "ñandú";\n', len(FUENTES['a.c']))
+    # Los bytes que no son UTF-8 se reemplazan, no interrumpen el análisis
+    assert leer_fuente(str(raiz / 'invalido.c'))[0] == 'int y = 2; �� int z;\n'
+
+
+def test_main_escribe_un_registro_por_archivo_en_orden(tmp_path):
+    raiz, salida = _arbol(tmp_path), tmp_path / 'resultados.jsonl'
+    codigo = main([str(raiz), '-o', str(salida), '-j', '2', '--lote', '1', '-e', '.c', '-e', '.h', '--tokens'])
+    assert codigo == 0
+    registros = [json.loads(linea) for linea in salida.read_text(encoding='utf-8').splitlines()]
+    nombres = ['a.c', 'cabecera.h', 'invalido.c', 'vacio.c', 'b/dos.c', 'b/uno.c']
+    assert [r['archivo'] for r in registros] == [str(raiz / nombre) for nombre in nombres]
+    for nombre, registro in zip(nombres, registros):
+        esperado = analizarsintactico(FUENTES[nombre].decode('utf-8', 'replace'))
+        assert registro['bytes'] == len(FUENTES[nombre])
+        assert registro['tokens_lexicos'] == esperado['tokens_lexicos']
+        assert registro['tokens'] == len(esperado['tokens_lexicos'])
+        for clave in ('success', 'errores', 'resultados_sintacticos', 'total_estructuras', 'total_errores'):
+            assert registro[clave] == esperado[clave]
+    assert registros[3]['errores'] == ['Texto vacío o solo espacios']
+
+
+def test_main_anota_los_archivos_que_no_puede_leer(tmp_path, capsys):
+    raiz = _arbol(tmp_path)
+    (raiz / 'roto.c').symlink_to(raiz / 'no-existe.c')
+    assert main([str(raiz), '-j', '1']) == 1
+    salida = capsys.readouterr()
+    registros = [json.loads(linea) for linea in salida.out.splitlines()]
+    assert [r['archivo'].rsplit('/', 1)[-1] for r in registros] == ['a.c', 'invalido.c', 'roto.c', 'vacio.c',
+                                                                    'dos.c', 'uno.c']
+    roto = registros[2]
+    assert roto['error'].startswith('FileNotFoundError') and roto['tokens'] == 0
+    assert 'tokens_lexicos' not in registros[0]
+    assert '1 no se pudieron analizar' in salida.err
@@ -0,0 +1,205 @@
+import random
+
+import pytest
+
+from analizadorincremental import CERRADO, CanalDocumento, DocumentoIncremental, combinar_cambios
+from analizadorsintactico import Presupuesto, PresupuestoExcedido, analizarsintactico
+
+TEXTO = '''int total = 0;
+int datos[3] = {1, 2, 3};
+/* comentario con { llaves } y "comillas" */
+for (i = 0; i < 3; i++) {
+    total += datos[i];
+    if (total > 2) { mensaje = "mayor"; } else mensaje = 'x';
+}
+switch (total) { case 1: break; default: total = -total; }
+// fin
+while (total) total--;
+'''
+
+# Trozos que se insertan: construcciones enteras y piezas que abren o cierran strings, comentarios y llaves
+PIEZAS = ['int a = 1;', 'x = y + 2;', '{', '}', '(', ')', ';', '"', '/*', '*/', '//', '\n', ' ', 'if (x) ',
+          'else ', 'return;', 'total', '[', ']', "'", '@']
+
+CLAVES = ('success', 'errores', 'resultados_sintacticos', 'tokens_lexicos', 'total_estructuras', 'total_errores')
+
+
+def _ediciones(semilla, cantidad):
+    # Ediciones (inicio, fin, texto) aleatorias pero reproducibles, junto con el texto tras cada una
+    aleatorio, texto = random.Random(semilla), TEXTO
+    for _ in range(cantidad):
+        inicio = aleatorio.randint(0, len(texto))
+        fin = min(len(texto), inicio + aleatorio.choice([0, 0, 1, 2, 5, 20]))
+        reemplazo = ''.join(aleatorio.choice(PIEZAS) for _ in range(aleatorio.choice([0, 1, 1, 2])))
+        texto = texto[:inicio] + reemplazo + texto[fin:]
+        yield inicio, fin, reemplazo, texto
+
+
+def _sin_mensaje(resultado):
+    return {clave: resultado[clave] for clave in CLAVES}
+
+
+@pytest.mark.parametrize('semilla', range(8))
+def test_ediciones_coinciden_con_el_analisis_completo(semilla):
+    documento = DocumentoIncremental(TEXTO)
+    for inicio, fin, reemplazo, texto in _ediciones(semilla, 60):
+        documento.editar(inicio, fin, reemplazo)
+        assert documento.texto == texto
+        completo = analizarsintactico(texto)
+        assert _sin_mensaje(documento.resultado()) == _sin_mensaje(completo)
+        assert documento.tokens == len(completo['tokens_lexicos'])
+        assert documento.prefijo + sum(fragmento.longitud for fragmento in documento.fragmentos) == len(texto)
+
+
+def test_reemplazar_y_vaciar():
+    documento = DocumentoIncremental(TEXTO)
+    documento.reemplazar('int x;')
+    assert documento.resultado()['resultados_sintacticos'] == ['✅ Declaración: int x']
+    documento.editar(0, len(documento.texto), '   ')
+    assert documento.resultado()['errores'] == ['Texto vacío o solo espacios']
+    documento.editar(0, 3, 'x = 1;')
+    assert documento.resultado()['success']
+
+
+def test_combinar_cambios():
+    # [2, 5) por 1 elemento y luego [0, 2) de la actual por 4: equivale a [0, 5) de la original por 5
+    assert combinar_cambios(None, 2, 5, 1) == (2, 5, 3)
+    assert combinar_cambios((2, 5, 3), 0, 2, 4) == (0, 5, 5)
+    assert combinar_cambios((2, 5, 3), 6, 7, 0) == (2, 9, 6)
+
+
+class Cliente:
+    # Reconstruye el documento a partir de los mensajes del canal, como el editor en el navegador
+    def __init__(self):
+        self.fragmentos, self.prefijo, self.version = [], 0, None
+
+    def recibir(self, mensaje):
+        nuevos = mensaje['fragmentos']
+        if mensaje['quitados'] is None: self.fragmentos = list(nuevos)
+        else: self.fragmentos[mensaje['desde']:mensaje['desde'] + mensaje['quitados']] = nuevos
+        self.prefijo, self.version = mensaje['prefijo'], mensaje['version']
+        self.ultimo = mensaje
+
+    def comprobar(self, texto):
+        completo = analizarsintactico(texto)
+        assert [token for fragmento in self.fragmentos for token in fragmento['tokens']] == completo['tokens_lexicos']
+        if self.fragmentos:
+            assert [f['mensaje'] for f in self.fragmentos if not f['exito']] == completo['errores']
+        else:
+            assert self.ultimo['errores'] == completo['errores']
+        assert [f['mensaje'] for f in self.fragmentos if f['exito']] == completo['resultados_sintacticos']
+        assert self.prefijo + sum(f['longitud'] for f in self.fragmentos) == len(texto)
+        assert (self.ultimo['success'], self.ultimo['total_errores']) == (completo['success'], completo['total_errores'])
+
+
+@pytest.mark.parametrize('semilla', range(4))
+def test_canal_reconstruye_el_documento(semilla):
+    canal, cliente = CanalDocumento(TEXTO), Cliente()
+    suscripcion = canal.suscribir()
+    cliente.recibir(canal.siguiente(suscripcion, 0))
+    cliente.comprobar(TEXTO)
+    for numero, (inicio, fin, reemplazo, texto) in enumerate(_ediciones(semilla, 40)):
+        assert canal.editar(canal.version, [(inicio, fin, reemplazo)]) == canal.version
+        # Unas veces se publica cada edición y otras se acumulan varias en un solo mensaje
+        if numero % 3: continue
+        cliente.recibir(canal.siguiente(suscripcion, 0))
+        assert cliente.version == canal.version
+        cliente.comprobar(texto)
+
+
+def test_canal_acumula_ediciones_y_publica_la_ultima_version():
+    canal = CanalDocumento('int a;\nint b;\nint c;\n')
+    suscripcion = canal.suscribir()
+    cliente = Cliente()
+    cliente.recibir(canal.siguiente(suscripcion, 0))
+    version = canal.editar(canal.version, [(4, 5, 'x'), (11, 12, 'y')])
+    version = canal.editar(version, [(11, 12, 'z')])
+    mensaje = canal.siguiente(suscripcion, 0)
+    assert mensaje['version'] == version == 3
+    assert (mensaje['desde'], mensaje['quitados'], len(mensaje['fragmentos'])) == (0, 2, 2)
+    cliente.recibir(mensaje)
+    cliente.comprobar('int x;\nint z;\nint c;\n')
+    # Sin ediciones nuevas no hay mensaje: vence la espera
+    assert canal.siguiente(suscripcion, 0.01) is None
+
+
+def test_canal_versiones_y_suscripciones():
+    canal = CanalDocumento('int a;')
+    assert canal.editar(canal.version + 1, [(0, 0, 'x')]) is None
+    with pytest.raises(ValueError):
+        canal.editar(canal.version, [(0, 100, '')])
+    primera = canal.suscribir()
+    segunda = canal.suscribir()
+    assert canal.siguiente(primera, 0) is CERRADO
+    assert canal.siguiente(segunda, 0)['quitados'] is None
+    canal.reemplazar('')
+    mensaje = canal.siguiente(segunda, 0)
+    assert (mensaje['quitados'], mensaje['fragmentos'], mensaje['errores']) == (1, [], ['Texto vacío o solo espacios'])
+
+
+def test_presupuesto_aborta_y_deja_el_documento_como_estaba():
+    presupuesto = Presupuesto(tokens=20, profundidad=5)
+    with pytest.raises(PresupuestoExcedido) as excedido:
+        DocumentoIncremental('x = ((((1))));', presupuesto)
+    assert excedido.value.motivo == 'profundidad'
+
+    documento = DocumentoIncremental('int a;\nx = (1);\nint b;\n', presupuesto)
+    version, resultado = documento.version, documento.resultado()
+    with pytest.raises(PresupuestoExcedido):
+        documento.editar(11, 14, '((((1))))', presupuesto)
+    with pytest.raises(PresupuestoExcedido) as excedido:
+        documento.editar(0, 0, 'int c = 1 + 2 + 3 + 4;', presupuesto)
+    assert (excedido.value.motivo, excedido.value.posicion) == ('tokens', 23)
+    assert (documento.version, documento.resultado(), documento.tomar_cambio()) == (version, resultado, (0, 0, 3))
+
+    documento.editar(11, 14, '((1))', presupuesto)
+    tokens = analizarsintactico(documento.texto)['tokens_lexicos']
+    assert documento.resultado()['success'] and documento.resultado()['tokens_lexicos'] == tokens
+    assert documento.tokens == len(tokens) == 14
+
+
+def test_canal_publica_el_analisis_abortado():
+    canal, cliente = CanalDocumento('int a;\nint b;\n'), Cliente()
+    suscripcion = canal.suscribir()
+    cliente.recibir(canal.siguiente(suscripcion, 0))
+    canal.editar(canal.version, [(7, 7, 'x = ((((1))));\n')], Presupuesto(profundidad=5))
+    mensaje = canal.siguiente(suscripcion, 0)
+    cliente.recibir(mensaje)
+    assert (mensaje['quitados'], mensaje['fragmentos'], mensaje['success']) == (None, [], False)
+    assert mensaje['errores'] == ['⛔ Análisis abortado: se superó la profundidad máxima de anidamiento (5)']
+    assert mensaje['presupuesto_excedido']['motivo'] == 'profundidad'
+
+    # La siguiente edición, dentro del presupuesto, vuelve a analizar el documento entero
+    canal.editar(canal.version, [(11, 20, '((1))')], Presupuesto(profundidad=5))
+    cliente.recibir(canal.siguiente(suscripcion, 0))
+    cliente.comprobar('int a;\nx = ((1));\nint b;\n')
+
+
+def test_canal_publica_el_documento_rehecho_si_falla_la_edicion(monkeypatch):
+    canal, cliente = CanalDocumento('int a;\nint b;\n'), Cliente()
+    suscripcion = canal.suscribir()
+    cliente.recibir(canal.siguiente(suscripcion, 0))
+
+    # Si falla la edición, el documento se rehace desde el texto y se publica ya editado
+    def fallar(*args, **kwargs): raise RuntimeError('fallo de prueba')
+    monkeypatch.setattr(canal.documento, 'editar', fallar)
+    canal.editar(canal.version, [(7, 7, 'int c;\n')])
+    cliente.recibir(canal.siguiente(suscripcion, 0))
+    cliente.comprobar('int a;\nint c;\nint b;\n')
+
+    # Si tampoco se puede rehacer, se publica el error y el cliente no se queda con el documento viejo
+    reemplazar = canal.documento.reemplazar
+    monkeypatch.setattr(canal.documento, 'reemplazar', lambda texto, presupuesto=None: fallar() if texto else
+                        reemplazar(texto, presupuesto))
+    canal.editar(canal.version, [(0, 0, 'int d;\n')])
+    mensaje = canal.siguiente(suscripcion, 0)
+    cliente.recibir(mensaje)
+    assert (mensaje['version'], mensaje['quitados'], mensaje['fragmentos']) == (canal.version, None, [])
+    assert (mensaje['success'], mensaje['errores']) == (False, ['Error interno: fallo de prueba'])
+    assert canal.siguiente(suscripcion, 0) is None
+
+    # La siguiente edición vuelve a analizar el documento entero
+    monkeypatch.undo()
+    canal.editar(canal.version, [(0, 7, '')])
+    cliente.recibir(canal.siguiente(suscripcion, 0))
+    cliente.comprobar('int a;\nint c;\nint b;\n')
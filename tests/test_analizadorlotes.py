@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import analizadorlotes
+from analizadorlotes import MAXIMO_REINTENTOS, AnalizadorLotes
+
+# Unos segundos de análisis: se pasa de cualquier tiempo límite pequeño
+LENTO = 'x = a + b * c;\n' * 50000
+
+
+@pytest.fixture
+def analizador():
+    analizador = AnalizadorLotes(trabajadores=2, tiempo_limite=10.0)
+    # Pool arrancado y caliente antes de medir tiempos límite pequeños
+    assert all('resultado' in r for r in analizador.analizar([('a', 'int a;'), ('b', 'int b;')]))
+    yield analizador
+    analizador.cerrar()
+
+
+def test_tiempo_limite_reemplaza_el_pool(analizador):
+    pool = analizador._pool
+    procesos = list(pool._processes.values())
+    resultados = analizador.analizar([('lento', LENTO), ('rapido', 'int x = 1;')], tiempo_limite=0.3)
+    assert [r['nombre'] for r in resultados] == ['lento', 'rapido']
+    assert resultados[0]['error'] == 'Tiempo límite excedido' and 'resultado' not in resultados[0]
+    assert resultados[1]['resultado']['resultados_sintacticos'] == ['✅ Declaración: int x']
+    # El trabajador ocupado se mata y el siguiente lote usa un pool nuevo
+    assert analizador._pool is None
+    for proceso in procesos: proceso.join(5)
+    assert not any(proceso.is_alive() for proceso in procesos)
+    resultados = analizador.analizar([('a', 'int a;'), ('b', 'x = ;')])
+    assert analizador._pool is not pool
+    assert [r['resultado']['success'] for r in resultados] == [True, False]
+
+
+def _morir(texto, presupuesto=None):
+    # Anota el intento y mata al trabajador, como un proceso que cae a mitad del análisis
+    with open(os.environ['INTENTOS_LOTE'], 'a') as f:
+        f.write('x')
+    os._exit(1)
+
+
+def test_trabajador_caido_se_reintenta_hasta_el_maximo(analizador, monkeypatch, tmp_path):
+    # Los procesos nuevos nacen por fork con la función reemplazada
+    analizador.cerrar()
+    intentos = tmp_path / 'intentos'
+    monkeypatch.setenv('INTENTOS_LOTE', str(intentos))
+    monkeypatch.setattr(analizadorlotes, '_analizar_fuente', _morir)
+    resultados = analizador.analizar([('a', 'int a;')])
+    assert resultados == [{'nombre': 'a', 'error': 'El proceso de análisis terminó inesperadamente'}]
+    assert intentos.read_text() == 'x' * (MAXIMO_REINTENTOS + 1)
+
+    monkeypatch.undo()
+    analizador.cerrar()
+    assert analizador.analizar([('a', 'int a;')])[0]['resultado']['success']
@@ -0,0 +1,262 @@
+import base64
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import analizadorsintactico
+from analizadorsintactico import (GramaticaCompleta, Presupuesto, analizar_sintactico, analizarsintactico,
+                                  cortes_nivel_superior, gramatica_ll1, motor_sintactico)
+from arbolsintactico import ArbolSintactico
+from generadorll1 import Alternativa, GramaticaNoLL1, NoTerminal, Regla, Terminal, generar
+from motorlexico import T
+
+# (programa, estructuras reconocidas) de programas correctos
+VALIDOS = [
+    ('int x = 5;', ['✅ Declaración: int x']),
+    ('int a[3] = {1, 2, 3};', ['✅ Declaración: int a']),
+    ('if (x > 0) { y = 1; } else y = 2;', ['✅ Sentencia if válida']),
+    ('for (i = 0; i < 10; i++) suma += i;', ['✅ Sentencia for válida']),
+    ('while (x) x--;', ['✅ Sentencia while válida']),
+    ('do { x++; } while (x < 5);', ['✅ Sentencia do-while válida']),
+    ('switch (x) { case 1: y = 1; break; default: y = 0; }', ['✅ Sentencia switch válida']),
+    ('return a ? b : c;', ['✅ Sentencia return válida']),
+    ('f(a, b[1], c.d, e->f);', ['✅ Sentencia de expresión válida']),
+    ('x = y = z + 1 * 2 << 3;', ['✅ Sentencia de expresión válida']),
+    ('int x = 1;\nx = -x;\nbreak;', ['✅ Declaración: int x', '✅ Sentencia de expresión válida',
+                                     '✅ Sentencia break válida']),
+]
+
+# (programa, errores, códigos de los diagnósticos, estructuras reconocidas) de programas con errores
+INVALIDOS = [
+    ('int x = ;', ["❌ Error en inicialización: Token inesperado en expresión primaria: ';'"],
+     ['token_inesperado'], []),
+    ('if (x > 0 { y = 1; }', ["❌ Se esperaba ')' después de la condición"], ['esperaba_parentesis_condicion'], []),
+    ('int a[] = {1};', ['❌ Se esperaba tamaño del array'], ['esperaba_tamano_array'],
+     ['✅ Sentencia de expresión válida']),
+    ('x = (1 + 2;', ["❌ Error en expresión: Error después del operador de asignación: Se esperaba ')'"],
+     ['esperaba_parentesis_cierre'], []),
+    ('while (x) ', ['❌ Error en cuerpo del while: No hay tokens para analizar'], ['sin_tokens'], []),
+    ('switch (x) { y = 1; }', ["❌ Se esperaba 'case' o 'default', se encontró 'y'"], ['esperaba_case'], []),
+    ('int x = 5 int y = 6;', ["❌ Se esperaba ';'"], ['esperaba_punto_y_coma'], ['✅ Declaración: int y']),
+    ('a.;', ["❌ Error en expresión: Se esperaba identificador después de '.'"], ['esperaba_miembro'], []),
+    ('x = 1 ? 2;', ["❌ Error en expresión: Error después del operador de asignación: "
+                    "Se esperaba ':' en operador ternario"], ['esperaba_dos_puntos_ternario'], []),
+    ('break', ["❌ Se esperaba ';' después de break"], ['esperaba_punto_y_coma_salto'], []),
+    ('int x = 1; x +; int y = 2;', ["❌ Error en expresión: Error después del operador aditiva: "
+                                    "Token inesperado en expresión primaria: ';'"],
+     ['token_inesperado'], ['✅ Declaración: int x', '✅ Declaración: int y']),
+    ('', ['Texto vacío o solo espacios'], ['texto_vacio'], []),
+    ('   ', ['Texto vacío o solo espacios'], ['texto_vacio'], []),
+    ('@@@', ['No se encontraron tokens válidos'], ['sin_tokens_validos'], []),
+]
+
+
+@pytest.mark.parametrize('texto, estructuras', VALIDOS)
+def test_programas_validos(texto, estructuras):
+    resultado = analizarsintactico(texto, diagnosticos=True)
+    assert resultado['success']
+    assert resultado['resultados_sintacticos'] == estructuras
+    assert resultado['errores'] == [] and resultado['diagnosticos'] == []
+    assert resultado['total_estructuras'] == len(estructuras) and resultado['total_errores'] == 0
+
+
+@pytest.mark.parametrize('texto, errores, codigos, estructuras', INVALIDOS)
+def test_programas_con_errores(texto, errores, codigos, estructuras):
+    resultado = analizarsintactico(texto, diagnosticos=True)
+    assert not resultado['success']
+    assert resultado['errores'] == errores
+    assert [diagnostico['codigo'] for diagnostico in resultado['diagnosticos']] == codigos
+    assert resultado['resultados_sintacticos'] == estructuras
+    assert resultado['total_errores'] == len(errores) and resultado['total_estructuras'] == len(estructuras)
+
+
+@pytest.mark.parametrize('texto', [texto for texto, *_ in VALIDOS + INVALIDOS])
+def test_arbol_en_columnas_y_binario_igual_que_el_del_analisis(texto):
+    ctx = motor_sintactico.contexto(arbol=True)
+    tokens = motor_sintactico.tokenizar(ctx, texto)
+    motor_sintactico.analizar_programa(ctx, tokens)
+    arbol = ctx.arbol()
+    filas = [(arbol.clase(i), arbol.tokens[i], arbol.inicios[i], arbol.fines[i], arbol.hijos(i))
+             for i in range(len(arbol))]
+
+    columnas = analizarsintactico(texto, arbol='columnas')['arbol']
+    if not tokens:
+        assert columnas is None
+        return
+    assert columnas == arbol.a_columnas()
+    assert [(columnas['clases'][c], t, a, b) for c, t, a, b in
+            zip(columnas['clase'], columnas['token'], columnas['inicio'], columnas['fin'])] == \
+        [fila[:4] for fila in filas]
+
+    binario = base64.b64decode(analizarsintactico(texto, arbol='binario')['arbol'])
+    assert binario == arbol.a_bytes()
+    leido = ArbolSintactico.desde_bytes(binario)
+    assert leido.a_columnas() == columnas and leido.a_bytes() == binario
+    assert [(leido.clase(i), leido.tokens[i], leido.inicios[i], leido.fines[i], leido.hijos(i))
+            for i in range(len(leido))] == filas
+    assert leido.clase(leido.raiz) == 'programa'
+    with pytest.raises(ValueError):
+        ArbolSintactico.desde_bytes(binario[4:])
+
+
+def test_diagnostico_ubicado_en_el_token():
+    texto = 'int x = 1;\nif (x > 0 { y = 1; }'
+    diagnostico, = analizarsintactico(texto, diagnosticos=True)['diagnosticos']
+    assert texto[diagnostico['inicio']:diagnostico['fin']] == '{'
+    assert (diagnostico['linea'], diagnostico['columna']) == (2, 11)
+
+
+def test_gramatica_sin_conflictos_salvo_los_resueltos():
+    # El 'else' colgante y las constantes de case que también son tipos ('float', 'char')
+    resueltos = {(nombre, token) for nombre, token in gramatica_ll1.resueltos}
+    assert resueltos == {('elementos', T.CHAR), ('elementos', T.FLOAT), ('sino', T.ELSE)}
+
+
+def test_generador_rechaza_conflictos():
+    ambigua = {'raiz': Regla([Alternativa([Terminal(T.IDENTIFIER), Terminal(T.SEMICOLON)]),
+                              Alternativa([Terminal(T.IDENTIFIER), Terminal(T.COMMA)])])}
+    with pytest.raises(GramaticaNoLL1):
+        generar(ambigua)
+    with pytest.raises(GramaticaNoLL1):
+        generar({'raiz': Regla([Alternativa([NoTerminal('inexistente')])])})
+
+
+# Anidamiento mucho más profundo que el límite de recursión de Python: el motor no recurre
+PROFUNDO = 100000
+SIN_LIMITE = Presupuesto(profundidad=10 ** 6)
+
+
+@pytest.mark.parametrize('texto, estructura', [
+    ('x = ' + '(' * PROFUNDO + '1' + ')' * PROFUNDO + ';', '✅ Sentencia de expresión válida'),
+    ('x = ' + '-' * PROFUNDO + 'a' + '[0]' * 1000 + ';', '✅ Sentencia de expresión válida'),
+    ('x = ' + 'f(' * PROFUNDO + '1' + ')' * PROFUNDO + ';', '✅ Sentencia de expresión válida'),
+    ('x = ' + 'a ? ' * PROFUNDO + 'b' + ' : c' * PROFUNDO + ';', '✅ Sentencia de expresión válida'),
+    ('{' * PROFUNDO + 'x = 1;' + '}' * PROFUNDO, '✅ Bloque válido'),
+    ('if (a) ' * PROFUNDO + 'x = 1;', '✅ Sentencia if válida'),
+])
+def test_anidamiento_profundo_sin_recursion(texto, estructura):
+    resultado = analizarsintactico(texto, presupuesto=SIN_LIMITE)
+    assert resultado['success'] and resultado['resultados_sintacticos'] == [estructura]
+
+
+def test_anidamiento_profundo_sin_cerrar():
+    resultado = analizarsintactico('x = ' + '(' * PROFUNDO + '1;', presupuesto=SIN_LIMITE, diagnosticos=True)
+    assert not resultado['success']
+    assert resultado['diagnosticos'][0]['codigo'] == 'esperaba_parentesis_cierre'
+
+
+def test_presupuesto_de_profundidad():
+    resultado = analizarsintactico('x = ((((1))));', presupuesto=Presupuesto(profundidad=3), diagnosticos=True)
+    assert not resultado['success']
+    assert resultado['errores'] == ['⛔ Análisis abortado: se superó la profundidad máxima de anidamiento (3)']
+    assert [diagnostico['codigo'] for diagnostico in resultado['diagnosticos']] == ['presupuesto_excedido']
+    assert analizarsintactico('x = ((((1))));', presupuesto=Presupuesto(profundidad=10))['success']
+
+
+def _forma(texto):
+    # El árbol de un programa como expresión S: (operador operandos...), con las hojas por su valor
+    ctx = motor_sintactico.contexto(arbol=True)
+    tokens = motor_sintactico.tokenizar(ctx, texto)
+    motor_sintactico.analizar_programa(ctx, tokens)
+    arbol = ctx.arbol()
+
+    def nodo(i):
+        clase, hijos, token = arbol.clase(i), [nodo(h) for h in arbol.hijos(i)], arbol.tokens[i]
+        if clase in ('identificador', 'literal'): return tokens.valor(token)
+        if clase == 'miembro': hijos.append(tokens.valor(token + 1))
+        cabeza = tokens.valor(token) if token >= 0 else clase
+        return '(' + ' '.join([cabeza, *hijos]) + ')'
+
+    return nodo(arbol.raiz)
+
+
+@pytest.mark.parametrize('expresion, forma', [
+    # Un nivel por operador, de menor a mayor precedencia
+    ('x = a | b ^ c & d << e + f', '(= x (| a (^ b (& c (<< d (+ e f))))))'),
+    ('a + b << c & d ^ e | f', '(| (^ (& (<< (+ a b) c) d) e) f)'),
+    ('a || b && c | d', '(|| a (&& b (| c d)))'),
+    ('a & b == c', '(& a (== b c))'),
+    ('a == b < c', '(== a (< b c))'),
+    ('a < b << c', '(< a (<< b c))'),
+    ('a + b * c % d', '(+ a (% (* b c) d))'),
+    # Los binarios asocian por la izquierda; la asignación y el ternario, por la derecha
+    ('a - b - c', '(- (- a b) c)'),
+    ('a << b >> c', '(>> (<< a b) c)'),
+    ('a ^ b ^ c', '(^ (^ a b) c)'),
+    ('x = y += z', '(= x (+= y z))'),
+    ('a ? b : c ? d : e', '(? a b (? c d e))'),
+    ('x = a || b ? c : d', '(= x (? (|| a b) c d))'),
+    # Prefijos, sufijos y paréntesis
+    ('-a[1]++', '(- (++ ([ a 1)))'),
+    ('~a & !b', '(& (~ a) (! b))'),
+    ('(a | b) & c', '(& (| a b) c)'),
+    ('f(a, b).c', '(. (( f a b) c)'),
+])
+def test_precedencia_y_asociatividad(expresion, forma):
+    assert _forma(expresion + ';') == f'(programa (sentencia_expresion {forma}))'
+
+
+def test_error_tras_operador_de_bits():
+    resultado = analizarsintactico('x = a & ;', diagnosticos=True)
+    assert resultado['errores'] == ["❌ Error en expresión: Error después del operador de asignación: "
+                                    "Error después del operador AND a nivel de bits: "
+                                    "Token inesperado en expresión primaria: ';'"]
+
+
+def test_gramatica_completa_conserva_la_interfaz_anterior():
+    gramatica = GramaticaCompleta()
+    tokens = gramatica.tokenizar('x = -a[1]++ * (b + 2) == c ? d : e;')
+    assert tokens[:2] == [{'tipo': 'IDENTIFIER', 'valor': 'x', 'posicion': 0},
+                          {'tipo': 'ASSIGN', 'valor': '=', 'posicion': 2}]
+    assert gramatica.analizar_expresion(tokens, 0) == (True, 20, 'Expresión de asignación válida')
+    assert gramatica.analizar_expresion_ternaria(tokens, 2) == (True, 20, 'Expresión condicional válida')
+    assert gramatica.analizar_expresion_igualdad(tokens, 2) == (True, 16, 'Expresión de igualdad válida')
+    assert gramatica.analizar_expresion_multiplicativa(tokens, 2) == (True, 14, 'Expresión multiplicativa válida')
+    assert gramatica.analizar_expresion_unaria(tokens, 2) == (True, 8, 'Expresión postfijo válida')
+    assert gramatica.analizar_expresion_postfijo(tokens, 3) == (True, 8, 'Expresión postfijo válida')
+    assert gramatica.analizar_expresion_primaria(tokens, 3) == (True, 4, 'Identificador: a')
+    assert gramatica.analizar_expresion_primaria(gramatica.tokenizar(';'), 0) == \
+        (False, 0, "Token inesperado en expresión primaria: ';'")
+
+    assert gramatica.analizar_programa(gramatica.tokenizar('int x = 1; x +; while (x) x--;')) == \
+        (True, 15, 'Programa analizado')
+    # Recuperación de la clase anterior: tras un error avanza un token y vuelve a intentar
+    assert gramatica.estructuras_reconocidas == ['✅ Declaración: int x', '✅ Sentencia de expresión válida',
+                                                 '✅ Sentencia while válida']
+    assert gramatica.errores == ["❌ Error en expresión: Error después del operador aditiva: "
+                                 "Token inesperado en expresión primaria: ';'",
+                                 "❌ Error en expresión: Token inesperado en expresión primaria: ';'"]
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with ProcessPoolExecutor(2) as pool:
+        yield pool
+
+
+def _programa_mezclado(semilla, piezas=400):
+    # Construcciones válidas y rotas en orden aleatorio: hay cortes candidatos tras un 'if' sin
+    # 'else', antes del 'while' de un do y en medio de errores que se recuperan. Los paréntesis y
+    # llaves de cada fragmento están equilibrados, para que el nivel superior vuelva a cero
+    aleatorio = random.Random(semilla)
+    fragmentos = [texto for texto, *_ in VALIDOS + INVALIDOS
+                  if texto.strip() and all(texto.count(a) == texto.count(c) for a, c in ('()', '{}', '[]'))]
+    fragmentos += ['if (x) y = 1;', 'else y = 2;', 'do x++;', 'while (x);', '{ int a = 1; { b = a; } }']
+    return '\n'.join(aleatorio.choice(fragmentos) for _ in range(piezas))
+
+
+@pytest.mark.parametrize('tamano', [7, 50, 500])
+@pytest.mark.parametrize('semilla', range(3))
+def test_analisis_en_paralelo_igual_que_el_secuencial(pool, monkeypatch, tamano, semilla):
+    texto = _programa_mezclado(semilla)
+    secuencial = analizarsintactico(texto, diagnosticos=True)
+
+    tokens = motor_sintactico.tokenizar(motor_sintactico.contexto(), texto)
+    cortes = cortes_nivel_superior(tokens.tipos, tamano)
+    assert cortes[0] == 0 and cortes[-1] == len(tokens) and len(cortes) > 2
+    assert all(b - a >= tamano for a, b in zip(cortes, cortes[1:-1]))
+
+    monkeypatch.setattr(analizadorsintactico, 'TOKENS_POR_TRAMO', tamano)
+    assert analizarsintactico(texto, diagnosticos=True, paralelo=pool) == secuencial
+    assert analizar_sintactico(texto, diagnosticos=True, paralelo=pool) == secuencial
@@ -0,0 +1,282 @@
+import gzip
+import json
+
+import pytest
+
+from analizadorsintactico import Presupuesto, analizarsintactico
+import app as app_modulo
+from app import app
+
+
+@pytest.fixture
+def cliente():
+    return app.test_client()
+
+
+@pytest.mark.parametrize('ruta', ['/analizar_lexico', '/analizar_sintactico', '/analizar'])
+def test_304_con_el_etag_de_la_respuesta(cliente, ruta):
+    datos = {'texto': 'int x = 1; /* 304 */'}
+    primera = cliente.post(ruta, json=datos)
+    assert primera.status_code == 200 and primera.headers['ETag']
+    repetida = cliente.post(ruta, json=datos, headers={'If-None-Match': primera.headers['ETag']})
+    assert repetida.status_code == 304 and repetida.data == b''
+    assert repetida.headers['ETag'] == primera.headers['ETag']
+    otra = cliente.post(ruta, json={'texto': 'int y = 2;'}, headers={'If-None-Match': primera.headers['ETag']})
+    assert otra.status_code == 200
+
+
+@pytest.mark.parametrize('ruta, opciones', [
+    ('/analizar_sintactico', {'arbol': 'xml'}),
+    ('/analizar', {'arbol': 'filas'}),
+    ('/analizar', {'lexico': 'xml'}),
+    ('/analizar_lexico', {'formato': 'xml'}),
+    ('/analizar_sintactico', {'presupuesto': {'tokens': 'muchos'}}),
+])
+def test_400_por_opcion_desconocida(cliente, ruta, opciones):
+    respuesta = cliente.post(ruta, json={'texto': 'int x = 1;', **opciones})
+    assert respuesta.status_code == 400
+    datos = respuesta.get_json()
+    assert not datos['success'] and datos['error'].startswith('Opción inválida: ')
+
+
+def test_413_por_tamano_del_cuerpo(cliente, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 64)
+    respuesta = cliente.post('/analizar_sintactico', json={'texto': 'int x = 1;' * 20})
+    assert respuesta.status_code == 413 and not respuesta.get_json()['success']
+    assert cliente.post('/analizar_sintactico', json={'texto': 'int x = 1;'}).status_code == 200
+
+
+def test_413_por_fuentes_del_lote(cliente, monkeypatch):
+    monkeypatch.setitem(app.config, 'LOTE_MAXIMO_FUENTES', 2)
+    respuesta = cliente.post('/analizar_lote', json={'fuentes': {'a': 'int a;', 'b': 'int b;', 'c': 'int c;'}})
+    assert respuesta.status_code == 413 and not respuesta.get_json()['success']
+
+
+# Varios tramos de 8 KB del flujo NDJSON, con tokens y un comentario que cruzan los cortes, CRLF y caracteres
+# que no reconoce el léxico
+NDJSON = ''.join(f'int variable_{i} = {i} * 3.5; /* comentario\r\n{i} */ @ s = "ñ{i}";\r\n' for i in range(400))
+
+
+@pytest.mark.parametrize('peticion', [
+    {'query_string': {'formato': 'ndjson'}},
+    {'headers': {'Accept': 'application/x-ndjson'}},
+])
+def test_lexico_ndjson_igual_que_las_filas(cliente, peticion):
+    respuesta = cliente.post('/analizar_lexico', json={'texto': NDJSON}, **peticion)
+    assert respuesta.mimetype == 'application/x-ndjson'
+    cuerpo = respuesta.get_data(as_text=True)
+    assert cuerpo.endswith('}\n') and '\n\n' not in cuerpo
+    eventos = [json.loads(linea) for linea in cuerpo.splitlines()]
+
+    filas = cliente.post('/analizar_lexico', json={'texto': NDJSON}).get_json()
+    assert [{k: v for k, v in e.items() if k != 'evento'} for e in eventos if e['evento'] == 'token'] == \
+        filas['resultados']
+    diagnosticos = [e for e in eventos if e['evento'] == 'diagnostico']
+    assert len(diagnosticos) == 400 and {NDJSON[d['posicion']] for d in diagnosticos} == {'@'}
+    assert (diagnosticos[1]['linea'], diagnosticos[1]['columna']) == (4, 6)
+
+    resumen = eventos[-1]
+    assert resumen.pop('evento') == 'resumen' and len(filas['resultados']) > 4000
+    assert resumen == {clave: valor for clave, valor in filas.items() if clave != 'resultados'}
+
+
+def _filas_desde_columnas(texto, columnas):
+    # Reconstrucción documentada en resultado_lexico_columnas, con línea y columna contadas aparte
+    filas = []
+    for posicion, (clase, inicio, longitud) in enumerate(zip(columnas['clase'], columnas['inicio'],
+                                                             columnas['longitud']), 1):
+        linea, columna = texto.count('\n', 0, inicio) + 1, inicio - texto.rfind('\n', 0, inicio)
+        filas.append({'token': texto[inicio:inicio + longitud], 'posicion': posicion, 'linea': linea,
+                      'columna': columna, **columnas['leyenda'][clase]})
+    return filas
+
+
+def _descomprimir(respuesta, codificacion):
+    assert respuesta.content_encoding == codificacion and 'Accept-Encoding' in respuesta.vary
+    if codificacion is None: return json.loads(respuesta.data)
+    if codificacion == 'gzip': return json.loads(gzip.decompress(respuesta.data))
+    return json.loads(pytest.importorskip('brotli').decompress(respuesta.data))
+
+
+@pytest.mark.parametrize('codificacion', [None, 'gzip', pytest.param('br', marks=pytest.mark.skipif(
+    app_modulo.brotli is None, reason='brotli no está instalado'))])
+@pytest.mark.parametrize('ruta, opcion', [('/analizar_lexico', 'formato'), ('/analizar', 'lexico')])
+def test_lexico_en_columnas_igual_que_las_filas(cliente, codificacion, ruta, opcion):
+    # NDJSON tiene CRLF, 'ñ' y caracteres que no reconoce el léxico; se añaden las palabras
+    # reservadas que comparten tipo con un literal ('float' y 'char' junto a 3.5 y 'c')
+    texto = NDJSON + "float f = 3.5; char c = 'c';\n"
+    filas = cliente.post(ruta, json={'texto': texto}).get_json()
+    cabeceras = {'Accept-Encoding': codificacion or 'identity'}
+    respuesta = cliente.post(ruta, json={'texto': texto, opcion: 'columnas'}, headers=cabeceras)
+    assert respuesta.status_code == 200
+    columnas = _descomprimir(respuesta, codificacion)
+
+    if ruta == '/analizar':
+        assert columnas['sintactico'] == filas['sintactico'] and columnas['success'] == filas['success']
+        columnas, filas = columnas['lexico'], filas['lexico']
+    assert _filas_desde_columnas(texto, columnas.pop('columnas')) == filas.pop('resultados')
+    assert columnas == filas
+
+    # La versión comprimida es otra representación: su ETag lleva la codificación como sufijo
+    sin_comprimir = cliente.post(ruta, json={'texto': texto, opcion: 'columnas'},
+                                 headers={'Accept-Encoding': 'identity'}).headers['ETag']
+    etag = respuesta.headers['ETag']
+    assert etag == (sin_comprimir if codificacion is None else sin_comprimir[:-1] + f'-{codificacion}"')
+    repetida = cliente.post(ruta, json={'texto': texto, opcion: 'columnas'},
+                            headers={**cabeceras, 'If-None-Match': etag})
+    assert repetida.status_code == 304 and repetida.headers['ETag'] == etag
+
+
+def test_analizar_lote_con_tiempo_limite(cliente, monkeypatch):
+    monkeypatch.setitem(app.config, 'LOTE_TRABAJADORES', 2)
+    analizador = app_modulo.analizador_lotes()
+    try:
+        cliente.post('/analizar_lote', json={'fuentes': {'caliente': 'int a;'}})
+        pool = analizador._pool
+        lote = {'fuentes': [{'nombre': 'lento', 'texto': 'x = a + b * c;\n' * 50000},
+                            {'nombre': 'rapido', 'texto': 'int x = 1;'}, {'nombre': 'malo', 'texto': 'x = ;'}],
+                'tiempo_limite': 0.3}
+        datos = cliente.post('/analizar_lote', json=lote).get_json()
+        assert (datos['success'], datos['total_fuentes'], datos['total_fallidos'], datos['total_con_errores']) == \
+            (False, 3, 1, 1)
+        lento, rapido, malo = datos['resultados']
+        assert lento['nombre'] == 'lento' and lento['error'] == 'Tiempo límite excedido'
+        assert rapido['resultado']['success'] and not malo['resultado']['success']
+
+        # El siguiente lote va a un pool nuevo
+        datos = cliente.post('/analizar_lote', json={'fuentes': {'a': 'int a;', 'b': 'int b;'}}).get_json()
+        assert datos['success'] and datos['total_fallidos'] == 0
+        assert app_modulo.analizador_lotes() is analizador and analizador._pool not in (None, pool)
+    finally:
+        analizador.cerrar()
+
+
+def test_409_en_analizar_incremental(cliente):
+    desconocido = cliente.post('/analizar_incremental',
+                               json={'documento': 'no-abierto', 'version': 1, 'ediciones': []})
+    assert desconocido.status_code == 409 and desconocido.get_json()['version'] is None
+
+    abierto = cliente.post('/analizar_incremental', json={'documento': 'prueba-409', 'texto': 'int a;'}).get_json()
+    edicion = {'documento': 'prueba-409', 'ediciones': [{'inicio': 4, 'fin': 5, 'texto': 'b'}]}
+    vieja = cliente.post('/analizar_incremental', json={**edicion, 'version': abierto['version'] - 1})
+    assert vieja.status_code == 409 and vieja.get_json()['version'] == abierto['version']
+
+    editado = cliente.post('/analizar_incremental', json={**edicion, 'version': abierto['version']})
+    assert editado.status_code == 200
+    assert [f['mensaje'] for f in editado.get_json()['fragmentos']] == ['✅ Declaración: int b']
+
+
+def test_analizar_incremental_devuelve_solo_los_cambios(cliente):
+    texto = ''.join(f'int v{i} = {i};\n' for i in range(200))
+    abierto = cliente.post('/analizar_incremental', json={'documento': 'prueba-cambios', 'texto': texto}).get_json()
+    assert (abierto['desde'], abierto['quitados'], len(abierto['fragmentos'])) == (0, None, 200)
+    assert 'tokens_lexicos' not in abierto
+
+    # 'int v100 = 100;' empieza en el carácter 1380: sólo vuelven esa construcción y la anterior
+    edicion = {'documento': 'prueba-cambios', 'version': abierto['version'],
+               'ediciones': [{'inicio': 1384, 'fin': 1388, 'texto': 'w'}]}
+    editado = cliente.post('/analizar_incremental', json=edicion).get_json()
+    assert editado['version'] == abierto['version'] + 1
+    assert (editado['desde'], editado['quitados']) == (99, 2)
+    assert [f['tokens'] for f in editado['fragmentos']] == [['int', 'v99', '=', '99', ';'],
+                                                           ['int', 'w', '=', '100', ';']]
+    assert (editado['success'], editado['total_estructuras']) == (True, 200)
+
+    # Pedido explícitamente, vuelve también el resultado entero
+    edicion = {**edicion, 'version': editado['version'], 'completo': True,
+               'ediciones': [{'inicio': 0, 'fin': 0, 'texto': '@'}]}
+    completo = cliente.post('/analizar_incremental', json=edicion).get_json()
+    texto = '@' + texto[:1384] + 'w' + texto[1388:]
+    assert completo['tokens_lexicos'] == analizarsintactico(texto)['tokens_lexicos']
+    # Un carácter desconocido delante no cambia ninguna construcción, sólo el prefijo
+    assert (completo['quitados'], completo['fragmentos'], completo['prefijo']) == (0, [], 1)
+
+
+def test_analizar_incremental_con_presupuesto(cliente):
+    limite = {'presupuesto': {'profundidad': 5}}
+    profundo = cliente.post('/analizar_incremental',
+                            json={'documento': 'prueba-presupuesto', 'texto': 'x = ((((1))));', **limite})
+    datos = profundo.get_json()
+    assert profundo.status_code == 200 and 'version' not in datos
+    assert datos['presupuesto_excedido']['motivo'] == 'profundidad' and not datos['success']
+    assert datos['errores'] == analizarsintactico('x = ((((1))));', presupuesto=Presupuesto(profundidad=5))['errores']
+    # El documento no se abrió
+    edicion = {'documento': 'prueba-presupuesto', 'version': 1, 'ediciones': []}
+    assert cliente.post('/analizar_incremental', json=edicion).status_code == 409
+
+    abierto = cliente.post('/analizar_incremental',
+                           json={'documento': 'prueba-presupuesto', 'texto': 'x = (1);', **limite}).get_json()
+    edicion = {'documento': 'prueba-presupuesto', 'version': abierto['version'], **limite,
+               'ediciones': [{'inicio': 4, 'fin': 7, 'texto': '((((1))))'}]}
+    datos = cliente.post('/analizar_incremental', json=edicion).get_json()
+    assert 'version' not in datos and datos['presupuesto_excedido']['motivo'] == 'profundidad'
+    # La versión anterior sigue ahí y admite ediciones dentro del presupuesto
+    edicion['ediciones'] = [{'inicio': 4, 'fin': 7, 'texto': '((1))'}]
+    datos = cliente.post('/analizar_incremental', json=edicion).get_json()
+    assert datos['version'] == abierto['version'] + 1 and datos['success']
+
+
+def test_409_en_vivo(cliente):
+    edicion = {'version': 1, 'ediciones': [{'inicio': 0, 'fin': 0, 'texto': 'x'}]}
+    assert cliente.post('/vivo/no-abierto-409', json=edicion).status_code == 409
+    abierto = cliente.post('/vivo/prueba-409', json={'texto': 'int a;'})
+    assert abierto.status_code == 202
+    version = abierto.get_json()['version']
+    vieja = cliente.post('/vivo/prueba-409', json={**edicion, 'version': version - 1})
+    assert vieja.status_code == 409 and vieja.get_json()['version'] == version
+    assert cliente.post('/vivo/prueba-409', json={**edicion, 'version': version}).status_code == 202
+    invalida = {'version': version + 1, 'ediciones': [{'fin': 1}]}
+    assert cliente.post('/vivo/prueba-409', json=invalida).status_code == 400
+
+
+@pytest.mark.parametrize('datos', [
+    {'texto': 5},
+    {'texto': ['int a;']},
+    {'version': None, 'ediciones': [{'inicio': 0, 'fin': 0, 'texto': {'x': 1}}]},
+])
+def test_400_en_vivo_si_el_texto_no_es_una_cadena(cliente, datos):
+    version = cliente.post('/vivo/prueba-texto', json={'texto': 'int a;'}).get_json()['version']
+    if 'version' in datos: datos = {**datos, 'version': version}
+    respuesta = cliente.post('/vivo/prueba-texto', json=datos)
+    assert respuesta.status_code == 400 and respuesta.get_json()['error'].startswith('Edición inválida: ')
+    # El canal sigue en la misma versión, con su texto
+    canal = app_modulo.canales.obtener('prueba-texto')
+    assert (canal.version, canal.texto) == (version, 'int a;')
+
+
+def _eventos(respuesta):
+    # (evento, datos) de un flujo text/event-stream, sin los latidos
+    pendiente = ''
+    for trozo in respuesta.response:
+        pendiente += trozo.decode('utf-8') if isinstance(trozo, bytes) else trozo
+        while '\n\n' in pendiente:
+            bloque, pendiente = pendiente.split('\n\n', 1)
+            campos = dict(linea.split(': ', 1) for linea in bloque.split('\n') if not linea.startswith(':'))
+            if 'event' in campos: yield campos['event'], json.loads(campos['data'])
+
+
+def test_vivo_publica_los_cambios(cliente, monkeypatch):
+    monkeypatch.setitem(app.config, 'VIVO_LATIDO', 0.05)
+    cliente.post('/vivo/prueba-eventos', json={'texto': 'int a;\nint b;\n'})
+    respuesta = cliente.get('/vivo/prueba-eventos', buffered=False)
+    assert respuesta.status_code == 200 and respuesta.mimetype == 'text/event-stream'
+    eventos = _eventos(respuesta)
+    try:
+        evento, completo = next(eventos)
+        assert evento == 'cambios' and completo['quitados'] is None
+        assert [f['mensaje'] for f in completo['fragmentos']] == ['✅ Declaración: int a', '✅ Declaración: int b']
+
+        edicion = {'version': completo['version'], 'ediciones': [{'inicio': 11, 'fin': 12, 'texto': 'c = ;'}]}
+        assert cliente.post('/vivo/prueba-eventos', json=edicion).status_code == 202
+        evento, cambios = next(eventos)
+        # Se reanaliza desde la construcción anterior a la editada
+        assert evento == 'cambios' and (cambios['desde'], cambios['quitados']) == (0, 2)
+        assert [f['tokens'] for f in cambios['fragmentos']] == [['int', 'a', ';'], ['int', 'c', '=', ';'], [';']]
+        assert (cambios['success'], cambios['total_errores']) == (False, 1)
+
+        # Otra conexión al mismo documento cierra este flujo
+        otra = cliente.get('/vivo/prueba-eventos', buffered=False)
+        assert next(eventos) == ('cerrado', {})
+        otra.close()
+    finally:
+        respuesta.close()
@@ -0,0 +1,83 @@
+import threading
+
+from cacheresultados import CacheDisco, CacheResultados
+
+
+def test_cache_resultados_expulsa_por_bytes_la_usada_hace_mas_tiempo():
+    cache = CacheResultados('v1', maximo_bytes=250)
+    for clave in 'abc': cache.guardar(clave, b'x' * 100)
+    # Al pasar de 250 bytes se expulsa 'a', la más antigua; luego 'c', porque 'b' se acaba de usar
+    assert cache.obtener('a') is None and cache.obtener('b') == b'x' * 100
+    cache.guardar('d', b'y' * 100)
+    assert cache.obtener('c') is None and cache.obtener('b') and cache.obtener('d')
+    assert cache.estadisticas()['bytes'] == 200 and cache.estadisticas()['entradas'] == 2
+    # Reemplazar una clave descuenta el cuerpo anterior
+    cache.guardar('b', b'z' * 50)
+    assert cache.estadisticas()['bytes'] == 150 and cache.obtener('d')
+
+
+def test_cache_resultados_no_guarda_un_cuerpo_mayor_que_el_maximo():
+    cache = CacheResultados('v1', maximo_bytes=250)
+    cache.guardar('a', b'x' * 100)
+    cache.guardar('grande', b'x' * 251)
+    assert cache.obtener('grande') is None and cache.obtener('a') == b'x' * 100
+    assert cache.estadisticas()['bytes'] == 100
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+
+def test_cache_disco_cuenta_un_resultado_por_consulta(tmp_path):
+    cache = CacheDisco(str(tmp_path / 'cache.sqlite3'), 'v1')
+    cache.obtener_o_calcular('a', lambda: (b'uno', True))
+    assert (cache.aciertos, cache.fallos, cache.esperas) == (0, 1, 0)
+    assert cache.obtener_o_calcular('a', lambda: (b'otro', True)) == (b'uno', True)
+    assert (cache.aciertos, cache.fallos, cache.esperas) == (1, 1, 0)
+
+
+def test_cache_disco_compartido_y_por_version(tmp_path):
+    # Otra instancia sobre el mismo archivo (otro proceso) encuentra lo guardado; otra versión lo borra
+    ruta = str(tmp_path / 'cache.sqlite3')
+    CacheDisco(ruta, 'v1').guardar('a', b'uno')
+    assert CacheDisco(ruta, 'v1').obtener('a') == b'uno'
+    assert CacheDisco(ruta, 'v2').obtener('a') is None
+    assert CacheDisco(ruta, 'v1').obtener('a') is None
+
+
+def test_cache_disco_limite_de_bytes(tmp_path):
+    cache = CacheDisco(str(tmp_path / 'cache.sqlite3'), 'v1', maximo_bytes=250)
+    for clave in 'abc': cache.guardar(clave, b'x' * 100)
+    assert cache.estadisticas()['bytes'] <= 250
+    cache.guardar('d', b'x' * 300)
+    assert cache.obtener('d') is None
+
+
+def test_cache_disco_espera_al_calculo_de_otro_proceso(tmp_path):
+    cache = CacheDisco(str(tmp_path / 'cache.sqlite3'), 'v1')
+    otro = CacheDisco(str(tmp_path / 'cache.sqlite3'), 'v1')
+    assert otro._reservar('b')
+
+    def terminar():
+        otro.guardar('b', b'calculado')
+        otro._liberar('b')
+
+    temporizador = threading.Timer(0.05, terminar)
+    temporizador.start()
+    try:
+        resultado = cache.obtener_o_calcular('b', lambda: (b'repetido', True))
+    finally:
+        temporizador.join()
+    assert resultado == (b'calculado', True)
+    assert (cache.aciertos, cache.fallos, cache.esperas) == (0, 0, 1)
+    assert cache.estadisticas()['tasa_aciertos'] == 1.0
+
+
+def test_cache_disco_contadores_con_hilos(tmp_path):
+    cache = CacheDisco(str(tmp_path / 'cache.sqlite3'), 'v1')
+    cache.guardar('c', b'x')
+
+    def consultar():
+        for _ in range(200): cache.obtener('c')
+
+    hilos = [threading.Thread(target=consultar) for _ in range(4)]
+    for hilo in hilos: hilo.start()
+    for hilo in hilos: hilo.join()
+    assert cache.aciertos == 800
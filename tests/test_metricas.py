@@ -0,0 +1,85 @@
+import re
+import threading
+
+from app import app
+from metricas import RegistroMetricas
+
+
+def _en_hilos(funcion, cantidad):
+    hilos = [threading.Thread(target=funcion, args=(i,)) for i in range(cantidad)]
+    for hilo in hilos: hilo.start()
+    for hilo in hilos: hilo.join()
+
+
+def test_registro_suma_los_fragmentos_de_todos_los_hilos():
+    registro = RegistroMetricas()
+    contador = registro.contador('prueba_total', 'Ayuda', ('ruta',))
+    histograma = registro.histograma('prueba_segundos', 'Ayuda', ('ruta',), limites=(1, 10))
+    raro = 'a"b\\c\nd'
+
+    def trabajar(i):
+        for _ in range(100):
+            contador.incrementar(1, 'x')
+            histograma.observar(0.5, 'x')
+        contador.incrementar(2, raro)
+        histograma.observar(5 * i, raro)
+
+    _en_hilos(trabajar, 8)
+    contador.incrementar(1, 'x')
+    texto = registro.exponer()
+    # Los fragmentos de los hilos terminados pasan al base: sólo queda el del hilo actual
+    assert len(registro._fragmentos) == 1
+
+    assert 'prueba_total{ruta="x"} 801\n' in texto
+    assert 'prueba_total{ruta="a\\"b\\\\c\\nd"} 16\n' in texto
+    assert 'prueba_segundos_bucket{ruta="x",le="1.0"} 800\n' in texto
+    assert 'prueba_segundos_sum{ruta="x"} 400.0\n' in texto
+    assert 'prueba_segundos_count{ruta="x"} 800\n' in texto
+    # Observaciones 0, 5, ..., 35: una hasta 1, tres hasta 10 (el límite se incluye) y el resto por encima
+    assert 'prueba_segundos_bucket{ruta="a\\"b\\\\c\\nd",le="1.0"} 1\n' in texto
+    assert 'prueba_segundos_bucket{ruta="a\\"b\\\\c\\nd",le="10.0"} 3\n' in texto
+    assert 'prueba_segundos_bucket{ruta="a\\"b\\\\c\\nd",le="+Inf"} 8\n' in texto
+    assert 'prueba_segundos_sum{ruta="a\\"b\\\\c\\nd"} 140.0\n' in texto
+    assert 'prueba_segundos_count{ruta="a\\"b\\\\c\\nd"} 8\n' in texto
+
+    # Lo acumulado de los hilos terminados no se pierde ni se cuenta dos veces al exponer de nuevo
+    _en_hilos(lambda i: contador.incrementar(1, 'x'), 3)
+    texto = registro.exponer()
+    assert 'prueba_total{ruta="x"} 804\n' in texto and 'prueba_segundos_count{ruta="x"} 800\n' in texto
+
+
+def test_registro_inactivo_no_cuenta():
+    registro = RegistroMetricas(activo=False)
+    contador = registro.contador('prueba_total', 'Ayuda')
+    contador.incrementar()
+    assert registro.exponer() == '# HELP prueba_total Ayuda\n# TYPE prueba_total counter\n'
+
+
+def _valor(texto, serie):
+    encontrado = re.search('^' + re.escape(serie) + r' (\S+)$', texto, re.MULTILINE)
+    return float(encontrado.group(1)) if encontrado else 0.0
+
+
+def test_metrics_tras_peticiones_desde_varios_hilos():
+    cliente = app.test_client()
+    series = ('analizador_peticiones_total{endpoint="sintactico"}',
+              'analizador_entrada_bytes_count{endpoint="sintactico"}',
+              'analizador_entrada_bytes_sum{endpoint="sintactico"}',
+              'analizador_errores_sintacticos_total{endpoint="sintactico"}')
+    antes = cliente.get('/metrics').get_data(as_text=True)
+    tamanos = []
+
+    def pedir(i):
+        # Textos distintos por hilo y petición: ninguno sale del cache
+        for j in range(5):
+            respuesta = app.test_client().post('/analizar_sintactico', json={'texto': f'x = {i}{j} + ; /* {i} */'})
+            assert respuesta.status_code == 200
+            tamanos.append(respuesta.request.content_length)
+
+    _en_hilos(pedir, 6)
+    respuesta = cliente.get('/metrics')
+    assert respuesta.mimetype == 'text/plain'
+    despues = respuesta.get_data(as_text=True)
+    peticiones, cantidad, suma, errores = (_valor(despues, serie) - _valor(antes, serie) for serie in series)
+    assert (peticiones, cantidad, suma, errores) == (30, 30, sum(tamanos), 30)
+    assert '# TYPE analizador_fase_segundos histogram' in despues
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from benchmarks.lexico import PROGRAMA, tokenizar_referencia
+from motorlexico import BufferTokens, IndiceLineas, ValoresTokens, motor_lexico
+
+# Piezas con las que se arman los textos aleatorios: tokens de todos los tipos, prefijos de operadores
+# más largos, strings y comentarios sin cerrar, escapes y caracteres que no reconoce ningún patrón
+PIEZAS = ['int', 'intx', 'If', 'return', 'x_1', '_', '42', '3.', '3.14', '1e5', '2E-3f', '7f', '.5', '"a\\"b"',
+          '"sin cerrar', "'c'", "'\\n'", "''", '/* c */', '/* sin cerrar', '// linea', '<<=', '>>=', '<<', '>>',
+          '<=', '>=', '==', '!=', '&&', '||', '++', '--', '->', '+=', '-=', '*=', '/=', '%=', '&=', '|=', '^=',
+          '=', '+', '-', '*', '/', '%', '<', '>', '!', '&', '|', '^', '~', '(', ')', '{', '}', '[', ']', ';',
+          ',', '.', '?', ':', ' ', '\t', '\n', '\r\n', '@', '$', '#', 'ñ', '€', '\\']
+
+
+def _tokens(texto):
+    buffer = motor_lexico.tokenizar(texto)
+    return [buffer.token(i) for i in range(len(buffer))]
+
+
+@pytest.mark.parametrize('texto', [
+    PROGRAMA,
+    '',
+    '   \n\t',
+    'x<<=y>>=z<<w>>v<=u>=t==s!=r&&q||p',
+    'a+++++b',
+    'p->q.r',
+    'float f = 1.5e10f; double d = 2.; int i = 010;',
+    'char c = \'\\\'\'; char *s = "x\\\\";',
+    '/* a */ /* b ** / */ c // d\ne',
+    'IF Int WHILE trueValue true false',
+])
+def test_igual_que_la_referencia_en_casos_fijos(texto):
+    assert _tokens(texto) == tokenizar_referencia(texto)
+
+
+@pytest.mark.parametrize('semilla', range(20))
+def test_igual_que_la_referencia_en_textos_aleatorios(semilla):
+    aleatorio = random.Random(semilla)
+    texto = ''.join(aleatorio.choice(PIEZAS) for _ in range(400))
+    assert _tokens(texto) == tokenizar_referencia(texto)
+
+
+@pytest.mark.parametrize('texto', ['', 'a', '\n', 'a\nb', 'a\r\nb\r\n', 'a\rb\n\rc', '\n\n x\n', 'ñ€\n😀x'])
+def test_indice_lineas(texto):
+    # Sólo '\n' separa líneas: el '\r' de un CRLF, o uno suelto, es un carácter más de su línea
+    indice = IndiceLineas(texto)
+    assert len(indice) == texto.count('\n') + 1
+    for p in range(len(texto) + 1):
+        inicio_linea = texto.rfind('\n', 0, p) + 1
+        assert indice.ubicar(p) == (texto.count('\n', 0, p) + 1, p - inicio_linea + 1)
+
+
+def test_indice_lineas_crlf():
+    indice = IndiceLineas('int a;\r\nint b;\rint c;\n')
+    assert list(indice.inicios) == [0, 8, 22]
+    assert indice.ubicar(6) == (1, 7) and indice.ubicar(7) == (1, 8)
+    assert indice.ubicar(8) == (2, 1) and indice.ubicar(15) == (2, 8)
+
+
+def test_valores_tokens():
+    texto = 'int x = 10; // fin'
+    valores = ValoresTokens(motor_lexico.tokenizar(texto))
+    esperado = ['int', 'x', '=', '10', ';']
+    assert len(valores) == 5 and list(valores) == esperado and valores == esperado
+    assert [valores[i] for i in range(-5, 5)] == esperado * 2
+    for corte in (slice(None), slice(1, 3), slice(-2, None), slice(None, None, -1), slice(0, 100, 2),
+                  slice(4, 1), slice(-100, -3)):
+        assert valores[corte] == esperado[corte]
+    for fuera in (5, -6, 100):
+        with pytest.raises(IndexError):
+            valores[fuera]
+    assert valores == ValoresTokens(motor_lexico.tokenizar(texto)) and valores != tuple(esperado)
+    assert ValoresTokens(BufferTokens('')) == [] and not ValoresTokens(BufferTokens(''))
+    assert 'x' in valores and valores.index('10') == 3
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from app import app
+from servidorasincrono import Carril, ServidorAsincrono
+
+
+@pytest.fixture
+def arrancar(monkeypatch):
+    # Arranca un ServidorAsincrono en un hilo con su propio bucle y devuelve (servidor, puerto)
+    monkeypatch.setitem(app.config, 'VIVO_LATIDO', 2.0)
+    bucles = []
+
+    def arrancar(**opciones):
+        servidor = ServidorAsincrono(app, **opciones)
+        bucle = asyncio.new_event_loop()
+
+        async def escuchar():
+            escucha = await asyncio.start_server(servidor._atender, '127.0.0.1', 0)
+            return escucha.sockets[0].getsockname()[1]
+
+        threading.Thread(target=bucle.run_forever, daemon=True).start()
+        bucles.append(bucle)
+        return servidor, asyncio.run_coroutine_threadsafe(escuchar(), bucle).result(5)
+
+    yield arrancar
+
+    async def parar():
+        tareas = asyncio.all_tasks() - {asyncio.current_task()}
+        for tarea in tareas: tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
+    for bucle in bucles:
+        asyncio.run_coroutine_threadsafe(parar(), bucle).result(5)
+        bucle.call_soon_threadsafe(bucle.stop)
+
+
+def _peticion(puerto, metodo, ruta, cuerpo=None):
+    # (código de estado, cuerpo) de una petición con Connection: close
+    datos = b'' if cuerpo is None else json.dumps(cuerpo).encode('utf-8')
+    with socket.create_connection(('127.0.0.1', puerto), timeout=10) as conexion:
+        conexion.sendall(f'{metodo} {ruta} HTTP/1.1\r\nHost: prueba\r\nConnection: close\r\n'
+                         f'Content-Type: application/json\r\nContent-Length: {len(datos)}\r\n\r\n'.encode('latin-1')
+                         + datos)
+        respuesta = b''
+        while True:
+            trozo = conexion.recv(65536)
+            if not trozo: break
+            respuesta += trozo
+    cabecera, _, resto = respuesta.partition(b'\r\n\r\n')
+    return int(cabecera.split(b' ', 2)[1]), resto
+
+
+def _abrir_flujo(puerto, documento):
+    # Abre /vivo/<documento> y espera a las cabeceras y al primer evento; devuelve el socket abierto
+    conexion = socket.create_connection(('127.0.0.1', puerto), timeout=10)
+    conexion.sendall(f'GET /vivo/{documento} HTTP/1.1\r\nHost: prueba\r\n\r\n'.encode('latin-1'))
+    recibido = b''
+    while b'retry:' not in recibido and b'\r\n\r\n{' not in recibido:
+        trozo = conexion.recv(65536)
+        if not trozo: break
+        recibido += trozo
+    return conexion, int(recibido.split(b' ', 2)[1])
+
+
+def test_flujos_de_eventos_no_ocupan_los_carriles_de_analisis(arrancar):
+    servidor, puerto = arrancar()
+    flujos = [_abrir_flujo(puerto, f'latencia-{i}') for i in range(8)]
+    try:
+        assert [estado for _, estado in flujos] == [200] * 8
+        assert servidor.flujos.ocupados == 8
+        assert all(carril.ocupados == 0 for carril in servidor.carriles)
+        for _ in range(3):
+            inicio = time.monotonic()
+            estado, cuerpo = _peticion(puerto, 'POST', '/analizar_sintactico', {'texto': 'int x = 1;'})
+            assert estado == 200 and json.loads(cuerpo)['success']
+            estado, _ = _peticion(puerto, 'POST', '/vivo/latencia-0', {'texto': 'int y;'})
+            assert estado == 202
+            assert time.monotonic() - inicio < 1.0
+    finally:
+        for conexion, _ in flujos: conexion.close()
+
+
+def test_429_con_el_carril_lleno(arrancar):
+    servidor, puerto = arrancar()
+    servidor.carriles[0].ocupados = servidor.carriles[0].capacidad
+    estado, cuerpo = _peticion(puerto, 'POST', '/analizar_sintactico', {'texto': 'int x = 1;'})
+    assert estado == 429 and not json.loads(cuerpo)['success']
+    assert servidor.rechazadas == 1
+    servidor.carriles[0].ocupados = 0
+    assert _peticion(puerto, 'POST', '/analizar_sintactico', {'texto': 'int x = 1;'})[0] == 200
+
+
+def test_429_con_demasiados_flujos(arrancar):
+    servidor, puerto = arrancar(flujos=Carril('flujos', None, 1, 0))
+    primero, estado = _abrir_flujo(puerto, 'limite-a')
+    try:
+        assert estado == 200
+        assert _peticion(puerto, 'GET', '/vivo/limite-b')[0] == 429
+        # El flujo rechazado devuelve su plaza en el carril de análisis
+        assert all(carril.ocupados == 0 for carril in servidor.carriles)
+    finally:
+        primero.close()
+
+
+def test_413_antes_de_leer_el_cuerpo(arrancar):
+    _, puerto = arrancar(maximo_cuerpo=16)
+    assert _peticion(puerto, 'POST', '/analizar_sintactico', {'texto': 'int x = 1; int y = 2;'})[0] == 413